@@ -1,12 +1,143 @@
 # apps/timetable/admin.py
-from django.contrib import admin
-from django.utils.html import format_html
+import zlib
+
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from django.http import HttpResponse
+from django.utils.html import format_html, format_html_join
 from django.urls import reverse
-from django.db.models import Count
+from django.db import DatabaseError, connections
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Q, Value
+from .conf import timetable_setting
 from .models import (
     School, Department, Subject, Teacher, ClassRoom, Class, 
-    Period, TimeSlot, ConflictLog, TimetableTemplate
+    Period, TimeSlot, ConflictLog, TimetableTemplate,
+    AcademicYear, ArchivedTimeSlot, TimetableVersion, TemplateCell, ProfileRecord, current_academic_year
 )
+from .search import SOURCES, search_ids
+from .templating import TemplateApplier
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that avoids a full-table COUNT(*) on large unfiltered changelists
+
+    Filtered querysets are still counted exactly. For the unfiltered table the
+    planner's row estimate is used (pg_class on PostgreSQL, the row count
+    ANALYZE stored in sqlite_stat1 on SQLite) once it goes over
+    ADMIN_ESTIMATED_COUNT_THRESHOLD rows. Without statistics the table is
+    counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if getattr(queryset, 'query', None) is None or queryset.query.where:
+            return super().count
+
+        estimate = self._estimate(queryset)
+        if estimate is None or estimate < timetable_setting('ADMIN_ESTIMATED_COUNT_THRESHOLD', 10000):
+            return super().count
+        return estimate
+
+    @staticmethod
+    def _estimate(queryset):
+        """Approximate row count for the queryset's base table"""
+        table = queryset.model._meta.db_table
+        connection = connections[queryset.db]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+                row = cursor.fetchone()
+                return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+            if connection.vendor == 'sqlite':
+                # MAX(rowid) only grows, so it overstates tables that had rows deleted or archived
+                try:
+                    cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+                except DatabaseError:
+                    return None  # ANALYZE has never run
+                row = cursor.fetchone()
+                # The first number of the stat column is the table's row count at the last ANALYZE
+                count = row[0].split()[0] if row and row[0] else ''
+                return int(count) if count.isdigit() else None
+        return None
+
+# kind: (fields matched exactly, fields matched as a prefix) by changelist searches, case-insensitive
+CHANGELIST_SEARCH_FIELDS = {
+    'teacher': (['employee_id', 'user__username', 'user__email'], ['user__first_name', 'user__last_name']),
+    'subject': (['code'], ['name']),
+    'room': (['room_number'], ['name', 'building']),
+    'class': (['section'], ['name']),
+}
+
+def changelist_match(kind, term):
+    """Q for objects of a kind whose codes equal the term or whose names start with it"""
+    exact, prefix = CHANGELIST_SEARCH_FIELDS[kind]
+    condition = Q()
+    for field in exact:
+        condition |= Q(**{f'{field}__iexact': term})
+    for field in prefix:
+        condition |= Q(**{f'{field}__istartswith': term})
+    if kind == 'teacher' and ' ' in term:
+        first_name, last_name = term.split(None, 1)
+        condition |= Q(user__first_name__iexact=first_name, user__last_name__istartswith=last_name)
+    return condition
+
+class IndexedSearchMixin:
+    """Changelist search on codes and names, autocomplete search from the trigram index
+
+    indexed_search maps search-index kinds to the field of this model holding
+    their ids; rows matching any of them are returned. The changelist wants
+    every row that matches, so codes (employee id, username, email, subject
+    code, room number) must match exactly and names by prefix. The admin's
+    autocomplete widgets rank a page of fuzzy matches from the index, so
+    misspelt or unfinished names still find something.
+    """
+    indexed_search = {}
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return super().get_search_results(request, queryset, search_term)
+
+        match = getattr(request, 'resolver_match', None)
+        condition = Q()
+        for kind, field in self.indexed_search.items():
+            if match is not None and match.url_name == 'autocomplete':
+                ids = search_ids(term, kind)
+            else:
+                # Subqueries rather than joins, so the changelist query keeps its shape
+                ids = SOURCES[kind][0].objects.filter(changelist_match(kind, term)).values('id')
+            condition |= Q(**{f'{field}__in': ids})
+        return queryset.filter(condition), False
+
+class DepartmentSubqueryFilter(admin.SimpleListFilter):
+    """Filter time slots by class department without joining Class into the changelist"""
+    title = 'department'
+    parameter_name = 'department'
+
+    def lookups(self, request, model_admin):
+        return [(department.id, str(department)) for department in Department.objects.all()]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(
+                school_class_id__in=Class.objects.filter(department_id=self.value()).values('id')
+            )
+        return queryset
+
+class BreakPeriodFilter(admin.SimpleListFilter):
+    """Filter time slots on break periods using a period id subquery"""
+    title = 'break period'
+    parameter_name = 'is_break'
+
+    def lookups(self, request, model_admin):
+        return [('1', 'Yes'), ('0', 'No')]
+
+    def queryset(self, request, queryset):
+        if self.value() in ('0', '1'):
+            break_periods = Period.objects.filter(is_break=self.value() == '1').values('id')
+            return queryset.filter(period_id__in=break_periods)
+        return queryset
 
 @admin.register(School)
 class SchoolAdmin(admin.ModelAdmin):
@@ -22,38 +153,81 @@ class DepartmentAdmin(admin.ModelAdmin):
     ordering = ['code']
 
 @admin.register(Subject)
-class SubjectAdmin(admin.ModelAdmin):
-    list_display = ['code', 'name', 'department', 'credits', 'is_active']
-    list_filter = ['department', 'is_active', 'credits']
+class SubjectAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ['code', 'name', 'department', 'credits', 'required_room_type', 'is_active']
+    list_filter = ['department', 'is_active', 'credits', 'required_room_type']
     search_fields = ['name', 'code']
+    indexed_search = {'subject': 'id'}
     ordering = ['code']
     list_editable = ['is_active']
 
 @admin.register(Teacher)
-class TeacherAdmin(admin.ModelAdmin):
+class TeacherAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ['employee_id', 'get_full_name', 'department', 'specialization', 'is_active', 'get_workload']
     list_filter = ['department', 'is_active']
     search_fields = ['employee_id', 'user__first_name', 'user__last_name', 'user__username']
+    indexed_search = {'teacher': 'id'}
     ordering = ['employee_id']
     list_editable = ['is_active']
+    raw_id_fields = ['user']
+
+    def get_queryset(self, request):
+        # This year's workload is computed in the changelist query instead of one COUNT per row;
+        # the user is joined so autocomplete labels don't look it up per option
+        return super().get_queryset(request).select_related('user', 'department').annotate(
+            workload=Count('timeslot', filter=Q(
+                timeslot__is_active=True, timeslot__academic_year=current_academic_year()
+            ))
+        )
 
     def get_full_name(self, obj):
         return obj.user.get_full_name() or obj.user.username
     get_full_name.short_description = 'Full Name'
+    get_full_name.admin_order_field = 'user__last_name'
 
     def get_workload(self, obj):
         """Show current workload"""
-        total_periods = TimeSlot.objects.filter(teacher=obj, is_active=True).count()
-        return f"{total_periods} periods/week"
+        return f"{obj.workload} periods/week"
     get_workload.short_description = 'Current Workload'
+    get_workload.admin_order_field = 'workload'
 
 @admin.register(ClassRoom)
-class ClassRoomAdmin(admin.ModelAdmin):
-    list_display = ['room_number', 'name', 'room_type', 'capacity', 'floor', 'building', 'get_features', 'is_active']
+class ClassRoomAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    list_display = ['room_number', 'name', 'room_type', 'capacity', 'floor', 'building', 'get_features', 'get_utilization', 'is_active']
     list_filter = ['room_type', 'building', 'floor', 'is_active', 'has_projector', 'has_computer']
     search_fields = ['room_number', 'name', 'building']
+    indexed_search = {'room': 'id'}
     ordering = ['room_number']
     list_editable = ['is_active']
+    # The unfiltered total would repeat the paginator's COUNT over the bookings join
+    show_full_result_count = False
+
+    @staticmethod
+    def _teaching_cells(request):
+        """Teaching periods in the week, counted once per request (get_queryset runs several times)"""
+        if not hasattr(request, '_timetable_teaching_cells'):
+            working_days = len(timetable_setting('DEFAULT_WORKING_DAYS', ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT']))
+            request._timetable_teaching_cells = Period.objects.filter(is_break=False).count() * working_days
+        return request._timetable_teaching_cells
+
+    def get_queryset(self, request):
+        # Utilization = active teaching bookings of the current year / teaching cells in the week, computed in SQL
+        total_cells = self._teaching_cells(request)
+        bookings = Count('timeslot', filter=Q(
+            timeslot__is_active=True, timeslot__period__is_break=False, timeslot__academic_year=current_academic_year()
+        ))
+        return super().get_queryset(request).annotate(
+            bookings=bookings,
+            utilization=ExpressionWrapper(
+                F('bookings') * 100.0 / Value(total_cells or 1), output_field=FloatField()
+            ),
+        )
+
+    def get_utilization(self, obj):
+        """Share of teaching periods in the week the room is booked"""
+        return f"{obj.utilization:.1f}% ({obj.bookings} periods)"
+    get_utilization.short_description = 'Utilization'
+    get_utilization.admin_order_field = 'utilization'
 
     def get_features(self, obj):
         """Display room features as badges"""
@@ -68,12 +242,15 @@ class ClassRoomAdmin(admin.ModelAdmin):
     get_features.short_description = 'Features'
 
 @admin.register(Class)
-class ClassAdmin(admin.ModelAdmin):
+class ClassAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ['name', 'section', 'grade_level', 'department', 'class_teacher', 'total_students', 'academic_year', 'is_active']
     list_filter = ['grade_level', 'department', 'academic_year', 'is_active']
     search_fields = ['name', 'section']
+    indexed_search = {'class': 'id'}
     ordering = ['grade_level', 'section']
     list_editable = ['is_active', 'total_students']
+    list_select_related = ['department', 'class_teacher__user']
+    autocomplete_fields = ['class_teacher']
 
 @admin.register(Period)
 class PeriodAdmin(admin.ModelAdmin):
@@ -83,12 +260,16 @@ class PeriodAdmin(admin.ModelAdmin):
     list_editable = ['order']
 
 @admin.register(TimeSlot)
-class TimeSlotAdmin(admin.ModelAdmin):
+class TimeSlotAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ['school_class', 'day_of_week', 'period', 'subject', 'teacher', 'classroom', 'academic_year', 'is_active']
-    list_filter = ['day_of_week', 'academic_year', 'is_active', 'school_class__department', 'period__is_break']
+    list_filter = ['day_of_week', 'academic_year', 'is_active', DepartmentSubqueryFilter, BreakPeriodFilter]
     search_fields = ['school_class__name', 'subject__name', 'teacher__user__first_name', 'teacher__user__last_name']
+    indexed_search = {'class': 'school_class_id', 'subject': 'subject_id', 'teacher': 'teacher_id', 'room': 'classroom_id'}
     ordering = ['day_of_week', 'period__order']
     list_editable = ['is_active']
+    autocomplete_fields = ['school_class', 'subject', 'teacher', 'classroom']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         ('Basic Information', {
@@ -115,18 +296,122 @@ class ConflictLogAdmin(admin.ModelAdmin):
     search_fields = ['description']
     ordering = ['-created_at']
     readonly_fields = ['created_at', 'resolved_at']
+    raw_id_fields = ['time_slot1', 'time_slot2']
+    list_select_related = [
+        'time_slot1__school_class', 'time_slot1__period', 'time_slot1__subject', 'time_slot1__teacher__user',
+        'time_slot2__school_class', 'time_slot2__period', 'time_slot2__subject', 'time_slot2__teacher__user',
+    ]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def get_time_slots(self, obj):
         """Display involved time slots"""
         return f"{obj.time_slot1} | {obj.time_slot2}"
     get_time_slots.short_description = 'Conflicting Time Slots'
 
+class TemplateCellInline(admin.TabularInline):
+    model = TemplateCell
+    extra = 0
+    autocomplete_fields = ['subject']
+
 @admin.register(TimetableTemplate)
 class TimetableTemplateAdmin(admin.ModelAdmin):
     list_display = ['name', 'department', 'grade_levels', 'is_default', 'created_by', 'created_at']
     list_filter = ['department', 'is_default', 'created_at']
     search_fields = ['name', 'description']
     ordering = ['-created_at']
+    inlines = [TemplateCellInline]
+    actions = ['apply_to_matching_classes']
+
+    @admin.action(description='Apply to matching classes (free cells only)')
+    def apply_to_matching_classes(self, request, queryset):
+        for template in queryset:
+            result = TemplateApplier(template).apply(user=request.user)
+            level = messages.WARNING if result['unassigned'] or result['conflicts'] else messages.SUCCESS
+            self.message_user(
+                request,
+                f"{template.name}: {result['slots']} slots for {result['classes']} classes, "
+                f"{len(result['unassigned'])} without teacher or room, {len(result['conflicts'])} clashes "
+                f"({result['elapsed_ms']} ms)",
+                level,
+            )
+
+@admin.register(AcademicYear)
+class AcademicYearAdmin(admin.ModelAdmin):
+    list_display = ['name', 'start_date', 'end_date', 'is_current', 'is_archived']
+    list_filter = ['is_current', 'is_archived']
+    search_fields = ['name']
+    readonly_fields = ['is_archived']
+
+@admin.register(ArchivedTimeSlot)
+class ArchivedTimeSlotAdmin(admin.ModelAdmin):
+    """Archived years are browsable but never editable"""
+    list_display = ['academic_year', 'class_name', 'day_of_week', 'period_name', 'subject_name', 'teacher_name', 'room_number']
+    list_filter = ['academic_year', 'day_of_week']
+    search_fields = ['class_name', 'subject_name', 'teacher_name', 'room_number']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(TimetableVersion)
+class TimetableVersionAdmin(admin.ModelAdmin):
+    """Versions are created and restored with the timetable_versions command"""
+    list_display = ['name', 'academic_year', 'lesson_count', 'stored_rows', 'base', 'is_automatic', 'created_by', 'created_at']
+    list_filter = ['academic_year', 'is_automatic']
+    search_fields = ['name']
+    list_select_related = ['base', 'created_by']
+    exclude = ['data']
+    readonly_fields = ['academic_year', 'base', 'lesson_count', 'stored_rows', 'revision', 'is_automatic', 'created_by', 'created_at']
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(ProfileRecord)
+class ProfileRecordAdmin(admin.ModelAdmin):
+    """Profiles are recorded by ProfilingMiddleware and the profiled decorator"""
+    list_display = ['name', 'kind', 'duration_ms', 'function_calls', 'status_code', 'user', 'created_at']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['name', 'path']
+    list_select_related = ['user']
+    exclude = ['data', 'summary']
+    readonly_fields = ['kind', 'name', 'path', 'status_code', 'user', 'duration_ms', 'function_calls', 'created_at', 'hot_functions']
+    actions = ['download_profile']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Hottest functions (by own time)')
+    def hot_functions(self, obj):
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>',
+            ((entry['function'], entry['calls'], entry['own_ms'], entry['cumulative_ms']) for entry in obj.summary),
+        )
+        return format_html(
+            '<table><thead><tr><th>Function</th><th>Calls</th><th>Own ms</th><th>Cumulative ms</th></tr></thead>'
+            '<tbody>{}</tbody></table>',
+            rows,
+        )
+
+    @admin.action(description='Download as .prof (pstats, snakeviz)')
+    def download_profile(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, 'Select exactly one profile to download', messages.WARNING)
+            return None
+        record = queryset.get()
+        response = HttpResponse(zlib.decompress(bytes(record.data)), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profile-{record.pk}.prof"'
+        return response
 
 # Customize admin site
 admin.site.site_header = "School Timetable Administration"
@@ -0,0 +1,222 @@
+# apps/timetable/aggregates.py
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import ClassRoom, Period, Subject, Teacher, TimeSlot, TimetableAggregate, current_academic_year
+from .occupancy import working_days
+from .tenancy import current_school_id, tenant_db_alias
+
+# dimension -> (TimeSlot column grouped on, column that must be set for the lesson to count)
+DIMENSION_FIELDS = {
+    'day': ('day_of_week', 'day_of_week'),
+    'subject': ('subject_id', 'subject_id'),
+    'teacher': ('teacher_id', 'teacher_id'),
+    'room': ('classroom_id', 'classroom_id'),
+    'room_period': ('period_id', 'classroom_id'),
+}
+STATE_FIELDS = [
+    'academic_year', 'school_id', 'is_active', 'period__is_break', 'day_of_week', 'subject_id', 'teacher_id', 'classroom_id',
+    'period_id',
+]
+
+def _partition():
+    """TimetableAggregate.school of the active school, 0 for all schools together"""
+    return current_school_id() or 0
+
+def _lessons(academic_year):
+    return TimeSlot.objects.for_year(academic_year).filter(is_active=True, period__is_break=False)
+
+def slot_state(time_slot):
+    """The values of a saved or deleted slot that the aggregates depend on"""
+    try:
+        is_break = time_slot.period.is_break
+    except Period.DoesNotExist:
+        is_break = True
+    state = {field: getattr(time_slot, field) for field in STATE_FIELDS if '__' not in field}
+    state['period__is_break'] = is_break
+    return state
+
+def lesson_states(slot_ids):
+    """slot id -> state, read before a bulk write so the counts can be moved afterwards"""
+    return {row.pop('id'): row for row in TimeSlot.objects.filter(id__in=list(slot_ids)).values('id', *STATE_FIELDS)}
+
+def _keys(state):
+    """(academic_year, school, dimension, key) counters a slot adds one lesson to
+
+    Each lesson counts for all schools together and for its own school.
+    """
+    if not state or not state['is_active'] or state['period__is_break']:
+        return []
+    keys = []
+    for school in {0, state['school_id'] or 0}:
+        keys.append((state['academic_year'], school, 'total', ''))
+        for dimension, (field, required) in DIMENSION_FIELDS.items():
+            if state[required]:
+                keys.append((state['academic_year'], school, dimension, str(state[field])))
+    return keys
+
+def _apply(deltas):
+    """Add the non-zero deltas to the counters of every year and school whose aggregates are built"""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    now = timezone.now()
+    built = set(TimetableAggregate.objects.filter(
+        academic_year__in={key[0] for key in deltas}, dimension='total'
+    ).values_list('academic_year', 'school'))
+    for (academic_year, school, dimension, key), delta in deltas.items():
+        if (academic_year, school) not in built:
+            # Unbuilt years are counted from scratch on first read
+            continue
+        counter = {'academic_year': academic_year, 'school': school, 'dimension': dimension, 'key': key}
+        updated = TimetableAggregate.objects.filter(**counter).update(lessons=F('lessons') + delta, updated_at=now)
+        if not updated:
+            _, created = TimetableAggregate.objects.get_or_create(**counter, defaults={'lessons': delta})
+            if not created:
+                TimetableAggregate.objects.filter(**counter).update(lessons=F('lessons') + delta, updated_at=now)
+
+def record_slot_change(before, after):
+    """Move one lesson's counts from its previous state to its new one; None stands for no slot"""
+    deltas = Counter(_keys(after))
+    deltas.subtract(_keys(before))
+    _apply(deltas)
+
+def record_bulk_slot_changes(before, slot_ids):
+    """Counterpart of record_slot_change for bulk writes, which send no signals
+
+    before holds the lesson_states of the rows read ahead of the write
+    (rows missing from it were created); their state after the write is
+    read here.
+    """
+    deltas = Counter()
+    for state in lesson_states(slot_ids).values():
+        deltas.update(_keys(state))
+    for state in before.values():
+        deltas.subtract(_keys(state))
+    _apply(deltas)
+
+def count_lessons(academic_year):
+    """(dimension, key) -> lessons of a year (of the active school), from one grouped query per dimension"""
+    lessons = _lessons(academic_year)
+    counts = {('total', ''): lessons.count()}
+    for dimension, (field, required) in DIMENSION_FIELDS.items():
+        for value, count in lessons.exclude(**{f'{required}__isnull': True}).order_by().values_list(field).annotate(
+            count=Count('id')
+        ):
+            counts[(dimension, str(value))] = count
+    return counts
+
+def aggregate_drift(academic_year=None):
+    """Stored counts that differ from a fresh count, as (dimension, key, stored, actual)"""
+    academic_year = academic_year or current_academic_year()
+    actual = count_lessons(academic_year)
+    stored = {
+        (dimension, key): lessons
+        for dimension, key, lessons in TimetableAggregate.objects.filter(
+            academic_year=academic_year, school=_partition()
+        ).values_list('dimension', 'key', 'lessons')
+    }
+    return [
+        (dimension, key, stored.get((dimension, key), 0), actual.get((dimension, key), 0))
+        for dimension, key in sorted(set(actual) | set(stored))
+        if stored.get((dimension, key), 0) != actual.get((dimension, key), 0)
+    ]
+
+def rebuild_aggregates(academic_year=None):
+    """Replace a year's stored counts (of the active school) with a fresh count; returns rows per dimension"""
+    academic_year = academic_year or current_academic_year()
+    school = _partition()
+    rows = [
+        TimetableAggregate(academic_year=academic_year, school=school, dimension=dimension, key=key, lessons=lessons)
+        for (dimension, key), lessons in count_lessons(academic_year).items()
+    ]
+    with transaction.atomic(using=tenant_db_alias()):
+        TimetableAggregate.objects.filter(academic_year=academic_year, school=school).delete()
+        TimetableAggregate.objects.bulk_create(rows, batch_size=1000)
+    return dict(Counter(row.dimension for row in rows))
+
+def aggregates(academic_year=None):
+    """dimension -> {key: lessons} for a year (of the active school), counted first if it never was"""
+    academic_year = academic_year or current_academic_year()
+    school = _partition()
+    rows = list(TimetableAggregate.objects.filter(academic_year=academic_year, school=school, lessons__gt=0).values_list(
+        'dimension', 'key', 'lessons'
+    ))
+    if not rows and not TimetableAggregate.objects.filter(
+        academic_year=academic_year, school=school, dimension='total'
+    ).exists():
+        rebuild_aggregates(academic_year)
+        return aggregates(academic_year)
+    counts = {dimension: {} for dimension, _ in TimetableAggregate.DIMENSIONS}
+    for dimension, key, lessons in rows:
+        counts[dimension][key] = lessons
+    return counts
+
+# Slices shown in the subject and teacher charts before the rest is summed as Other
+CHART_SUBJECTS = 8
+CHART_TEACHERS = 10
+
+def _top(counts, names, limit):
+    """Largest counts first as {name: count}, the rest summed under Other
+
+    names is called with the ids of the shown keys only and returns id -> name.
+    """
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], int(item[0])))
+    shown = ranked[:limit]
+    labels = names([int(key) for key, _ in shown])
+    top = {labels.get(int(key), f'#{key}'): count for key, count in shown}
+    rest = sum(count for _, count in ranked[limit:])
+    if rest:
+        top['Other'] = rest
+    return top
+
+def _subject_names(ids):
+    return dict(Subject.objects.filter(id__in=ids).values_list('id', 'name'))
+
+def _teacher_names(ids):
+    return {
+        teacher.id: teacher.user.get_full_name() or teacher.user.username
+        for teacher in Teacher.objects.filter(id__in=ids).select_related('user')
+    }
+
+def _weekly_schedule(counts, **options):
+    day_names = dict(TimeSlot.DAYS_OF_WEEK)
+    return {day_names[day]: counts['day'].get(day, 0) for day in working_days()}
+
+def _subject_distribution(counts, **options):
+    return _top(counts['subject'], _subject_names, CHART_SUBJECTS)
+
+def _teacher_workload(counts, **options):
+    return _top(counts['teacher'], _teacher_names, CHART_TEACHERS)
+
+def _room_occupancy(counts, room_count=None, **options):
+    """Share of the rooms in use in each teaching period, averaged over the working days"""
+    if room_count is None:
+        room_count = ClassRoom.objects.filter(is_active=True).count()
+    capacity = room_count * len(working_days())
+    return {
+        start_time.strftime('%H:%M'): (
+            round(100 * counts['room_period'].get(str(period_id), 0) / capacity, 1) if capacity else 0
+        )
+        for period_id, start_time in Period.objects.filter(is_break=False).order_by('order').values_list('id', 'start_time')
+    }
+
+# Chart context variable -> function of the year's counts
+CHART_PANELS = {
+    'weekly_schedule_data': _weekly_schedule,
+    'subject_distribution_data': _subject_distribution,
+    'teacher_workload_data': _teacher_workload,
+    'room_occupancy_data': _room_occupancy,
+}
+
+def dashboard_charts(academic_year=None, panels=None, **options):
+    """Data of the dashboard charts (all, or the named panels) from the aggregate rows
+
+    options go to the panel functions; room_count saves a query when the
+    caller already knows the number of active rooms.
+    """
+    counts = aggregates(academic_year)
+    return {name: CHART_PANELS[name](counts, **options) for name in panels or CHART_PANELS}
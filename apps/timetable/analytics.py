@@ -0,0 +1,186 @@
+# apps/timetable/analytics.py
+import json
+
+import pandas as pd
+from django.db import transaction
+
+from .conf import timetable_setting
+from .models import Class, ClassRoom, Period, Subject, Teacher, TimeSlot, current_academic_year
+from .occupancy import working_days
+from .snapshot import DAY_CODES, ENCODED, TimetableSnapshot
+from .tenancy import tenant_db_alias
+
+class TimetableFrame:
+    """One academic year's active lessons as a pandas DataFrame, for bulk statistics
+
+    The frame is built from the binary snapshot without another query:
+    every id column is a Categorical whose codes are the snapshot's codes
+    and whose categories are its id table, so a lesson costs a few bytes
+    and grouping runs on small integers. Only lessons in teaching periods
+    of working days are kept. Day and period categories follow timetable
+    order, and class categories include the year's classes without
+    lessons, so pivots and per-class counts cover them too.
+    """
+
+    def __init__(self, lessons, academic_year, days, periods):
+        self.lessons = lessons          # slot_id, class, day, period, subject, teacher, room
+        self.academic_year = academic_year
+        self.days = days
+        self.periods = periods          # DataFrame of teaching periods indexed by id: name, start_time
+        self._labels = {}
+
+    @classmethod
+    def load(cls, academic_year=None, days=None):
+        """Frame of a year (the current one by default) from its snapshot"""
+        academic_year = academic_year or current_academic_year()
+        # Uncommitted writes have not bumped the revision yet, so snapshot them directly
+        use_snapshot = timetable_setting('BINARY_SNAPSHOTS', True) and not transaction.get_connection(tenant_db_alias()).in_atomic_block
+        snapshot = TimetableSnapshot.load(academic_year) if use_snapshot else TimetableSnapshot.build(academic_year)
+        return cls.from_snapshot(snapshot, days=days)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, days=None):
+        days = list(days or working_days())
+        periods = pd.DataFrame.from_records(
+            Period.objects.filter(is_break=False).order_by('order').values('id', 'name', 'start_time'),
+            index='id', columns=['id', 'name', 'start_time'],
+        )
+
+        arrays = snapshot.arrays
+        lessons = pd.DataFrame({
+            'slot_id': arrays['slot_id'],
+            'day': pd.Categorical.from_codes(arrays['day'], categories=DAY_CODES),
+            **{
+                name: pd.Categorical.from_codes(arrays[name], categories=arrays[f'{name}_ids'])
+                for name in ENCODED
+            },
+        })
+        lessons = lessons[lessons['day'].isin(days) & lessons['period'].isin(periods.index)].reset_index(drop=True)
+
+        lessons['day'] = lessons['day'].cat.set_categories(days, ordered=True)
+        lessons['period'] = lessons['period'].cat.set_categories(list(periods.index), ordered=True)
+        class_ids = Class.objects.for_year(snapshot.academic_year).filter(is_active=True).values_list('id', flat=True)
+        missing = sorted(set(class_ids) - set(lessons['class'].cat.categories))
+        if missing:
+            lessons['class'] = lessons['class'].cat.add_categories(missing)
+        return cls(lessons, snapshot.academic_year, days, periods)
+
+    def memory_usage(self):
+        """Bytes held by the lessons frame"""
+        return int(self.lessons.memory_usage(deep=True).sum())
+
+    # Labels
+
+    def labels(self, column):
+        """id (or day code) -> display name for one column, loaded once"""
+        if column not in self._labels:
+            ids = [value for value in self.lessons[column].cat.categories]
+            if column == 'day':
+                names = dict(TimeSlot.DAYS_OF_WEEK)
+            elif column == 'period':
+                names = self.periods['name'].to_dict()
+            elif column == 'teacher':
+                names = {
+                    teacher.id: teacher.user.get_full_name() or teacher.user.username
+                    for teacher in Teacher.objects.filter(id__in=ids).select_related('user')
+                }
+            elif column == 'class':
+                names = {school_class.id: str(school_class) for school_class in Class.objects.filter(id__in=ids)}
+            else:
+                model = {'subject': Subject, 'room': ClassRoom}[column]
+                names = dict(model.objects.filter(id__in=ids).values_list('id', 'name'))
+            self._labels[column] = names
+        return self._labels[column]
+
+    def _labelled(self, frame, index=None, columns=None):
+        """Copy of frame with ids replaced by names; names need not be unique"""
+        frame = frame.copy()
+        if index:
+            names = self.labels(index)
+            frame.index = pd.Index([names.get(value, value) for value in frame.index], name=index)
+        if columns:
+            names = self.labels(columns)
+            frame.columns = pd.Index([names.get(value, value) for value in frame.columns], name=columns)
+        return frame
+
+    # Pivots
+
+    def pivot(self, index, columns, labels=True):
+        """Lesson counts with a row per index value and a column per columns value
+
+        All categories appear, so a teacher free on Saturday still has a
+        Saturday column holding 0.
+        """
+        table = self.lessons.groupby([index, columns], observed=False).size().unstack(fill_value=0)
+        return self._labelled(table, index, columns) if labels else table
+
+    def teacher_by_day(self, labels=True):
+        return self.pivot('teacher', 'day', labels=labels)
+
+    def subject_by_class(self, labels=True):
+        return self.pivot('subject', 'class', labels=labels)
+
+    def room_by_period(self, labels=True):
+        return self.pivot('room', 'period', labels=labels)
+
+    # Per-entity statistics, all entities at once
+
+    def teaching_cells(self):
+        return len(self.days) * len(self.periods)
+
+    def free_periods(self):
+        """Teaching cells without a lesson, for every class of the year"""
+        busy = self.lessons.drop_duplicates(['class', 'day', 'period'])['class'].value_counts(sort=False)
+        return (self.teaching_cells() - busy).sort_index()
+
+    def class_statistics(self, labels=True):
+        """Lessons, distinct subjects, teachers and rooms, and free periods per class"""
+        table = self.lessons.groupby('class', observed=False).agg(
+            total_periods=('slot_id', 'size'),
+            subjects_covered=('subject', 'nunique'),
+            teachers_involved=('teacher', 'nunique'),
+            rooms_used=('room', 'nunique'),
+        )
+        table['free_periods'] = self.free_periods()
+        return self._labelled(table, index='class') if labels else table
+
+    def teacher_workload(self, labels=True):
+        """Lessons per teacher in total and per day, with distinct classes and subjects"""
+        table = self.lessons.groupby('teacher', observed=False).agg(
+            total_periods=('slot_id', 'size'),
+            classes_taught=('class', 'nunique'),
+            subjects_taught=('subject', 'nunique'),
+        ).join(self.pivot('teacher', 'day', labels=False))
+        return self._labelled(table, index='teacher') if labels else table
+
+    def room_utilization(self, labels=True):
+        """Bookings, share of the teaching cells booked and distinct classes per room"""
+        table = self.lessons.groupby('room', observed=False).agg(
+            total_bookings=('slot_id', 'size'),
+            classes_using=('class', 'nunique'),
+        )
+        cells = self.teaching_cells()
+        table['utilization_rate'] = (table['total_bookings'] * 100 / cells).round(2) if cells else 0.0
+        return self._labelled(table, index='room') if labels else table
+
+    def distributions(self):
+        """Count, mean, spread and quartiles of lessons per teacher, subject, room, class, day and period"""
+        return pd.DataFrame({
+            column: self.lessons[column].value_counts(sort=False).describe()
+            for column in ('teacher', 'subject', 'room', 'class', 'day', 'period')
+        }).T.round(2)
+
+# Frames served by the analytics endpoint and the export_analytics command: name -> function(frame, labels)
+PIVOTS = {
+    'teacher_by_day': TimetableFrame.teacher_by_day,
+    'subject_by_class': TimetableFrame.subject_by_class,
+    'room_by_period': TimetableFrame.room_by_period,
+    'class_statistics': TimetableFrame.class_statistics,
+    'teacher_workload': TimetableFrame.teacher_workload,
+    'room_utilization': TimetableFrame.room_utilization,
+    'distributions': lambda frame, labels=True: frame.distributions(),
+}
+
+def frame_json(frame):
+    """A DataFrame as {'index', 'columns', 'data'} with plain JSON values"""
+    return json.loads(frame.to_json(orient='split'))
@@ -1,4 +1,4 @@
-# apps/timetable/apps.py (QUICK FIX)  
+# apps/timetable/apps.py
 from django.apps import AppConfig
 
 class TimetableConfig(AppConfig):
@@ -6,6 +6,14 @@ class TimetableConfig(AppConfig):
     name = 'apps.timetable'
     verbose_name = 'Timetable Management'
 
-    # Comment out signals import until signals.py is created
-    # def ready(self):
-    #     import apps.timetable.signals
+    def ready(self):
+        import apps.timetable.signals
+        from celery.signals import task_prerun
+        from django.core.signals import request_started
+        from django.db.backends.signals import connection_created
+        from .db import configure_sqlite_connection
+        from .routers import unpin_primary
+
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='timetable_sqlite_pragmas')
+        request_started.connect(unpin_primary, dispatch_uid='timetable_unpin_primary')
+        task_prerun.connect(unpin_primary, dispatch_uid='timetable_unpin_primary_task')
@@ -0,0 +1,192 @@
+# apps/timetable/benchmarks.py
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from .db import SQLITE_PROFILES
+
+DAYS = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT']
+
+# Each configuration mirrors a way the site can be deployed
+SQLITE_CONFIGURATIONS = {
+    # Stock Django settings: rollback journal, new connection per request
+    'default': {'pragmas': {}, 'persistent': False, 'replica': False},
+    # WAL only, still a connection per request
+    'wal': {'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'}, 'persistent': False, 'replica': False},
+    # TIMETABLE_DB_PROFILE=production under the default ASGI workers: WAL, tuned pragmas, a connection per request
+    'production': {'pragmas': SQLITE_PROFILES['production'], 'persistent': False, 'replica': False},
+    # production under the sync/gthread WSGI workers, which keep connections open (CONN_MAX_AGE=600)
+    'production+wsgi': {'pragmas': SQLITE_PROFILES['production'], 'persistent': True, 'replica': False},
+    # production plus reads served from a refreshed replica file
+    'production+replica': {'pragmas': SQLITE_PROFILES['production'], 'persistent': False, 'replica': True},
+}
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def _connect(path, pragmas):
+    # Same 5s lock timeout Django uses for SQLite by default
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+    return connection
+
+def _seed(path, rows, classes):
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.executescript('''
+        CREATE TABLE slot (
+            id INTEGER PRIMARY KEY, class_id INTEGER, day TEXT, period INTEGER,
+            teacher_id INTEGER, room_id INTEGER, subject_id INTEGER,
+            notes TEXT DEFAULT '', updated_at REAL
+        );
+        CREATE INDEX slot_class_day ON slot (class_id, day);
+        CREATE INDEX slot_teacher_day ON slot (teacher_id, day);
+    ''')
+    connection.execute('BEGIN')
+    connection.executemany(
+        'INSERT INTO slot (class_id, day, period, teacher_id, room_id, subject_id, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (
+            (i % classes, DAYS[(i // classes) % len(DAYS)], (i // (classes * len(DAYS))) % 8,
+             random.randrange(classes * 2), random.randrange(classes), random.randrange(20), time.time())
+            for i in range(rows)
+        ),
+    )
+    connection.execute('COMMIT')
+    connection.close()
+
+def _copy(source_path, target_path):
+    temp_path = f'{target_path}.tmp'
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(temp_path)
+    source.backup(target)
+    target.close()
+    source.close()
+    os.replace(temp_path, target_path)
+
+def _reader(path, pragmas, persistent, classes, deadline, results):
+    latencies, errors = [], 0
+    connection = _connect(path, pragmas) if persistent else None
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            conn = connection or _connect(path, pragmas)
+            conn.execute(
+                'SELECT id, day, period, teacher_id, room_id, subject_id FROM slot WHERE class_id = ? ORDER BY day, period',
+                (random.randrange(classes),),
+            ).fetchall()
+            conn.execute(
+                'SELECT day, COUNT(*) FROM slot WHERE teacher_id = ? GROUP BY day',
+                (random.randrange(classes * 2),),
+            ).fetchall()
+            if connection is None:
+                conn.close()
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+    results.put(('read', latencies, errors))
+
+def _writer(path, pragmas, persistent, rows, deadline, results):
+    latencies, errors = [], 0
+    connection = _connect(path, pragmas) if persistent else None
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            conn = connection or _connect(path, pragmas)
+            conn.execute('BEGIN IMMEDIATE')
+            for _ in range(5):
+                conn.execute(
+                    'UPDATE slot SET notes = ?, updated_at = ? WHERE id = ?',
+                    ('edited', time.time(), random.randrange(1, rows + 1)),
+                )
+            conn.execute('COMMIT')
+            if connection is None:
+                conn.close()
+            latencies.append(time.perf_counter() - started)
+        except sqlite3.OperationalError:
+            errors += 1
+            try:
+                conn.execute('ROLLBACK')
+            except sqlite3.Error:
+                pass
+    results.put(('write', latencies, errors))
+
+def _refresher(primary_path, replica_path, interval, deadline):
+    while time.time() < deadline:
+        time.sleep(interval)
+        _copy(primary_path, replica_path)
+
+def run_sqlite_benchmark(name, readers=4, writers=1, duration=5.0, rows=20000, classes=60, replica_interval=1.0):
+    """Run concurrent reader and writer processes against a fresh database file
+
+    Returns throughput, latency percentiles (ms) and lock errors for one
+    configuration from SQLITE_CONFIGURATIONS.
+    """
+    config = SQLITE_CONFIGURATIONS[name]
+    context = multiprocessing.get_context()
+
+    with tempfile.TemporaryDirectory() as directory:
+        primary = os.path.join(directory, 'primary.sqlite3')
+        replica = os.path.join(directory, 'replica.sqlite3')
+        _seed(primary, rows, classes)
+        # Journal mode is a property of the file, set it before workers start
+        _connect(primary, config['pragmas']).close()
+
+        read_path = primary
+        if config['replica']:
+            _copy(primary, replica)
+            read_path = replica
+
+        results = context.Queue()
+        deadline = time.time() + duration
+        processes = [
+            context.Process(target=_reader, args=(read_path, config['pragmas'], config['persistent'], classes, deadline, results))
+            for _ in range(readers)
+        ] + [
+            context.Process(target=_writer, args=(primary, config['pragmas'], config['persistent'], rows, deadline, results))
+            for _ in range(writers)
+        ]
+        if config['replica']:
+            processes.append(context.Process(target=_refresher, args=(primary, replica, replica_interval, deadline)))
+
+        for process in processes:
+            process.start()
+
+        reads, writes, read_errors, write_errors = [], [], 0, 0
+        for _ in range(readers + writers):
+            kind, latencies, errors = results.get()
+            if kind == 'read':
+                reads.extend(latencies)
+                read_errors += errors
+            else:
+                writes.extend(latencies)
+                write_errors += errors
+
+        for process in processes:
+            process.join()
+
+    def summary(latencies, errors):
+        return {
+            'ops': len(latencies),
+            'ops_per_sec': round(len(latencies) / duration, 1),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+            'lock_errors': errors,
+        }
+
+    return {
+        'configuration': name,
+        'readers': readers,
+        'writers': writers,
+        'duration': duration,
+        'reads': summary(reads, read_errors),
+        'writes': summary(writes, write_errors),
+    }
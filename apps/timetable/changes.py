@@ -0,0 +1,131 @@
+# apps/timetable/changes.py
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .conf import timetable_setting
+from .models import TimeSlot, TimeSlotChange, TimetableRevision, current_academic_year
+from .tenancy import current_school_id, tenant_db_alias
+
+STATE_FIELDS = ['school_class_id', 'subject_id', 'teacher_id', 'classroom_id', 'day_of_week', 'period_id', 'is_active']
+
+class CursorExpired(Exception):
+    """The client's cursor predates pruned changes; it has to reload the timetable"""
+
+def slot_state(time_slot):
+    return {field: getattr(time_slot, field) for field in STATE_FIELDS}
+
+def record_change(time_slot, action=TimeSlotChange.SAVE):
+    """Log one slot write; called from the TimeSlot signals"""
+    TimeSlotChange.objects.create(
+        academic_year=time_slot.academic_year,
+        school_id=time_slot.school_id,
+        slot_id=time_slot.pk,
+        action=action,
+        data=slot_state(time_slot) if action == TimeSlotChange.SAVE else None,
+    )
+
+def record_bulk_changes(slot_ids):
+    """Log bulk_create/bulk_update writes, which send no signals, from the rows' current state"""
+    now = timezone.now()
+    changes = [
+        TimeSlotChange(
+            academic_year=row['academic_year'], school_id=row['school_id'], slot_id=row['id'],
+            action=TimeSlotChange.SAVE, data={field: row[field] for field in STATE_FIELDS}, created_at=now,
+        )
+        for row in TimeSlot.objects.filter(id__in=list(slot_ids)).values(
+            'id', 'academic_year', 'school_id', *STATE_FIELDS
+        )
+    ]
+    TimeSlotChange.objects.bulk_create(changes, batch_size=500)
+    return len(changes)
+
+def _pruned_through(academic_year):
+    return TimetableRevision.objects.filter(school_id=current_school_id(), academic_year=academic_year).values_list(
+        'changes_pruned_through', flat=True
+    ).first() or 0
+
+def head_cursor(academic_year=None):
+    """Cursor a client should start from right after loading the full timetable"""
+    academic_year = academic_year or current_academic_year()
+    latest = TimeSlotChange.objects.filter(academic_year=academic_year).aggregate(latest=Max('id'))['latest']
+    if latest is not None:
+        return latest
+    return _pruned_through(academic_year)
+
+def _change_json(change):
+    return {
+        'cursor': change.id,
+        'slot_id': change.slot_id,
+        'action': change.action,
+        'slot': change.data,
+        'at': change.created_at.isoformat(),
+    }
+
+def changes_since(cursor, academic_year=None, limit=500):
+    """Changes after a cursor, oldest first; raises CursorExpired if they were pruned"""
+    academic_year = academic_year or current_academic_year()
+    pruned_through = _pruned_through(academic_year)
+    if cursor < pruned_through:
+        raise CursorExpired(f'Changes up to cursor {pruned_through} have been pruned')
+
+    changes = list(TimeSlotChange.objects.filter(academic_year=academic_year, id__gt=cursor)[:limit + 1])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    return {
+        'academic_year': academic_year,
+        'cursor': changes[-1].id if changes else cursor,
+        'has_more': has_more,
+        'changes': [_change_json(change) for change in changes],
+    }
+
+def compact_changes(academic_year):
+    """Delete entries superseded by a later entry for the same slot"""
+    latest = (
+        TimeSlotChange.objects.filter(academic_year=academic_year)
+        .values('slot_id').annotate(latest=Max('id')).values('latest')
+    )
+    deleted, _ = TimeSlotChange.objects.filter(academic_year=academic_year).exclude(id__in=latest).delete()
+    return deleted
+
+def prune_changes(academic_year=None, days=None, keep=None, compact=True):
+    """Keep the log bounded: compact it, then drop entries older than days or beyond the newest keep
+
+    Compaction leaves every cursor valid. Dropping entries moves the year's
+    pruned-through cursor (the active school's and every school's), and
+    older cursors get CursorExpired.
+    """
+    academic_year = academic_year or current_academic_year()
+    days = timetable_setting('CHANGE_LOG_RETENTION_DAYS', 30) if days is None else days
+    keep = timetable_setting('CHANGE_LOG_MAX_ENTRIES', 100000) if keep is None else keep
+    year_changes = TimeSlotChange.objects.filter(academic_year=academic_year)
+
+    compacted = compact_changes(academic_year) if compact else 0
+
+    boundary = 0
+    if days:
+        boundary = year_changes.filter(created_at__lt=timezone.now() - timedelta(days=days)).aggregate(
+            boundary=Max('id')
+        )['boundary'] or 0
+    if keep:
+        beyond = year_changes.order_by('-id').values_list('id', flat=True)[keep:keep + 1]
+        boundary = max([boundary, *beyond])
+
+    pruned = 0
+    if boundary:
+        with transaction.atomic(using=tenant_db_alias()):
+            pruned, _ = year_changes.filter(id__lte=boundary).delete()
+            TimetableRevision.current(academic_year)
+            TimetableRevision.objects.filter(
+                academic_year=academic_year, changes_pruned_through__lt=boundary
+            ).update(changes_pruned_through=boundary)
+
+    return {
+        'academic_year': academic_year,
+        'compacted': compacted,
+        'pruned': pruned,
+        'pruned_through': boundary,
+        'remaining': year_changes.count(),
+    }
@@ -0,0 +1,6 @@
+# apps/timetable/conf.py
+from django.conf import settings
+
+def timetable_setting(name, default=None):
+    """Read a value from TIMETABLE_SETTINGS with a fallback"""
+    return getattr(settings, 'TIMETABLE_SETTINGS', {}).get(name, default)
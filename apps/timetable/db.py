@@ -0,0 +1,58 @@
+# apps/timetable/db.py
+import logging
+
+from .conf import timetable_setting
+
+logger = logging.getLogger(__name__)
+
+# Pragmas applied to every new SQLite connection, per TIMETABLE_SETTINGS['DB_PROFILE'].
+# TIMETABLE_SETTINGS['SQLITE_PRAGMAS'] replaces the profile's set entirely.
+SQLITE_PROFILES = {
+    'development': {},
+    'production': {
+        'journal_mode': 'WAL',        # readers no longer block on the writer
+        'synchronous': 'NORMAL',      # safe with WAL, far fewer fsyncs than FULL
+        'busy_timeout': 5000,         # wait for the write lock instead of failing immediately
+        'cache_size': -64000,         # ~64 MB page cache per connection
+        'mmap_size': 268435456,       # map up to 256 MB of the file
+        'temp_store': 'MEMORY',
+    },
+}
+
+def sqlite_pragmas():
+    """Pragmas for the configured database profile"""
+    pragmas = timetable_setting('SQLITE_PRAGMAS')
+    if pragmas is None:
+        pragmas = SQLITE_PROFILES.get(timetable_setting('DB_PROFILE', 'development'), {})
+    return pragmas
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """connection_created receiver applying the SQLite performance pragmas"""
+    if connection.vendor != 'sqlite':
+        return
+
+    pragmas = sqlite_pragmas()
+    if not pragmas:
+        return
+
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            try:
+                cursor.execute(f'PRAGMA {name} = {value}')
+            except Exception:
+                # e.g. journal_mode on an in-memory test database
+                logger.warning('Could not apply PRAGMA %s = %s on %s', name, value, connection.alias)
+
+def refresh_table_statistics(model, using):
+    """ANALYZE a model's table on SQLite after bulk deletes or inserts
+
+    The admin's estimated changelist counts read sqlite_stat1, which only
+    changes when ANALYZE runs. Other databases keep their own statistics.
+    """
+    from django.db import connections
+
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
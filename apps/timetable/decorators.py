@@ -0,0 +1,21 @@
+# apps/timetable/decorators.py
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+
+def async_login_required(view_func):
+    """login_required for async views
+
+    request.user is loaded lazily with a synchronous query, so it is resolved
+    on the sync thread before the view runs.
+    """
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,198 @@
+# apps/timetable/ical.py
+import datetime
+import hashlib
+import zoneinfo
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+
+from .conf import timetable_setting
+from .models import AcademicYear, TimeSlot, TimetableRevision, current_academic_year
+from .tenancy import tenant_key
+
+# Feed kind -> TimeSlot column it filters on
+FEED_KINDS = {
+    'class': 'school_class_id',
+    'teacher': 'teacher_id',
+    'room': 'classroom_id',
+}
+TOKEN_SALT = 'timetable.ical'
+WEEKDAYS = {'MON': 0, 'TUE': 1, 'WED': 2, 'THU': 3, 'FRI': 4, 'SAT': 5, 'SUN': 6}
+
+def feed_token(kind, obj_id):
+    """Signed, URL-safe token naming one feed; calendar apps cannot log in"""
+    return signing.dumps([kind, obj_id], salt=TOKEN_SALT)
+
+def read_feed_token(token):
+    """(kind, obj_id) from a token, or None if it is forged or malformed"""
+    try:
+        kind, obj_id = signing.loads(token, salt=TOKEN_SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    if kind not in FEED_KINDS:
+        return None
+    return kind, int(obj_id)
+
+def academic_year_dates(academic_year):
+    """First and last day of an academic year, from AcademicYear or the configured start month"""
+    dates = AcademicYear.objects.filter(name=academic_year).values_list('start_date', 'end_date').first()
+    start, end = dates if dates else (None, None)
+    if start is None:
+        start_month = timetable_setting('ACADEMIC_YEAR_START_MONTH', 6)
+        start = datetime.date(int(academic_year[:4]), start_month, 1)
+    if end is None:
+        end = start.replace(year=start.year + 1) - datetime.timedelta(days=1)
+    return start, end
+
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+    )
+
+def _fold(line):
+    """Fold a content line at 75 octets as RFC 5545 requires"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        # Do not split a multi-byte character
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+    parts.append(encoded.decode())
+    return '\r\n '.join(parts)
+
+def _utc_offset(offset):
+    seconds = int(offset.total_seconds())
+    sign = '-' if seconds < 0 else '+'
+    return f'{sign}{abs(seconds) // 3600:02d}{abs(seconds) % 3600 // 60:02d}'
+
+def _transitions(zone, start, end):
+    """UTC instants in [start, end) where the zone's offset changes, found a day at a time"""
+    def offset(moment):
+        return moment.astimezone(zone).utcoffset()
+
+    day = datetime.timedelta(days=1)
+    moment = datetime.datetime.combine(start, datetime.time(), tzinfo=datetime.timezone.utc)
+    limit = datetime.datetime.combine(end, datetime.time(), tzinfo=datetime.timezone.utc)
+    found = []
+    while moment < limit:
+        if offset(moment) != offset(moment + day):
+            # Offsets change on whole minutes, so bisect down to one
+            low, high = moment, moment + day
+            while high - low > datetime.timedelta(minutes=1):
+                middle = low + (high - low) / 2
+                low, high = (middle, high) if offset(middle) == offset(low) else (low, middle)
+            found.append(high.replace(second=0, microsecond=0))
+        moment += day
+    return found
+
+def _vtimezone(tz_name, start, end):
+    """VTIMEZONE lines for tz_name, with every offset change from a year before start until end"""
+    zone = zoneinfo.ZoneInfo(tz_name)
+    transitions = _transitions(zone, start - datetime.timedelta(days=366), end + datetime.timedelta(days=1))
+    lines = ['BEGIN:VTIMEZONE', f'TZID:{tz_name}']
+    if not transitions:
+        moment = datetime.datetime.combine(start, datetime.time(), tzinfo=zone)
+        offset = _utc_offset(moment.utcoffset())
+        return lines + [
+            'BEGIN:STANDARD', 'DTSTART:19700101T000000', f'TZOFFSETFROM:{offset}', f'TZOFFSETTO:{offset}',
+            f'TZNAME:{moment.tzname()}', 'END:STANDARD', 'END:VTIMEZONE',
+        ]
+    for moment in transitions:
+        before = (moment - datetime.timedelta(minutes=1)).astimezone(zone)
+        after = moment.astimezone(zone)
+        component = 'DAYLIGHT' if after.dst() else 'STANDARD'
+        # The onset is given in the local time in effect before it
+        onset = (moment + before.utcoffset()).replace(tzinfo=None)
+        lines += [
+            f'BEGIN:{component}',
+            f'DTSTART:{onset:%Y%m%dT%H%M%S}',
+            f'TZOFFSETFROM:{_utc_offset(before.utcoffset())}',
+            f'TZOFFSETTO:{_utc_offset(after.utcoffset())}',
+            f'TZNAME:{after.tzname()}',
+            f'END:{component}',
+        ]
+    return lines + ['END:VTIMEZONE']
+
+def build_calendar(kind, obj_id, academic_year=None):
+    """iCalendar text with one weekly recurring event per lesson, from a single query"""
+    academic_year = academic_year or current_academic_year()
+    start, end = academic_year_dates(academic_year)
+    tz_name = settings.TIME_ZONE
+    host = timetable_setting('ICAL_UID_DOMAIN', 'school-timetable')
+    stamp = timezone.now().strftime('%Y%m%dT%H%M%SZ')
+    # UNTIL has to be in UTC when DTSTART carries a TZID (RFC 5545, 3.3.10)
+    last_moment = datetime.datetime.combine(end, datetime.time(23, 59, 59), tzinfo=zoneinfo.ZoneInfo(tz_name))
+    until = last_moment.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+    slots = (
+        TimeSlot.objects.for_year(academic_year)
+        .filter(is_active=True, period__is_break=False, **{FEED_KINDS[kind]: obj_id})
+        .select_related('school_class', 'subject', 'teacher__user', 'classroom', 'period')
+        .order_by('day_of_week', 'period__order')
+    )
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//School Timetable//Timetable Feed//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(f"Timetable {academic_year}")}',
+        f'X-WR-TIMEZONE:{tz_name}',
+        *_vtimezone(tz_name, start, end),
+    ]
+    for slot in slots:
+        weekday = WEEKDAYS[slot.day_of_week]
+        first_day = start + datetime.timedelta(days=(weekday - start.weekday()) % 7)
+        if first_day > end:
+            continue
+
+        summary = slot.subject.name if slot.subject else 'Lesson'
+        details = [str(slot.school_class)]
+        if slot.teacher:
+            details.append(slot.teacher.user.get_full_name() or slot.teacher.user.username)
+        if slot.notes:
+            details.append(slot.notes)
+
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:timeslot-{slot.id}@{host}',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART;TZID={tz_name}:{datetime.datetime.combine(first_day, slot.period.start_time):%Y%m%dT%H%M%S}',
+            f'DTEND;TZID={tz_name}:{datetime.datetime.combine(first_day, slot.period.end_time):%Y%m%dT%H%M%S}',
+            f'RRULE:FREQ=WEEKLY;UNTIL={until}',
+            f'SUMMARY:{_escape(summary)}',
+            f'DESCRIPTION:{_escape(chr(10).join(details))}',
+        ]
+        if slot.classroom:
+            lines.append(f'LOCATION:{_escape(f"{slot.classroom.name} ({slot.classroom.room_number})")}')
+        lines.append('END:VEVENT')
+    lines.append('END:VCALENDAR')
+
+    return '\r\n'.join(_fold(line) for line in lines) + '\r\n'
+
+def cached_feed(kind, obj_id, academic_year=None):
+    """(body, etag) for a feed, cached per timetable revision
+
+    Any committed TimeSlot write bumps the revision and so changes the cache
+    key, as do edits to the subjects, teachers, classes, rooms and periods
+    the events name (see apps/timetable/signals.py); unchanged feeds are
+    served from the cache without touching TimeSlot.
+    """
+    academic_year = academic_year or current_academic_year()
+    revision, key = TimetableRevision.current(academic_year)
+    cache_key = tenant_key(f'timetable:ical:{kind}:{obj_id}:{academic_year}:{key}:{revision}')
+
+    cached = cache.get(cache_key)
+    if cached is None:
+        body = build_calendar(kind, obj_id, academic_year)
+        cached = (body, hashlib.sha1(body.encode()).hexdigest())
+        cache.set(cache_key, cached, timetable_setting('ICAL_CACHE_TIMEOUT', 24 * 60 * 60))
+    return cached
@@ -0,0 +1,192 @@
+# apps/timetable/instrumentation.py
+import hashlib
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.db import connections
+
+from .conf import timetable_setting
+
+# Collapse literal lists and whitespace so "IN (%s, %s)" and "IN (%s)" share a fingerprint
+_PLACEHOLDER_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+# Keep log lines bounded even for very wide SELECTs
+MAX_LOGGED_SQL = 2000
+
+def fingerprint_sql(sql):
+    """Return a short, parameter-independent fingerprint for a SQL statement"""
+    normalized = _PLACEHOLDER_LIST.sub('(%s...)', sql)
+    normalized = _WHITESPACE.sub(' ', normalized).strip()
+    return hashlib.md5(normalized.encode('utf-8')).hexdigest()[:12]
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block of code goes over its declared query budget"""
+
+    def __init__(self, label, breaches, report):
+        self.label = label
+        self.breaches = breaches
+        self.report = report
+        super().__init__(f"Query budget exceeded for {label}: {'; '.join(breaches)}")
+
+class QueryReport:
+    """Query statistics collected by a QueryRecorder"""
+
+    def __init__(self, queries, elapsed):
+        self.queries = queries
+        self.elapsed = elapsed
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def db_time(self):
+        """Total time spent in the database, in seconds"""
+        return sum(query['duration'] for query in self.queries)
+
+    @property
+    def slowest(self):
+        if not self.queries:
+            return None
+        return max(self.queries, key=lambda query: query['duration'])
+
+    @property
+    def duplicates(self):
+        """Fingerprints executed more than once, most repeated first"""
+        counts = Counter(query['fingerprint'] for query in self.queries)
+        samples = {}
+        for query in self.queries:
+            samples.setdefault(query['fingerprint'], query['sql'])
+
+        return [
+            {'fingerprint': fingerprint, 'count': count, 'sql': samples[fingerprint]}
+            for fingerprint, count in counts.most_common()
+            if count > 1
+        ]
+
+    @property
+    def duplicate_count(self):
+        """Number of queries that repeat an earlier fingerprint"""
+        return sum(entry['count'] - 1 for entry in self.duplicates)
+
+    def check_budget(self, budget):
+        """Compare against a budget dict and return a list of breach messages"""
+        breaches = []
+        max_queries = budget.get('max_queries')
+        if max_queries is not None and self.count > max_queries:
+            breaches.append(f"{self.count} queries > {max_queries}")
+
+        max_db_ms = budget.get('max_db_ms')
+        if max_db_ms is not None and self.db_time * 1000 > max_db_ms:
+            breaches.append(f"{self.db_time * 1000:.1f}ms db time > {max_db_ms}ms")
+
+        max_duplicates = budget.get('max_duplicates')
+        if max_duplicates is not None and self.duplicate_count > max_duplicates:
+            breaches.append(f"{self.duplicate_count} duplicate queries > {max_duplicates}")
+
+        return breaches
+
+    def server_timing(self):
+        """Format the report as a Server-Timing header value"""
+        metrics = [
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.count} queries"',
+            f'dupes;desc="{self.duplicate_count} duplicate queries"',
+            f'total;dur={self.elapsed * 1000:.2f}',
+        ]
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        """Structured summary suitable for logging"""
+        slowest = self.slowest
+        return {
+            'queries': self.count,
+            'db_ms': round(self.db_time * 1000, 2),
+            'total_ms': round(self.elapsed * 1000, 2),
+            'duplicate_queries': self.duplicate_count,
+            'duplicate_fingerprints': [
+                {'fingerprint': entry['fingerprint'], 'count': entry['count']}
+                for entry in self.duplicates[:5]
+            ],
+            'slowest_sql': slowest['sql'][:MAX_LOGGED_SQL] if slowest else None,
+            'slowest_ms': round(slowest['duration'] * 1000, 2) if slowest else None,
+        }
+
+class QueryRecorder:
+    """Context manager recording every query run on the given connections
+
+    Usage:
+        with QueryRecorder() as recorder:
+            ...
+        recorder.report.count
+    """
+
+    def __init__(self, using=None):
+        self.using = using
+        self.queries = []
+        self.report = None
+        self._stack = None
+        self._started = None
+
+    def _connections(self):
+        if self.using is None:
+            return connections.all()
+        aliases = [self.using] if isinstance(self.using, str) else self.using
+        return [connections[alias] for alias in aliases]
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'fingerprint': fingerprint_sql(sql),
+                'duration': time.perf_counter() - start,
+                'alias': context['connection'].alias,
+            })
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in self._connections():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self._started
+        self._stack.close()
+        self.report = QueryReport(self.queries, elapsed)
+        return False
+
+def get_query_budget(label):
+    """Look up the budget declared for a view name in TIMETABLE_SETTINGS"""
+    return timetable_setting('QUERY_BUDGETS', {}).get(label)
+
+class query_budget(QueryRecorder):
+    """QueryRecorder that raises QueryBudgetExceeded when the block goes over budget
+
+    The budget is either passed explicitly or looked up by view name from
+    TIMETABLE_SETTINGS['QUERY_BUDGETS'], so tests can assert the same limits
+    the middleware enforces in production:
+
+        with query_budget('timetable:dashboard'):
+            client.get(reverse('timetable:dashboard'))
+    """
+
+    def __init__(self, label, budget=None, using=None):
+        super().__init__(using=using)
+        self.label = label
+        self.budget = budget if budget is not None else get_query_budget(label)
+        if self.budget is None:
+            raise KeyError(f"No query budget declared for {label}")
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            breaches = self.report.check_budget(self.budget)
+            if breaches:
+                raise QueryBudgetExceeded(self.label, breaches, self.report)
+        return False
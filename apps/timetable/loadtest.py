@@ -0,0 +1,418 @@
+# apps/timetable/loadtest.py
+import datetime
+import platform
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from .aggregates import record_bulk_slot_changes
+from .benchmarks import percentile
+from .changes import record_bulk_changes
+from .conf import timetable_setting
+from .models import (
+    AcademicYear, Class, ClassRoom, Department, Period, School, Subject, Teacher, TimeSlot, TimetableRevision,
+    current_academic_year,
+)
+from .occupancy import working_days
+from .tenancy import school_context, school_for_host, tenant_db_alias
+
+# Request mixes: endpoint -> weight. "default" is the traffic we see in term time
+LOAD_MIXES = {
+    'default': {'grid': 80, 'teacher': 15, 'edit': 5},
+    'read_only': {'grid': 70, 'teacher': 20, 'dashboard': 10},
+    'pages': {'grid': 50, 'teacher': 20, 'dashboard': 20, 'analytics': 5, 'edit': 5},
+    'json': {'class_json': 60, 'teacher': 35, 'edit': 5},
+}
+
+def _grid(targets, rng):
+    return 'GET', reverse('timetable:grid', args=[rng.choice(targets['classes'])]), None
+
+def _class_json(targets, rng):
+    return 'GET', reverse('timetable:class_json', args=[rng.choice(targets['classes'])]), None
+
+def _teacher(targets, rng):
+    return 'GET', reverse('timetable:teacher_json', args=[rng.choice(targets['teachers'])]), None
+
+def _dashboard(targets, rng):
+    return 'GET', reverse('timetable:dashboard'), None
+
+def _analytics(targets, rng):
+    return 'GET', reverse('timetable:analytics'), None
+
+def _edit(targets, rng):
+    """Save a lesson's notes through its admin change form, as a timetabler would"""
+    slot = rng.choice(targets['slots'])
+    data = {
+        'school_class': slot['school_class_id'],
+        'academic_year': slot['academic_year'],
+        'day_of_week': slot['day_of_week'],
+        'period': slot['period_id'],
+        'subject': slot['subject_id'] or '',
+        'teacher': slot['teacher_id'] or '',
+        'classroom': slot['classroom_id'] or '',
+        'notes': f'load test {rng.randrange(10 ** 6)}',
+        'is_active': 'on',
+        '_save': 'Save',
+    }
+    return 'POST', reverse('admin:timetable_timeslot_change', args=[slot['id']]), data
+
+# Endpoint -> function(targets, rng) returning (method, path, form data)
+ENDPOINTS = {
+    'grid': _grid,
+    'class_json': _class_json,
+    'teacher': _teacher,
+    'dashboard': _dashboard,
+    'analytics': _analytics,
+    'edit': _edit,
+}
+
+def load_targets(academic_year=None, sample=200):
+    """Class, teacher and lesson ids the requests pick from"""
+    academic_year = academic_year or current_academic_year()
+    classes = list(Class.objects.for_year(academic_year).filter(is_active=True).values_list('id', flat=True))
+    teachers = list(TimeSlot.objects.for_year(academic_year).filter(
+        is_active=True, teacher__isnull=False
+    ).order_by().values_list('teacher_id', flat=True).distinct())
+    slots = list(TimeSlot.objects.for_year(academic_year).filter(
+        is_active=True, period__is_break=False, subject__isnull=False, teacher__isnull=False
+    ).order_by('?').values(
+        'id', 'school_class_id', 'academic_year', 'day_of_week', 'period_id', 'subject_id', 'teacher_id', 'classroom_id',
+    )[:sample])
+    return {'academic_year': academic_year, 'classes': classes, 'teachers': teachers, 'slots': slots}
+
+def _query_count(server_timing):
+    """Queries reported by QueryInstrumentationMiddleware's Server-Timing header, or None"""
+    match = re.search(r'desc="(\d+) queries"', server_timing or '')
+    return int(match.group(1)) if match else None
+
+class InProcessClient:
+    """Requests through Django's test client: the full middleware stack, no network
+
+    Threads share one interpreter, so this measures per-request cost and
+    query counts rather than how many workers a server needs.
+    """
+
+    def __init__(self, user):
+        self.client = Client(raise_request_exception=False, HTTP_HOST=self.host())
+        self.client.force_login(user)
+
+    @staticmethod
+    def host():
+        # The test client's default host, testserver, is only allowed under the test runner
+        return next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '.')), 'localhost').lstrip('.')
+
+    def request(self, method, path, data=None):
+        if method == 'POST':
+            response = self.client.post(path, data)
+        else:
+            response = self.client.get(path)
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)
+        return response.status_code, response.get('Server-Timing')
+
+    def close(self):
+        connections.close_all()
+
+class HTTPClient:
+    """Requests to a running server (runserver, gunicorn) sharing this database
+
+    The user is logged in by storing a session in the database, and a CSRF
+    cookie is made up locally, so no login form has to be scripted.
+    """
+
+    def __init__(self, user, base_url):
+        self.base_url = base_url.rstrip('/')
+        login = Client()
+        login.force_login(user)
+        session_key = login.cookies[settings.SESSION_COOKIE_NAME].value
+        self.csrf_token = get_random_string(32)
+
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={session_key}; {settings.CSRF_COOKIE_NAME}={self.csrf_token}'
+        self.opener = urllib.request.build_opener(_NoRedirect)
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        request.add_header('Cookie', self.cookie)
+        if method == 'POST':
+            request.add_header('X-CSRFToken', self.csrf_token)
+            request.add_header('Referer', self.base_url + path)
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing')
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code, error.headers.get('Server-Timing')
+
+    def close(self):
+        pass
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects (the admin's answer to a saved form) instead of following them"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+def _worker(make_client, mix, targets, seed, deadline, max_requests, counter, lock, samples):
+    rng = random.Random(seed)
+    names, weights = zip(*mix.items())
+    client = make_client()
+    try:
+        while time.perf_counter() < deadline:
+            if max_requests:
+                with lock:
+                    if counter[0] >= max_requests:
+                        break
+                    counter[0] += 1
+            name = rng.choices(names, weights)[0]
+            method, path, data = ENDPOINTS[name](targets, rng)
+            started = time.perf_counter()
+            try:
+                status, server_timing = client.request(method, path, data)
+            except Exception as error:
+                status, server_timing = type(error).__name__, None
+            samples.append((name, time.perf_counter() - started, status, _query_count(server_timing)))
+    finally:
+        client.close()
+
+def _latencies(latencies):
+    return {
+        f'p{pct}_ms': round(percentile(latencies, pct) * 1000, 2) if latencies else None
+        for pct in (50, 95, 99)
+    }
+
+def _summary(samples, elapsed):
+    latencies = [latency for _, latency, _, _ in samples]
+    queries = [count for _, _, _, count in samples if count is not None]
+    statuses = Counter(str(status) for _, _, status, _ in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400),
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        **_latencies(latencies),
+        'max_ms': round(max(latencies) * 1000, 2) if latencies else None,
+        'mean_queries': round(sum(queries) / len(queries), 1) if queries else None,
+        'max_queries': max(queries) if queries else None,
+        'statuses': dict(sorted(statuses.items())),
+    }
+
+def run_load_test(mix='default', concurrency=8, duration=10.0, requests=None, base_url=None, username=None,
+                  academic_year=None, warmup=1, seed=0, label=''):
+    """Replay a request mix from concurrent users and summarise each endpoint
+
+    mix is a LOAD_MIXES name or an {endpoint: weight} dict. Each of the
+    concurrency threads sends requests back to back until duration seconds
+    have passed (or requests in total were sent). Requests go through the
+    test client unless base_url points at a running server. Every endpoint
+    is first hit warmup times, unrecorded, so caches and snapshots are
+    built before the clock starts. Returns JSON-ready throughput, latency
+    percentiles (ms), status codes and query counts per endpoint.
+    """
+    weights = LOAD_MIXES[mix] if isinstance(mix, str) else dict(mix)
+    unknown = set(weights) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f"Unknown endpoint: {', '.join(sorted(unknown))}")
+    weights = {name: weight for name, weight in weights.items() if weight > 0}
+    if not weights:
+        raise ValueError('The mix has no endpoint with a positive weight')
+
+    # With MULTI_SCHOOL on, only the school serving the target host answers for its ids
+    host = urllib.parse.urlsplit(base_url).netloc if base_url else InProcessClient.host()
+    school = None
+    if timetable_setting('MULTI_SCHOOL', False):
+        school = school_for_host(host)
+        if school is None:
+            raise ValueError(f'No school is served at {host}; every request would get a 404')
+    with school_context(school):
+        targets = load_targets(academic_year)
+    if not targets['classes'] or not targets['teachers'] or ('edit' in weights and not targets['slots']):
+        raise ValueError(f"No timetable to load test for {targets['academic_year']}; run seed_timetable first")
+
+    if username:
+        user = User.objects.get(username=username)
+    else:
+        user = User.objects.filter(is_superuser=True, is_active=True).order_by('id').first()
+        if user is None:
+            raise ValueError('No active superuser to send requests as; pass a username')
+
+    def make_client():
+        return HTTPClient(user, base_url) if base_url else InProcessClient(user)
+
+    if warmup:
+        client = make_client()
+        rng = random.Random(seed)
+        for name in weights:
+            for _ in range(warmup):
+                client.request(*ENDPOINTS[name](targets, rng))
+        client.close()
+
+    samples, counter, lock = [], [0], threading.Lock()
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=_worker, args=(
+            make_client, weights, targets, seed + index + 1, started + duration, requests, counter, lock, samples,
+        ))
+        for index in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    by_endpoint = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample[0]].append(sample)
+
+    return {
+        'label': label,
+        'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+            'db_profile': getattr(settings, 'TIMETABLE_DB_PROFILE', None),
+            'target': base_url or 'in-process',
+        },
+        'academic_year': targets['academic_year'],
+        'mix': weights,
+        'concurrency': concurrency,
+        'duration': round(elapsed, 2),
+        'overall': _summary(samples, elapsed),
+        'endpoints': {name: _summary(by_endpoint[name], elapsed) for name in weights if by_endpoint[name]},
+    }
+
+def compare_results(baseline, current):
+    """Per-endpoint change in throughput, latency percentiles and queries from baseline to current
+
+    Both are run_load_test results; ratios above 1 mean more (slower for
+    latencies, faster for throughput).
+    """
+    def deltas(before, after):
+        row = {}
+        for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_queries'):
+            old, new = before.get(key), after.get(key)
+            row[key] = [old, new, round(new / old, 2) if old and new is not None else None]
+        return row
+
+    endpoints = sorted(set(baseline['endpoints']) & set(current['endpoints']))
+    return {
+        'baseline': baseline.get('label') or baseline.get('started_at'),
+        'current': current.get('label') or current.get('started_at'),
+        'overall': deltas(baseline['overall'], current['overall']),
+        'endpoints': {name: deltas(baseline['endpoints'][name], current['endpoints'][name]) for name in endpoints},
+    }
+
+# Seeding
+
+DEFAULT_PERIODS = [
+    # name, start, end, is_break
+    ('Period 1', '08:00', '08:45', False),
+    ('Period 2', '08:50', '09:35', False),
+    ('Period 3', '09:40', '10:25', False),
+    ('Break', '10:25', '10:45', True),
+    ('Period 4', '10:45', '11:30', False),
+    ('Period 5', '11:35', '12:20', False),
+    ('Period 6', '12:25', '13:10', False),
+    ('Lunch', '13:10', '13:50', True),
+    ('Period 7', '13:50', '14:35', False),
+]
+
+def _time(value):
+    return datetime.datetime.strptime(value, '%H:%M').time()
+
+def seed_school(academic_year, classes=30, teachers=None, subjects=12, prefix='LT'):
+    """Create a school with a full, clash-free timetable for load tests
+
+    Every class gets its own room and a lesson in every teaching period of
+    every working day. Teachers rotate through the classes so no teacher is
+    booked twice at once; the default of two teachers per class keeps them
+    within the default daily and weekly caps. Periods are reused if any
+    exist. Returns the number of objects created per kind.
+    """
+    teachers = teachers or classes * 2
+    if teachers < classes:
+        raise ValueError('Need at least as many teachers as classes')
+    if Class.objects.filter(academic_year=academic_year, name__startswith=f'{prefix} ').exists():
+        raise ValueError(f'{academic_year} already has {prefix} classes')
+
+    with transaction.atomic(using=tenant_db_alias()):
+        AcademicYear.objects.get_or_create(name=academic_year)
+        if not Period.objects.exists():
+            Period.objects.bulk_create([
+                Period(name=name, start_time=_time(start), end_time=_time(end), is_break=is_break, order=order)
+                for order, (name, start, end, is_break) in enumerate(DEFAULT_PERIODS, 1)
+            ])
+        periods = list(Period.objects.order_by('order'))
+        teaching = [period for period in periods if not period.is_break]
+
+        school = School.objects.create(name=f'{prefix} Load Test School', address='-')
+        departments = [
+            Department.objects.create(name=f'{prefix} Department {index}', code=f'{prefix}{academic_year[2:4]}D{index}',
+                                      school=school)
+            for index in range(1, 5)
+        ]
+        subject_rows = [
+            Subject.objects.create(name=f'{prefix} Subject {index}', code=f'{prefix}{academic_year[2:4]}S{index}',
+                                   department=departments[index % len(departments)])
+            for index in range(1, subjects + 1)
+        ]
+        users = User.objects.bulk_create([
+            User(username=f'{prefix.lower()}{academic_year[2:4]}t{index}', first_name='Teacher', last_name=str(index))
+            for index in range(1, teachers + 1)
+        ])
+        teacher_rows = Teacher.objects.bulk_create([
+            Teacher(user=user, employee_id=f'{prefix}{academic_year[2:4]}E{index}',
+                    department=departments[index % len(departments)])
+            for index, user in enumerate(users, 1)
+        ])
+        rooms = ClassRoom.objects.bulk_create([
+            ClassRoom(name=f'{prefix} Room {index}', room_number=f'{prefix}{academic_year[2:4]}R{index}', capacity=40,
+                      school=school)
+            for index in range(1, classes + 1)
+        ])
+        class_rows = Class.objects.bulk_create([
+            Class(name=f'{prefix} {index}', section='A', grade_level=9 + index % 4,
+                  department=departments[index % len(departments)], academic_year=academic_year, total_students=30)
+            for index in range(1, classes + 1)
+        ])
+
+        slots = []
+        for day_index, day in enumerate(working_days()):
+            for period_index, period in enumerate(periods):
+                # Shift the teacher rotation by a full class count each teaching period
+                offset = (day_index * len(teaching) + (teaching.index(period) if period in teaching else 0)) * classes
+                for index, school_class in enumerate(class_rows):
+                    slot = TimeSlot(school_class=school_class, period=period, day_of_week=day, academic_year=academic_year)
+                    if not period.is_break:
+                        slot.subject = subject_rows[(index + day_index + period_index) % len(subject_rows)]
+                        slot.teacher = teacher_rows[(index + offset) % teachers]
+                        slot.classroom = rooms[index]
+                    slots.append(slot)
+        created = TimeSlot.objects.bulk_create(slots, batch_size=500)
+        record_bulk_changes(slot.pk for slot in created)
+        record_bulk_slot_changes({}, [slot.pk for slot in created])
+        transaction.on_commit(lambda: TimetableRevision.bump(academic_year), using=tenant_db_alias())
+
+    return {
+        'departments': len(departments),
+        'subjects': len(subject_rows),
+        'teachers': len(teacher_rows),
+        'rooms': len(rooms),
+        'classes': len(class_rows),
+        'time_slots': len(created),
+    }
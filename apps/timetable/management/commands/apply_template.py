@@ -0,0 +1,46 @@
+# apps/timetable/management/commands/apply_template.py
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.timetable.models import TimetableTemplate
+from apps.timetable.templating import TemplateApplier
+from apps.timetable.tenancy import school_context
+
+class Command(BaseCommand):
+    help = 'Stamp a timetable template onto every class of its grade levels'
+
+    def add_arguments(self, parser):
+        parser.add_argument('template', help='Template id or name')
+        parser.add_argument('--academic-year', help='Academic year (defaults to the current one)')
+        parser.add_argument('--school', type=int, help="Resolve the template's classes within one school (by id)")
+        parser.add_argument('--overwrite', action='store_true', help="Replace the classes' existing slots")
+        parser.add_argument('--dry-run', action='store_true', help='Plan the slots without writing them')
+
+    def handle(self, *args, **options):
+        with school_context(options['school']):
+            self._handle(options)
+
+    def _handle(self, options):
+        value = options['template']
+        template = TimetableTemplate.objects.filter(id=value).first() if value.isdigit() else None
+        template = template or TimetableTemplate.objects.filter(name=value).first()
+        if template is None:
+            raise CommandError(f'Template "{value}" not found')
+
+        applier = TemplateApplier(template, academic_year=options['academic_year'], overwrite=options['overwrite'])
+        result = applier.apply(dry_run=options['dry_run'])
+
+        self.stdout.write(
+            f"{template.name}: {result['slots']} slots for {result['classes']} classes in {result['academic_year']}, "
+            f"{result['skipped_cells']} occupied cells skipped ({result['elapsed_ms']} ms)"
+        )
+        for item in result['unassigned']:
+            self.stdout.write(self.style.WARNING(
+                f"  class {item['class_id']} {item['day_of_week']} period {item['period_id']}: no free {' or '.join(item['missing'])}"
+            ))
+        for conflict in result['conflicts']:
+            self.stdout.write(self.style.ERROR(f"  {conflict['message']}"))
+
+        if result['applied']:
+            self.stdout.write(self.style.SUCCESS('Template applied.'))
+        elif options['dry_run']:
+            self.stdout.write('Dry run, nothing written.')
@@ -0,0 +1,105 @@
+# apps/timetable/management/commands/archive_academic_year.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.timetable.db import refresh_table_statistics
+from apps.timetable.models import AcademicYear, ArchivedTimeSlot, Class, TimeSlot, current_academic_year
+from apps.timetable.routers import archive_db_alias
+from apps.timetable.tenancy import current_school_id, school_context, tenant_db_alias
+
+class Command(BaseCommand):
+    help = 'Move the time slots of a closed academic year into the read-only archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('academic_year', help='Academic year to archive, e.g. 2023-2024')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+        parser.add_argument('--keep-classes-active', action='store_true',
+                            help="Leave the year's classes active instead of deactivating them")
+        parser.add_argument('--school', type=int, help="Archive one school's slots (by id) instead of every school's")
+
+    def handle(self, *args, **options):
+        with school_context(options['school']):
+            self._handle(options)
+
+    def _handle(self, options):
+        year = options['academic_year']
+        batch_size = options['batch_size']
+
+        if year == current_academic_year():
+            raise CommandError(f'{year} is the current academic year and cannot be archived')
+
+        slots = TimeSlot.objects.for_year(year)
+        total = slots.count()
+        archive_db = archive_db_alias()
+        self.stdout.write(f'{total} time slots in {year} -> database "{archive_db}"')
+        if options['dry_run'] or not total:
+            return
+
+        started = time.perf_counter()
+
+        # Re-running after a failure replaces any partial copy of the year (of the active school only)
+        with transaction.atomic(using=archive_db):
+            ArchivedTimeSlot.objects.using(archive_db).for_year(year).delete()
+
+            batch = []
+            queryset = slots.select_related('school_class', 'subject', 'teacher__user', 'classroom', 'period')
+            for slot in queryset.order_by('id').iterator(chunk_size=batch_size):
+                batch.append(self._archived(slot))
+                if len(batch) >= batch_size:
+                    ArchivedTimeSlot.objects.using(archive_db).bulk_create(batch)
+                    batch = []
+            if batch:
+                ArchivedTimeSlot.objects.using(archive_db).bulk_create(batch)
+
+        archived = ArchivedTimeSlot.objects.using(archive_db).for_year(year).count()
+        if archived != total:
+            raise CommandError(f'Archived {archived} of {total} slots; live data left untouched')
+
+        with transaction.atomic(using=tenant_db_alias()):
+            slot_ids = list(slots.values_list('id', flat=True))
+            for start in range(0, len(slot_ids), batch_size):
+                TimeSlot.objects.filter(id__in=slot_ids[start:start + batch_size]).delete()
+
+            if not options['keep_classes_active']:
+                Class.objects.for_year(year).update(is_active=False)
+
+            # Other schools may still be teaching the year, so only a full archive closes it
+            if current_school_id() is None:
+                AcademicYear.objects.update_or_create(
+                    name=year, defaults={'is_archived': True, 'is_current': False}
+                )
+
+        # Keeps the estimated admin counts of both tables close to the new sizes
+        refresh_table_statistics(TimeSlot, tenant_db_alias())
+        refresh_table_statistics(ArchivedTimeSlot, archive_db)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} time slots from {year} in {elapsed:.2f}s'))
+
+    @staticmethod
+    def _archived(slot):
+        teacher_name = ''
+        if slot.teacher:
+            teacher_name = slot.teacher.user.get_full_name() or slot.teacher.user.username
+
+        return ArchivedTimeSlot(
+            original_id=slot.id,
+            school_id=slot.school_id,
+            academic_year=slot.academic_year,
+            school_class_id=slot.school_class_id,
+            class_name=str(slot.school_class)[:100],
+            subject_id=slot.subject_id,
+            subject_name=str(slot.subject) if slot.subject else '',
+            teacher_id=slot.teacher_id,
+            teacher_name=teacher_name[:200],
+            classroom_id=slot.classroom_id,
+            room_number=slot.classroom.room_number if slot.classroom else '',
+            period_id=slot.period_id,
+            period_name=slot.period.name,
+            day_of_week=slot.day_of_week,
+            notes=slot.notes,
+            created_at=slot.created_at,
+        )
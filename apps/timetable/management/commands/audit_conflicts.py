@@ -0,0 +1,41 @@
+# apps/timetable/management/commands/audit_conflicts.py
+import json
+
+from django.core.management.base import BaseCommand
+
+from apps.timetable.audit import ConflictAuditor
+from apps.timetable.tenancy import school_context
+
+class Command(BaseCommand):
+    help = 'Recompute all teacher, room and class clashes of a year and reconcile ConflictLog (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academic-year', help='Academic year to audit (defaults to the current one)')
+        parser.add_argument('--school', type=int, help='Audit one school (by id) instead of every school')
+        parser.add_argument('--chunk-size', type=int, help='Rows fetched per database round trip')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+        parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+
+    def handle(self, *args, **options):
+        with school_context(options['school']):
+            auditor = ConflictAuditor(academic_year=options['academic_year'], chunk_size=options['chunk_size'])
+            summary = auditor.run(dry_run=options['dry_run'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        timings = summary['timings_ms']
+        self.stdout.write(
+            f"Scanned {summary['slots_scanned']} slots of {summary['academic_year']} in {summary['chunks']} chunks "
+            f"(at most {summary['peak_running']} lessons held at once)"
+        )
+        for conflict_type, count in sorted(summary['clashes'].items()):
+            self.stdout.write(self.style.WARNING(f"  {conflict_type}: {count}"))
+        self.stdout.write(
+            f"ConflictLog: {summary['created']} opened, {summary['resolved']} resolved, {summary['unchanged']} still open"
+            + (' (dry run, nothing written)' if summary['dry_run'] else '')
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {timings['total']} ms (scan {timings['scan']} ms, reconcile {timings['reconcile']} ms)"
+        ))
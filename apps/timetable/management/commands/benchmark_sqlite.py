@@ -0,0 +1,54 @@
+# apps/timetable/management/commands/benchmark_sqlite.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.timetable.benchmarks import SQLITE_CONFIGURATIONS, run_sqlite_benchmark
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent SQLite reads and writes under each database configuration'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--config', action='append', choices=sorted(SQLITE_CONFIGURATIONS),
+                            help='Configuration to run (repeatable, default: all)')
+        parser.add_argument('--readers', type=int, default=4, help='Reader processes (gunicorn workers serving pages)')
+        parser.add_argument('--writers', type=int, default=1, help='Writer processes')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per configuration')
+        parser.add_argument('--rows', type=int, default=20000, help='Time slots in the benchmark database')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        if options['readers'] < 0 or options['writers'] < 0 or options['readers'] + options['writers'] == 0:
+            raise CommandError('Need at least one reader or writer')
+
+        results = []
+        for name in options['config'] or list(SQLITE_CONFIGURATIONS):
+            if not options['json']:
+                self.stdout.write(f'Running {name}...')
+            results.append(run_sqlite_benchmark(
+                name,
+                readers=options['readers'],
+                writers=options['writers'],
+                duration=options['duration'],
+                rows=options['rows'],
+            ))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        header = f"{'configuration':<20} {'reads/s':>9} {'read p95':>9} {'read p99':>9} {'writes/s':>9} {'write p95':>10} {'locked':>7}"
+        self.stdout.write('')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for result in results:
+            reads, writes = result['reads'], result['writes']
+            self.stdout.write(
+                f"{result['configuration']:<20} {reads['ops_per_sec']:>9} {self._ms(reads['p95_ms']):>9} "
+                f"{self._ms(reads['p99_ms']):>9} {writes['ops_per_sec']:>9} {self._ms(writes['p95_ms']):>10} "
+                f"{reads['lock_errors'] + writes['lock_errors']:>7}"
+            )
+
+    @staticmethod
+    def _ms(value):
+        return '-' if value is None else f'{value}ms'
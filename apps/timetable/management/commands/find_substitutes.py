@@ -0,0 +1,58 @@
+# apps/timetable/management/commands/find_substitutes.py
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.timetable.models import Teacher
+from apps.timetable.substitutes import SubstituteFinder, day_code
+from apps.timetable.tenancy import school_context
+
+class Command(BaseCommand):
+    help = 'List ranked substitute teachers for every lesson of an absent teacher on one day'
+
+    def add_arguments(self, parser):
+        parser.add_argument('teacher', help='Teacher id or employee id')
+        parser.add_argument('--day', help='Day code, e.g. MON')
+        parser.add_argument('--date', help='Date in YYYY-MM-DD format (defaults to today)')
+        parser.add_argument('--limit', type=int, default=3, help='Candidates to show per lesson')
+        parser.add_argument('--school', type=int, help='Look for substitutes within one school (by id)')
+
+    def handle(self, *args, **options):
+        with school_context(options['school']):
+            self._handle(options)
+
+    def _handle(self, options):
+        teacher = self._get_teacher(options['teacher'])
+        try:
+            day = day_code(options['day'] or options['date'] or timezone.localdate())
+        except ValueError:
+            raise CommandError('Invalid --day or --date')
+
+        result = SubstituteFinder().find(teacher, day, limit=options['limit'])
+
+        self.stdout.write(f"Cover for {teacher} on {day} ({result['elapsed_ms']} ms)")
+        if not result['slots']:
+            self.stdout.write('No lessons scheduled.')
+        for slot in result['slots']:
+            self.stdout.write(f"\n{slot.get('period_name')} - {slot.get('class_name')} - {slot.get('subject_name')}")
+            if not slot['candidates']:
+                self.stdout.write(self.style.WARNING('  No free teacher available'))
+            for candidate in slot['candidates']:
+                flags = []
+                if candidate['subject_department_match']:
+                    flags.append('subject dept')
+                if candidate['department_match']:
+                    flags.append('same dept')
+                self.stdout.write(
+                    f"  {candidate['name']} (capacity left {candidate['remaining_capacity']}"
+                    f"{', ' + ', '.join(flags) if flags else ''})"
+                )
+
+    @staticmethod
+    def _get_teacher(value):
+        teachers = Teacher.objects.select_related('user')
+        teacher = teachers.filter(employee_id=value).first()
+        if teacher is None and value.isdigit():
+            teacher = teachers.filter(id=int(value)).first()
+        if teacher is None:
+            raise CommandError(f'Teacher "{value}" not found')
+        return teacher
@@ -0,0 +1,38 @@
+# apps/timetable/management/commands/init_school_database.py
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.timetable.models import AcademicYear, School
+from apps.timetable.tenancy import school_context, school_database
+
+class Command(BaseCommand):
+    help = "Create the tables of a school's own database and copy its School and the academic years into it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('school_id', type=int, help='School listed in TIMETABLE_SCHOOL_DATABASES')
+
+    def handle(self, *args, **options):
+        alias = school_database(options['school_id'])
+        if alias is None:
+            raise CommandError(f"School {options['school_id']} has no database in TIMETABLE_SCHOOL_DATABASES")
+        try:
+            school = School.objects.using('default').get(pk=options['school_id'])
+        except School.DoesNotExist:
+            raise CommandError(f"No school with id {options['school_id']}")
+
+        call_command('migrate', database=alias, interactive=False, verbosity=0)
+        years = list(AcademicYear.objects.using('default').all())
+        # Everything below is routed to the school's database
+        with school_context(school):
+            # Same primary key in both databases, so the school's host keeps resolving to it
+            school.save()
+            for year in years:
+                AcademicYear.objects.update_or_create(name=year.name, defaults={
+                    'start_date': year.start_date, 'end_date': year.end_date,
+                    'is_current': year.is_current, 'is_archived': year.is_archived,
+                })
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{alias} is ready for {school} ({len(years)} academic years); '
+            f'add its staff with `manage.py createsuperuser --database {alias}`'
+        ))
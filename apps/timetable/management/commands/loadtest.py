@@ -0,0 +1,114 @@
+# apps/timetable/management/commands/loadtest.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.timetable.loadtest import ENDPOINTS, LOAD_MIXES, compare_results, run_load_test
+
+class Command(BaseCommand):
+    help = 'Replay a mix of timetable requests from concurrent users and report latency percentiles per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mix', default='default', help=f"Request mix: {', '.join(LOAD_MIXES)}, "
+                                                             f"or endpoint=weight pairs, e.g. grid=80,teacher=15,edit=5")
+        parser.add_argument('--concurrency', type=int, action='append',
+                            help='Concurrent users (repeatable to step up the load, default: 8)')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per concurrency level')
+        parser.add_argument('--requests', type=int, help='Stop after this many requests per level')
+        parser.add_argument('--warmup', type=int, default=1, help='Unrecorded requests per endpoint before each level')
+        parser.add_argument('--base-url', help='Send requests to a running server, e.g. http://127.0.0.1:8000 '
+                                               '(default: in-process through the test client)')
+        parser.add_argument('--user', help='Username to send requests as (default: the first superuser)')
+        parser.add_argument('--academic-year', help='Academic year (defaults to the current one)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the request sequence')
+        parser.add_argument('--label', default='', help='Name of the run in the results, e.g. a release tag')
+        parser.add_argument('--output', help='Also write the JSON results to this file')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        mix = self._mix(options['mix'])
+        levels = options['concurrency'] or [8]
+        if min(levels) < 1:
+            raise CommandError('Concurrency must be at least 1')
+
+        results = []
+        for concurrency in levels:
+            if not options['json']:
+                self.stdout.write(f'Running {concurrency} concurrent users for {options["duration"]}s...')
+            try:
+                results.append(run_load_test(
+                    mix,
+                    concurrency=concurrency,
+                    duration=options['duration'],
+                    requests=options['requests'],
+                    base_url=options['base_url'],
+                    username=options['user'],
+                    academic_year=options['academic_year'],
+                    warmup=options['warmup'],
+                    seed=options['seed'],
+                    label=options['label'],
+                ))
+            except ValueError as error:
+                raise CommandError(str(error))
+
+        comparison = None
+        if options['compare']:
+            with open(options['compare']) as handle:
+                baseline = json.load(handle)
+            baselines = {result['concurrency']: result for result in baseline}
+            comparison = [
+                compare_results(baselines[result['concurrency']], result)
+                for result in results if result['concurrency'] in baselines
+            ]
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'results': results, 'comparison': comparison} if comparison else results, indent=2))
+            return
+
+        header = (f"{'users':>5} {'endpoint':<12} {'requests':>8} {'req/s':>7} {'p50':>9} {'p95':>9} {'p99':>9} "
+                  f"{'queries':>7} {'errors':>6}")
+        self.stdout.write('')
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for result in results:
+            rows = list(result['endpoints'].items()) + [('all', result['overall'])]
+            for name, row in rows:
+                self.stdout.write(
+                    f"{result['concurrency']:>5} {name:<12} {row['requests']:>8} {row['throughput_rps']:>7} "
+                    f"{self._ms(row['p50_ms']):>9} {self._ms(row['p95_ms']):>9} {self._ms(row['p99_ms']):>9} "
+                    f"{'-' if row['mean_queries'] is None else row['mean_queries']:>7} {row['errors']:>6}"
+                )
+
+        for compared in comparison or []:
+            self.stdout.write('')
+            self.stdout.write(f"Compared with {compared['baseline']}:")
+            for name, row in list(compared['endpoints'].items()) + [('all', compared['overall'])]:
+                changes = ', '.join(
+                    f'{key} x{ratio}' for key, (_, _, ratio) in row.items() if ratio is not None
+                )
+                self.stdout.write(f'  {name:<12} {changes}')
+
+    @staticmethod
+    def _mix(value):
+        if value in LOAD_MIXES:
+            return value
+        mix = {}
+        for part in value.split(','):
+            name, _, weight = part.partition('=')
+            name = name.strip()
+            if name not in ENDPOINTS:
+                raise CommandError(f"Unknown endpoint: {name} (choose from {', '.join(ENDPOINTS)})")
+            try:
+                mix[name] = float(weight)
+            except ValueError:
+                raise CommandError(f'Weight of {name} must be a number')
+        return mix
+
+    @staticmethod
+    def _ms(value):
+        return '-' if value is None else f'{value}ms'
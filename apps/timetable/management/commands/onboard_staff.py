@@ -0,0 +1,57 @@
+# apps/timetable/management/commands/onboard_staff.py
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.timetable.onboarding import STAFF_FIELDS, StaffOnboarder
+from apps.timetable.tenancy import school_context
+
+class Command(BaseCommand):
+    help = 'Create teachers, their user accounts and profiles from a CSV file in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help=f"CSV with a header row; columns: {', '.join(STAFF_FIELDS)}")
+        parser.add_argument('--invite', action='store_true', help='Create a link per teacher to choose a password')
+        parser.add_argument('--base-url', default='http://localhost:8000', help='Site address the invite links start with')
+        parser.add_argument('--invites-output', help='Write username, email, employee_id and invite link to this CSV')
+        parser.add_argument('--school', type=int, help="School (by id) whose database the staff are written to")
+        parser.add_argument('--chunk-size', type=int, help='Rows per bulk insert (default: ONBOARDING_CHUNK_SIZE)')
+        parser.add_argument('--dry-run', action='store_true', help='Check the rows without writing them')
+        parser.add_argument('--json', action='store_true', help='Print the result as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8-sig') as handle:
+                rows = list(csv.DictReader(handle))
+        except OSError as exc:
+            raise CommandError(f"Cannot read {options['csv_file']}: {exc}")
+
+        with school_context(options['school']):
+            onboarder = StaffOnboarder(invite=options['invite'], chunk_size=options['chunk_size'])
+            result = onboarder.onboard(rows, dry_run=options['dry_run'])
+
+        base_url = options['base_url'].rstrip('/')
+        for invite in result['invites']:
+            invite['url'] = base_url + invite.pop('path')
+        if options['invites_output'] and result['invites']:
+            with open(options['invites_output'], 'w', newline='', encoding='utf-8') as handle:
+                writer = csv.DictWriter(handle, fieldnames=['username', 'email', 'employee_id', 'url'])
+                writer.writeheader()
+                writer.writerows(result['invites'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+
+        for error in result['errors']:
+            self.stdout.write(self.style.ERROR(f"  row {error['row']}: {error['message']}"))
+        if result['errors']:
+            raise CommandError(f"{len(result['errors'])} problems in {result['rows']} rows, nothing written")
+        if result['dry_run']:
+            self.stdout.write(f"{result['rows']} rows are valid ({result['elapsed_ms']} ms). Dry run, nothing written.")
+            return
+        if result['invites'] and not options['invites_output']:
+            for invite in result['invites']:
+                self.stdout.write(f"  {invite['username']:<24} {invite['url']}")
+        self.stdout.write(self.style.SUCCESS(f"Created {result['created']} teachers in {result['elapsed_ms']} ms"))
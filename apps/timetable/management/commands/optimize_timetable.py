@@ -0,0 +1,46 @@
+# apps/timetable/management/commands/optimize_timetable.py
+import json
+
+from django.core.management.base import BaseCommand
+
+from apps.timetable.optimizer import TimetableOptimizer
+from apps.timetable.tenancy import school_context
+
+class Command(BaseCommand):
+    help = 'Reduce teacher gaps, same-day subject repeats and back-to-back labs without adding clashes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academic-year', help='Academic year to optimise (defaults to the current one)')
+        parser.add_argument('--school', type=int, help='Only move lessons of one school (by id)')
+        parser.add_argument('--class', dest='classes', type=int, action='append', default=[],
+                            help='Only move lessons of this class id (repeatable)')
+        parser.add_argument('--budget-ms', type=int, help='Search time budget in milliseconds')
+        parser.add_argument('--seed', type=int, help='Random seed for a reproducible run')
+        parser.add_argument('--apply', action='store_true', help='Write the changes (default is a dry run)')
+        parser.add_argument('--json', action='store_true', help='Print the result as JSON')
+
+    def handle(self, *args, **options):
+        with school_context(options['school']):
+            self._handle(options)
+
+    def _handle(self, options):
+        optimizer = TimetableOptimizer(academic_year=options['academic_year'], class_ids=options['classes'])
+        result = optimizer.optimize(time_budget_ms=options['budget_ms'], seed=options['seed'])
+        result['changes'] = optimizer.apply() if options['apply'] else optimizer.diff()
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+
+        self.stdout.write(
+            f"Score {result['initial_score']} -> {result['final_score']} "
+            f"after {result['iterations']} iterations ({result['elapsed_ms']} ms)"
+        )
+        for name, before in result['initial'].items():
+            self.stdout.write(f"  {name}: {before} -> {result['final'][name]}")
+        self.stdout.write(f"{result['lessons_moved']} lessons moved, {len(result['changes'])} slots changed")
+
+        if options['apply']:
+            self.stdout.write(self.style.SUCCESS('Changes applied.'))
+        elif result['changes']:
+            self.stdout.write('Dry run, nothing written. Use --apply to save.')
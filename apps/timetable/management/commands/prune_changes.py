@@ -0,0 +1,25 @@
+# apps/timetable/management/commands/prune_changes.py
+from django.core.management.base import BaseCommand
+
+from apps.timetable.changes import prune_changes
+
+class Command(BaseCommand):
+    help = 'Compact the timetable change log and drop old entries so it stays bounded'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academic-year', help='Academic year (defaults to the current one)')
+        parser.add_argument('--days', type=int, help='Drop entries older than this (default CHANGE_LOG_RETENTION_DAYS, 0 to keep)')
+        parser.add_argument('--keep', type=int, help='Keep at most this many entries (default CHANGE_LOG_MAX_ENTRIES, 0 for no limit)')
+        parser.add_argument('--no-compact', action='store_true', help='Keep entries superseded by a later change to the same slot')
+
+    def handle(self, *args, **options):
+        result = prune_changes(
+            academic_year=options['academic_year'],
+            days=options['days'],
+            keep=options['keep'],
+            compact=not options['no_compact'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['academic_year']}: compacted {result['compacted']}, pruned {result['pruned']} "
+            f"(cursors below {result['pruned_through']} now expire), {result['remaining']} entries left"
+        ))
@@ -0,0 +1,49 @@
+# apps/timetable/management/commands/reassign_rooms.py
+import json
+
+from django.core.management.base import BaseCommand
+
+from apps.timetable.rooming import RoomAssigner
+from apps.timetable.tenancy import school_context
+
+class Command(BaseCommand):
+    help = 'Re-room lessons so every class fits its room and lab subjects get labs, wasting as few seats as possible'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academic-year', help='Academic year to re-room (defaults to the current one)')
+        parser.add_argument('--school', type=int, help='Only re-room lessons of one school (by id)')
+        parser.add_argument('--class', dest='classes', type=int, action='append', default=[],
+                            help='Only re-room lessons of this class id (repeatable)')
+        parser.add_argument('--apply', action='store_true', help='Write the changes (default is a dry run)')
+        parser.add_argument('--json', action='store_true', help='Print the result as JSON')
+
+    def handle(self, *args, **options):
+        with school_context(options['school']):
+            self._handle(options)
+
+    def _handle(self, options):
+        result = RoomAssigner(options['academic_year']).reassign(class_ids=options['classes'], apply=options['apply'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+
+        self.stdout.write(
+            f"{result['lessons']} lessons in {result['academic_year']}: {len(result['changes'])} room changes "
+            f"({result['elapsed_ms']} ms)"
+        )
+        self.stdout.write(f"  Lessons in unsuitable rooms: {result['misfits_before']} -> {len(result['unassigned'])}")
+        self.stdout.write(
+            f"  Empty seats in suitable rooms: {result['wasted_seats_before']} -> {result['wasted_seats_after']}"
+        )
+        for item in result['unassigned'][:20]:
+            self.stdout.write(self.style.WARNING(
+                f"  No fitting room for slot {item['slot_id']} (class {item['class_id']}, {item['day_of_week']}, "
+                f"period {item['period_id']}, {item['students']} students"
+                + (f", needs {item['required_room_type']})" if item['required_room_type'] else ')')
+            ))
+
+        if options['apply']:
+            self.stdout.write(self.style.SUCCESS('Changes applied.'))
+        elif result['changes']:
+            self.stdout.write('Dry run, nothing written. Use --apply to save.')
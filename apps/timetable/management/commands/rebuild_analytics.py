@@ -0,0 +1,38 @@
+# apps/timetable/management/commands/rebuild_analytics.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.timetable.aggregates import aggregate_drift, rebuild_aggregates
+from apps.timetable.models import current_academic_year
+from apps.timetable.tenancy import school_context
+
+class Command(BaseCommand):
+    help = 'Recount the pre-aggregated lesson counts behind the dashboard charts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academic-year', help='Academic year (defaults to the current one)')
+        parser.add_argument('--school', type=int, help="Recount one school's charts (by id) instead of the combined ones")
+        parser.add_argument('--check', action='store_true', help='Only report counts that differ from a fresh count')
+
+    def handle(self, *args, **options):
+        with school_context(options['school']):
+            self._handle(options)
+
+    def _handle(self, options):
+        academic_year = options['academic_year'] or current_academic_year()
+        started = time.perf_counter()
+
+        if options['check']:
+            drift = aggregate_drift(academic_year)
+            for dimension, key, stored, actual in drift:
+                self.stdout.write(f"  {dimension:<12} {key or '-':<10} stored {stored}, actual {actual}")
+            elapsed = (time.perf_counter() - started) * 1000
+            style = self.style.WARNING if drift else self.style.SUCCESS
+            self.stdout.write(style(f'{academic_year}: {len(drift)} counts out of date ({elapsed:.1f} ms)'))
+            return
+
+        counts = rebuild_aggregates(academic_year)
+        elapsed = (time.perf_counter() - started) * 1000
+        summary = ', '.join(f'{count} {dimension}' for dimension, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'{academic_year}: stored {summary} rows in {elapsed:.1f} ms'))
@@ -0,0 +1,28 @@
+# apps/timetable/management/commands/rebuild_search_index.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.timetable.search import SOURCES, rebuild_index, search
+
+class Command(BaseCommand):
+    help = 'Rebuild the trigram search index of teachers, subjects, rooms and classes, e.g. after bulk imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', action='append', default=[], help=f"Kind to rebuild (repeatable; {', '.join(SOURCES)})")
+        parser.add_argument('--query', help='Run a search after rebuilding to check the index')
+
+    def handle(self, *args, **options):
+        unknown = set(options['kind']) - set(SOURCES)
+        if unknown:
+            raise CommandError(f"Unknown kind: {', '.join(sorted(unknown))}")
+
+        started = time.perf_counter()
+        counts = rebuild_index(options['kind'] or None)
+        elapsed = (time.perf_counter() - started) * 1000
+        summary = ', '.join(f'{count} {kind}' for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Indexed {summary} in {elapsed:.1f} ms'))
+
+        if options['query']:
+            for result in search(options['query']):
+                self.stdout.write(f"  {result['score']:.2f}  {result['kind']:<8} {result['label']} ({result['detail']})")
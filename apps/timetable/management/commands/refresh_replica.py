@@ -0,0 +1,46 @@
+# apps/timetable/management/commands/refresh_replica.py
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.timetable.routers import REPLICA_DB
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database to the read replica file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=4096,
+                            help='Pages copied per backup step; the primary stays writable between steps')
+
+    def handle(self, *args, **options):
+        if REPLICA_DB not in settings.DATABASES:
+            raise CommandError('No replica configured; set TIMETABLE_SQLITE_REPLICA')
+
+        primary_path = str(settings.DATABASES['default']['NAME'])
+        replica_path = str(settings.DATABASES[REPLICA_DB]['NAME'])
+        temp_path = f'{replica_path}.tmp'
+        started = time.perf_counter()
+
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        # The online backup API gives a consistent copy while the primary keeps serving writes
+        source = sqlite3.connect(primary_path)
+        target = sqlite3.connect(temp_path)
+        try:
+            source.backup(target, pages=options['pages'])
+            # The replica is only ever read, so keep it in rollback mode as a single file
+            target.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            target.close()
+            source.close()
+
+        # Atomic swap: new connections see the new file, open ones finish on the old one
+        os.replace(temp_path, replica_path)
+
+        elapsed = time.perf_counter() - started
+        size_mb = os.path.getsize(replica_path) / (1024 * 1024)
+        self.stdout.write(self.style.SUCCESS(f'Replica refreshed ({size_mb:.1f} MB) in {elapsed:.2f}s'))
@@ -0,0 +1,73 @@
+# apps/timetable/management/commands/repair_timetable.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.timetable.models import ClassRoom, Teacher
+from apps.timetable.repair import TimetableRepairer
+from apps.timetable.tenancy import school_context, tenant_db_alias
+
+class Command(BaseCommand):
+    help = 'Re-place only the lessons broken by inactive or unavailable teachers and rooms'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teacher', action='append', default=[], help='Teacher id or employee id (repeatable)')
+        parser.add_argument('--room', action='append', default=[], help='Room id or room number (repeatable)')
+        parser.add_argument('--deactivate', action='store_true', help='Mark the given teachers and rooms inactive first')
+        parser.add_argument('--apply', action='store_true', help='Write the changes (default is a dry run)')
+        parser.add_argument('--academic-year', help='Academic year to repair (defaults to the current one)')
+        parser.add_argument('--school', type=int, help="Repair one school's timetable (by id) instead of every school's")
+        parser.add_argument('--json', action='store_true', help='Print the diff as JSON')
+
+    def handle(self, *args, **options):
+        with school_context(options['school']):
+            self._handle(options)
+
+    def _handle(self, options):
+        teachers = [self._lookup(Teacher, 'employee_id', value) for value in options['teacher']]
+        rooms = [self._lookup(ClassRoom, 'room_number', value) for value in options['room']]
+
+        if options['deactivate'] and not options['apply']:
+            raise CommandError('--deactivate needs --apply')
+
+        # A repair that fails leaves the teachers and rooms active as well
+        with transaction.atomic(using=tenant_db_alias()):
+            if options['deactivate']:
+                Teacher.objects.filter(id__in=[t.id for t in teachers]).update(is_active=False)
+                ClassRoom.objects.filter(id__in=[r.id for r in rooms]).update(is_active=False)
+
+            repairer = TimetableRepairer(academic_year=options['academic_year'])
+            result = repairer.repair(
+                teacher_ids=[t.id for t in teachers],
+                room_ids=[r.id for r in rooms],
+                apply=options['apply'],
+            )
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+
+        self.stdout.write(
+            f"{result['invalidated']} lessons affected in {result['academic_year']}, "
+            f"{len(result['changes'])} slots changed ({result['elapsed_ms']} ms)"
+        )
+        for change in result['changes']:
+            fields = ', '.join(f'{name}: {old} -> {new}' for name, (old, new) in change['changes'].items())
+            self.stdout.write(f"  slot {change['slot_id']} [{change['strategy']}] {fields}")
+        for item in result['unresolved']:
+            self.stdout.write(self.style.WARNING(f"  slot {item['slot_id']} unresolved: {item['reason']}"))
+
+        if result['applied']:
+            self.stdout.write(self.style.SUCCESS('Changes applied.'))
+        elif result['changes']:
+            self.stdout.write('Dry run, nothing written. Use --apply to save.')
+
+    @staticmethod
+    def _lookup(model, field, value):
+        instance = model.objects.filter(**{field: value}).first()
+        if instance is None and value.isdigit():
+            instance = model.objects.filter(id=int(value)).first()
+        if instance is None:
+            raise CommandError(f'{model.__name__} "{value}" not found')
+        return instance
@@ -0,0 +1,37 @@
+# apps/timetable/management/commands/timetable_snapshot.py
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.timetable.models import TimetableRevision, current_academic_year
+from apps.timetable.snapshot import TimetableSnapshot
+from apps.timetable.tenancy import school_context
+
+class Command(BaseCommand):
+    help = 'Build (or verify) the memory-mapped timetable snapshot of the current revision, e.g. after a deploy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academic-year', help='Academic year (defaults to the current one)')
+        parser.add_argument('--school', type=int, help='Build the snapshot of one school (by id) instead of the combined one')
+        parser.add_argument('--force', action='store_true', help='Rebuild even if the current revision is on disk')
+
+    def handle(self, *args, **options):
+        with school_context(options['school']):
+            self._handle(options)
+
+    def _handle(self, options):
+        year = options['academic_year'] or current_academic_year()
+        started = time.perf_counter()
+
+        if options['force']:
+            revision, key = TimetableRevision.current(year)
+            TimetableSnapshot.build(year).write(TimetableSnapshot.path_for(year, revision, key))
+        snapshot = TimetableSnapshot.load(year)
+
+        path = TimetableSnapshot.path_for(year, snapshot.revision, snapshot.key)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(self.style.SUCCESS(
+            f'{year} revision {snapshot.revision}: {len(snapshot)} slots, '
+            f'{os.path.getsize(path) / 1024:.1f} KiB at {path} ({elapsed:.1f} ms)'
+        ))
@@ -0,0 +1,94 @@
+# apps/timetable/management/commands/timetable_versions.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.timetable.models import TimetableVersion, current_academic_year
+from apps.timetable.tenancy import current_school_id, school_context
+from apps.timetable.versions import capture_version, diff_versions, restore_version
+
+class Command(BaseCommand):
+    help = 'List, save, diff and restore timetable versions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--school', type=int, help="Work on one school's timetable (by id) instead of every school's")
+        subcommands = parser.add_subparsers(dest='action', required=True)
+
+        listing = subcommands.add_parser('list', help='List versions of an academic year')
+        listing.add_argument('--academic-year')
+
+        create = subcommands.add_parser('create', help='Save the live timetable as a named version')
+        create.add_argument('name')
+        create.add_argument('--academic-year')
+
+        diff = subcommands.add_parser('diff', help='Cells changed between two versions (or a version and the live timetable)')
+        diff.add_argument('version')
+        diff.add_argument('other', nargs='?')
+        diff.add_argument('--limit', type=int, default=20)
+        diff.add_argument('--json', action='store_true')
+
+        restore = subcommands.add_parser('restore', help='Roll the live timetable back to a version')
+        restore.add_argument('version')
+
+    def handle(self, *args, **options):
+        with school_context(options['school']):
+            getattr(self, f"handle_{options['action']}")(options)
+
+    def handle_list(self, options):
+        year = options['academic_year'] or current_academic_year()
+        versions = TimetableVersion.objects.filter(academic_year=year, school_id=current_school_id())
+        for version in versions.select_related('base'):
+            kind = 'base' if version.is_base else f'delta of #{version.base_id}'
+            self.stdout.write(
+                f"#{version.id} {version.created_at:%Y-%m-%d %H:%M} {version.name} "
+                f"({version.lesson_count} lessons, {version.stored_rows} rows stored, {kind})"
+            )
+
+    def handle_create(self, options):
+        version = capture_version(options['name'], options['academic_year'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved version #{version.id} "{version.name}" with {version.lesson_count} lessons'
+        ))
+
+    def handle_diff(self, options):
+        version = self._get_version(options['version'])
+        other = self._get_version(options['other']) if options['other'] else None
+        result = diff_versions(version, other, limit=options['limit'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+
+        target = f'#{other.id}' if other else 'live timetable'
+        self.stdout.write(
+            f"#{version.id} -> {target}: {result['changed']} changed, {result['added']} added, "
+            f"{result['removed']} removed ({result['elapsed_ms']} ms)"
+        )
+        for label, key in (('Classes', 'by_class'), ('Teachers', 'by_teacher'), ('Rooms', 'by_room')):
+            if result[key]:
+                top = sorted(result[key].items(), key=lambda item: -item[1])[:10]
+                self.stdout.write(
+                    f'{label} affected: {len(result[key])} (most: ' + ', '.join(f'#{k}: {v}' for k, v in top) + ')'
+                )
+        for cell in result['cells']:
+            self.stdout.write(f"  class {cell['class_id']} {cell['day_of_week']} period {cell['period_id']}: {cell['before']} -> {cell['after']}")
+
+    def handle_restore(self, options):
+        version = self._get_version(options['version'])
+        result = restore_version(version)
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored \"{version.name}\": {result['updated']} updated, {result['created']} created, "
+            f"{result['deleted']} deleted ({result['elapsed_ms']} ms)"
+        ))
+
+    @staticmethod
+    def _get_version(value):
+        version = TimetableVersion.objects.select_related('base').filter(id=value).first() if value.isdigit() else None
+        if version is None:
+            # Names repeat across schools; an id picks any school's version
+            version = TimetableVersion.objects.select_related('base').filter(
+                name=value, school_id=current_school_id()
+            ).first()
+        if version is None:
+            raise CommandError(f'Version "{value}" not found')
+        return version
@@ -0,0 +1,42 @@
+# apps/timetable/management/commands/validate_timetable.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.timetable.validation import TimetableValidator
+from apps.timetable.tenancy import school_context
+
+class Command(BaseCommand):
+    help = 'Check workload caps, breaks, missing assignments, room capacity and double bookings; exits 1 on violations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academic-year', help='Academic year to check (defaults to the current one)')
+        parser.add_argument('--school', type=int, help="Check one school's timetable (by id) instead of every school's")
+        parser.add_argument('--ignore', action='append', default=[], help='Violation code to ignore (repeatable)')
+        parser.add_argument('--limit', type=int, default=20, help='Violations to list per code')
+        parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+
+    def handle(self, *args, **options):
+        with school_context(options['school']):
+            self._handle(options)
+
+    def _handle(self, options):
+        report = TimetableValidator(options['academic_year']).report()
+        for code in options['ignore']:
+            report['violations'].pop(code, None)
+            report['counts'].pop(code, None)
+        total = sum(report['counts'].values())
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, default=str))
+        else:
+            self.stdout.write(f"Validated {report['academic_year']} in {report['elapsed_ms']} ms")
+            for code, items in report['violations'].items():
+                self.stdout.write(self.style.WARNING(f"{code}: {len(items)}"))
+                for item in items[:options['limit']]:
+                    self.stdout.write(f"  {item['message']} (slots {', '.join(str(i) for i in item['slot_ids'][:10])})")
+
+        if total:
+            raise CommandError(f'{total} timetable violations found', returncode=1)
+        if not options['json']:
+            self.stdout.write(self.style.SUCCESS('No violations found.'))
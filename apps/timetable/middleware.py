@@ -0,0 +1,235 @@
+# apps/timetable/middleware.py
+import json
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.exceptions import PermissionDenied
+from django.http import Http404
+from django.urls import Resolver404, resolve
+
+from .conf import timetable_setting
+from .instrumentation import QueryBudgetExceeded, QueryRecorder, get_query_budget
+from .profiling import Profile
+from .tenancy import activate_school, deactivate_school, school_for_host, school_for_user
+
+logger = logging.getLogger('apps.timetable.instrumentation')
+
+class QueryInstrumentationMiddleware:
+    """Record query count and DB time per request
+
+    Adds a Server-Timing header, writes one structured log line per request
+    and checks the view against TIMETABLE_SETTINGS['QUERY_BUDGETS'].
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = timetable_setting('QUERY_INSTRUMENTATION', True)
+        self.raise_on_breach = timetable_setting('QUERY_BUDGET_RAISE', False)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        return self._process(request, response, recorder.report)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        # The async ORM runs queries on the request's thread-sensitive sync
+        # thread, so the recorder has to wrap that thread's connections
+        recorder = QueryRecorder()
+        await sync_to_async(recorder.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.__exit__)(None, None, None)
+
+        return self._process(request, response, recorder.report)
+
+    def _process(self, request, response, report):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+
+        response['Server-Timing'] = report.server_timing()
+
+        entry = {
+            'event': 'request_queries',
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+        }
+        entry.update(report.as_dict())
+
+        budget = get_query_budget(view_name) if view_name else None
+        breaches = report.check_budget(budget) if budget else []
+        if breaches:
+            entry['budget_breaches'] = breaches
+            logger.warning(json.dumps(entry))
+            if self.raise_on_breach:
+                raise QueryBudgetExceeded(view_name, breaches, report)
+        else:
+            logger.info(json.dumps(entry))
+
+        return response
+
+class ProfilingMiddleware:
+    """Profile one request with cProfile when a staff user asks for it
+
+    Add ?profile=1 or an "X-Profile: 1" header; the response then carries
+    X-Profile-Id, the id of the ProfileRecord listed in the admin. Other
+    requests only pay for the flag check. cProfile follows one thread:
+    under ASGI a sync view runs on a worker thread, so its profile is taken
+    there (in process_view, which calls the view itself), and only async
+    views are profiled on the event loop thread, together with whatever
+    other requests the loop ran meanwhile.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = timetable_setting('PROFILE_REQUESTS', True)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _requested(self, request):
+        return self.enabled and (request.GET.get('profile') == '1' or request.headers.get('X-Profile') == '1')
+
+    @staticmethod
+    def _is_staff(request):
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_authenticated and user.is_staff)
+
+    def _profile(self, request):
+        return Profile('request', f'{request.method} {request.path}', path=request.get_full_path()[:500], user=request.user)
+
+    @staticmethod
+    def _is_async_view(request):
+        try:
+            match = resolve(request.path_info, urlconf=getattr(request, 'urlconf', None))
+        except Resolver404:
+            return False
+        return iscoroutinefunction(match.func)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self._requested(request) or not self._is_staff(request):
+            return self.get_response(request)
+
+        profile = self._profile(request).start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.stop()
+        return self._finish(request, profile, response)
+
+    async def __acall__(self, request):
+        if not self._requested(request) or not await sync_to_async(self._is_staff)(request):
+            return await self.get_response(request)
+
+        profile = self._profile(request)
+        if not self._is_async_view(request):
+            # Started by process_view on the thread the view runs on
+            request._timetable_profile = profile
+            response = await self.get_response(request)
+            return await sync_to_async(self._finish)(request, profile, response)
+
+        profile.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profile.stop()
+        return await sync_to_async(self._finish)(request, profile, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, '_timetable_profile', None)
+        if profile is None:
+            return None
+        profile.start()
+        try:
+            return view_func(request, *view_args, **view_kwargs)
+        finally:
+            profile.stop()
+
+    @staticmethod
+    def _finish(request, profile, response):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            profile.name = match.view_name
+        record = profile.save(status_code=response.status_code)
+        if record is not None:
+            response['X-Profile-Id'] = str(record.pk)
+        return response
+
+class TenantMiddleware:
+    """Scope the request to the School whose domain is the request's host
+
+    Enabled by TIMETABLE_SETTINGS['MULTI_SCHOOL']. The tenant managers then
+    return that school's rows only, and a school listed in SCHOOL_DATABASES
+    is served from its own database, sessions included, which is why this
+    runs before SessionMiddleware. Hosts of no school get a 404, and signed
+    in teachers of another school a 403 once the user is known (in
+    process_view); superusers may use every school. request.school_id holds
+    the school, or None when MULTI_SCHOOL is off.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = timetable_setting('MULTI_SCHOOL', False)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _school_id(self, request, school_id):
+        if school_id is None:
+            raise Http404(f'No school is served at {request.get_host()}')
+        return school_id
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request.school_id = self._school_id(request, school_for_host(request.get_host())) if self.enabled else None
+        token = activate_school(request.school_id)
+        try:
+            return self.get_response(request)
+        finally:
+            deactivate_school(token)
+
+    async def __acall__(self, request):
+        if self.enabled:
+            request.school_id = self._school_id(request, await sync_to_async(school_for_host)(request.get_host()))
+        else:
+            request.school_id = None
+        token = activate_school(request.school_id)
+        try:
+            return await self.get_response(request)
+        finally:
+            deactivate_school(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        user = getattr(request, 'user', None)
+        if not self.enabled or user is None or not user.is_authenticated or user.is_superuser:
+            return None
+        school_id = school_for_user(user)
+        if school_id is not None and school_id != request.school_id:
+            raise PermissionDenied('This account belongs to another school')
+        return None
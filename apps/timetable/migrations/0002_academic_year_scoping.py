@@ -0,0 +1,87 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:23
+
+import apps.timetable.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AcademicYear',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=9, unique=True)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('is_current', models.BooleanField(default=False)),
+                ('is_archived', models.BooleanField(default=False)),
+            ],
+            options={
+                'verbose_name': 'Academic Year',
+                'verbose_name_plural': 'Academic Years',
+                'ordering': ['-name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTimeSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField()),
+                ('academic_year', models.CharField(db_index=True, max_length=9)),
+                ('school_class_id', models.BigIntegerField()),
+                ('class_name', models.CharField(max_length=100)),
+                ('subject_id', models.BigIntegerField(blank=True, null=True)),
+                ('subject_name', models.CharField(blank=True, max_length=130)),
+                ('teacher_id', models.BigIntegerField(blank=True, null=True)),
+                ('teacher_name', models.CharField(blank=True, max_length=200)),
+                ('classroom_id', models.BigIntegerField(blank=True, null=True)),
+                ('room_number', models.CharField(blank=True, max_length=20)),
+                ('period_id', models.BigIntegerField()),
+                ('period_name', models.CharField(max_length=20)),
+                ('day_of_week', models.CharField(choices=[('MON', 'Monday'), ('TUE', 'Tuesday'), ('WED', 'Wednesday'), ('THU', 'Thursday'), ('FRI', 'Friday'), ('SAT', 'Saturday'), ('SUN', 'Sunday')], max_length=3)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archived Time Slot',
+                'verbose_name_plural': 'Archived Time Slots',
+                'ordering': ['academic_year', 'class_name', 'day_of_week', 'period_name'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='class',
+            name='academic_year',
+            field=models.CharField(db_index=True, default=apps.timetable.models.current_academic_year, max_length=9),
+        ),
+        migrations.AlterField(
+            model_name='timeslot',
+            name='academic_year',
+            field=models.CharField(default=apps.timetable.models.current_academic_year, max_length=9),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['academic_year', 'is_active', 'day_of_week', 'period'], name='timeslot_year_cell_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['academic_year', 'teacher', 'day_of_week'], name='timeslot_year_teacher_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['academic_year', 'classroom', 'day_of_week'], name='timeslot_year_room_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtimeslot',
+            index=models.Index(fields=['academic_year', 'school_class_id'], name='archived_year_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtimeslot',
+            index=models.Index(fields=['academic_year', 'teacher_id'], name='archived_year_teacher_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:35
+
+import apps.timetable.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0002_academic_year_scoping'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('academic_year', models.CharField(max_length=9, unique=True)),
+                ('revision', models.PositiveBigIntegerField(default=0)),
+                ('key', models.CharField(default=apps.timetable.models._revision_key, editable=False, max_length=32)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Timetable Revision',
+                'verbose_name_plural': 'Timetable Revisions',
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('timetable', '0003_timetable_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('academic_year', models.CharField(db_index=True, max_length=9)),
+                ('data', models.BinaryField()),
+                ('lesson_count', models.PositiveIntegerField(default=0)),
+                ('stored_rows', models.PositiveIntegerField(default=0)),
+                ('revision', models.PositiveBigIntegerField(default=0)),
+                ('is_automatic', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('base', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='deltas', to='timetable.timetableversion')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Timetable Version',
+                'verbose_name_plural': 'Timetable Versions',
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+    ]
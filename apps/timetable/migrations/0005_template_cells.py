@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0004_timetable_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TemplateCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day_of_week', models.CharField(choices=[('MON', 'Monday'), ('TUE', 'Tuesday'), ('WED', 'Wednesday'), ('THU', 'Thursday'), ('FRI', 'Friday'), ('SAT', 'Saturday'), ('SUN', 'Sunday')], max_length=3)),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='timetable.period')),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='timetable.subject')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cells', to='timetable.timetabletemplate')),
+            ],
+            options={
+                'verbose_name': 'Template Cell',
+                'verbose_name_plural': 'Template Cells',
+                'ordering': ['template', 'day_of_week', 'period__order'],
+                'unique_together': {('template', 'day_of_week', 'period')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0005_template_cells'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timetablerevision',
+            name='changes_pruned_through',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='TimeSlotChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('academic_year', models.CharField(max_length=9)),
+                ('slot_id', models.PositiveBigIntegerField()),
+                ('action', models.CharField(choices=[('SAVE', 'Saved'), ('DELETE', 'Deleted')], max_length=6)),
+                ('data', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Time Slot Change',
+                'verbose_name_plural': 'Time Slot Changes',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['academic_year', 'id'], name='change_year_cursor_idx'), models.Index(fields=['academic_year', 'slot_id'], name='change_year_slot_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0006_timeslot_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('teacher', 'Teacher'), ('subject', 'Subject'), ('room', 'Room'), ('class', 'Class')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('label', models.CharField(max_length=200)),
+                ('detail', models.CharField(blank=True, max_length=200)),
+                ('text', models.CharField(max_length=300)),
+                ('trigram_count', models.PositiveIntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'Search Document',
+                'verbose_name_plural': 'Search Documents',
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='timetable.searchdocument')),
+            ],
+            options={
+                'verbose_name': 'Search Trigram',
+                'verbose_name_plural': 'Search Trigrams',
+                'indexes': [models.Index(fields=['trigram', 'document'], name='search_trigram_idx')],
+            },
+        ),
+    ]
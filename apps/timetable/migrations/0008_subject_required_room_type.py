@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subject',
+            name='required_room_type',
+            field=models.CharField(blank=True, choices=[('LECTURE', 'Lecture Hall'), ('LAB', 'Laboratory'), ('COMPUTER', 'Computer Lab'), ('LIBRARY', 'Library'), ('AUDITORIUM', 'Auditorium'), ('SPORTS', 'Sports Hall')], max_length=20),
+        ),
+    ]
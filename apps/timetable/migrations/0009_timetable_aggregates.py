@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0008_subject_required_room_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('academic_year', models.CharField(max_length=9)),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('day', 'Day'), ('subject', 'Subject'), ('teacher', 'Teacher'), ('room', 'Room'), ('room_period', 'Rooms in use per period')], max_length=12)),
+                ('key', models.CharField(blank=True, max_length=20)),
+                ('lessons', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Timetable Aggregate',
+                'verbose_name_plural': 'Timetable Aggregates',
+                'unique_together': {('academic_year', 'dimension', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('timetable', '0009_timetable_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('request', 'Request'), ('engine', 'Engine call'), ('task', 'Background task')], max_length=10)),
+                ('name', models.CharField(max_length=200)),
+                ('path', models.CharField(blank=True, max_length=500)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('duration_ms', models.FloatField()),
+                ('function_calls', models.PositiveIntegerField(default=0)),
+                ('summary', models.JSONField(default=list)),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Profile Record',
+                'verbose_name_plural': 'Profile Records',
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_class_schools(apps, schema_editor):
+    TimeSlot = apps.get_model('timetable', 'TimeSlot')
+    Class = apps.get_model('timetable', 'Class')
+    TimeSlot.objects.update(school_id=models.Subquery(
+        Class.objects.filter(id=models.OuterRef('school_class_id')).values('department__school_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0010_profile_records'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='timetableaggregate',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='classroom',
+            name='school',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rooms', to='timetable.school'),
+        ),
+        migrations.AddField(
+            model_name='period',
+            name='school',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='periods', to='timetable.school'),
+        ),
+        migrations.AddField(
+            model_name='school',
+            name='domain',
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='timeslot',
+            name='school',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='time_slots', to='timetable.school'),
+        ),
+        migrations.AddField(
+            model_name='timetableversion',
+            name='school',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='timetable_versions', to='timetable.school'),
+        ),
+        migrations.AddField(
+            model_name='timetableaggregate',
+            name='school',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timetableaggregate',
+            unique_together={('school', 'academic_year', 'dimension', 'key')},
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['school', 'academic_year', 'is_active', 'day_of_week', 'period'], name='timeslot_school_cell_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['school', 'academic_year', 'classroom', 'day_of_week'], name='timeslot_school_room_idx'),
+        ),
+        migrations.RunPython(copy_class_schools, migrations.RunPython.noop),
+    ]
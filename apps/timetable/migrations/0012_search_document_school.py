@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_document_schools(apps, schema_editor):
+    SearchDocument = apps.get_model('timetable', 'SearchDocument')
+    sources = {
+        'teacher': (apps.get_model('timetable', 'Teacher'), 'department__school_id'),
+        'subject': (apps.get_model('timetable', 'Subject'), 'department__school_id'),
+        'class': (apps.get_model('timetable', 'Class'), 'department__school_id'),
+        'room': (apps.get_model('timetable', 'ClassRoom'), 'school_id'),
+    }
+    for kind, (model, path) in sources.items():
+        SearchDocument.objects.filter(kind=kind).update(school_id=models.Subquery(
+            model.objects.filter(id=models.OuterRef('object_id')).values(path)[:1]
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0011_school_tenancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchdocument',
+            name='school',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='timetable.school'),
+        ),
+        migrations.RunPython(copy_document_schools, migrations.RunPython.noop),
+    ]
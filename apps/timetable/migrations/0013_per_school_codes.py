@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0012_search_document_school'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='classroom',
+            name='room_number',
+            field=models.CharField(db_index=True, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='department',
+            name='code',
+            field=models.CharField(max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='subject',
+            name='code',
+            field=models.CharField(db_index=True, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='teacher',
+            name='employee_id',
+            field=models.CharField(db_index=True, max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='classroom',
+            constraint=models.UniqueConstraint(fields=('school', 'room_number'), name='classroom_school_number_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='classroom',
+            constraint=models.UniqueConstraint(condition=models.Q(('school__isnull', True)), fields=('room_number',), name='classroom_shared_number_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='department',
+            constraint=models.UniqueConstraint(fields=('school', 'code'), name='department_school_code_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='subject',
+            constraint=models.UniqueConstraint(fields=('department', 'code'), name='subject_department_code_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='teacher',
+            constraint=models.UniqueConstraint(fields=('department', 'employee_id'), name='teacher_department_employee_unique'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_slot_schools(apps, schema_editor):
+    TimeSlotChange = apps.get_model('timetable', 'TimeSlotChange')
+    TimeSlot = apps.get_model('timetable', 'TimeSlot')
+    # Entries of slots deleted since stay without a school
+    TimeSlotChange.objects.update(school_id=models.Subquery(
+        TimeSlot.objects.filter(id=models.OuterRef('slot_id')).values('school_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0013_per_school_codes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeslotchange',
+            name='school',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='timeslot_changes', to='timetable.school'),
+        ),
+        migrations.AddField(
+            model_name='timetablerevision',
+            name='school',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='timetable_revisions', to='timetable.school'),
+        ),
+        migrations.AlterField(
+            model_name='timetablerevision',
+            name='academic_year',
+            field=models.CharField(max_length=9),
+        ),
+        migrations.AddIndex(
+            model_name='timeslotchange',
+            index=models.Index(fields=['school', 'academic_year', 'id'], name='change_school_cursor_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timetablerevision',
+            constraint=models.UniqueConstraint(fields=('school', 'academic_year'), name='revision_school_year_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='timetablerevision',
+            constraint=models.UniqueConstraint(condition=models.Q(('school__isnull', True)), fields=('academic_year',), name='revision_shared_year_unique'),
+        ),
+        migrations.RunPython(copy_slot_schools, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0014_school_change_feed'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='class',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='class',
+            constraint=models.UniqueConstraint(fields=('department', 'name', 'section', 'academic_year'), name='class_department_name_unique'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:05
+
+from django.db import DEFAULT_DB_ALIAS, migrations, models, router
+
+
+def copy_class_schools(apps, schema_editor):
+    ArchivedTimeSlot = apps.get_model('timetable', 'ArchivedTimeSlot')
+    Class = apps.get_model('timetable', 'Class')
+    alias = schema_editor.connection.alias
+    if not router.allow_migrate_model(alias, ArchivedTimeSlot):
+        return
+    # The archive may be a database of its own, so classes are looked up in the default one
+    archived = ArchivedTimeSlot.objects.using(alias)
+    class_ids = list(archived.values_list('school_class_id', flat=True).distinct())
+    classes = {}
+    for class_id, school_id in Class.objects.using(DEFAULT_DB_ALIAS).filter(id__in=class_ids).values_list(
+        'id', 'department__school_id'
+    ):
+        classes.setdefault(school_id, []).append(class_id)
+    for school_id, ids in classes.items():
+        archived.filter(school_class_id__in=ids).update(school_id=school_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0015_per_school_classes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtimeslot',
+            name='school_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtimeslot',
+            index=models.Index(fields=['school_id', 'academic_year'], name='archived_school_year_idx'),
+        ),
+        migrations.RunPython(copy_class_schools, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,150 @@
 # apps/timetable/models.py
+import uuid
+
 from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
 from django.utils import timezone
 
+from .tenancy import current_school_id, school_context, tenant_filter, tenant_key
+
+CURRENT_YEAR_CACHE_KEY = 'timetable:current_academic_year'
+
+def current_academic_year():
+    """Name of the current academic year, e.g. "2024-2025"
+
+    Taken from the AcademicYear row flagged is_current, then from
+    TIMETABLE_SETTINGS['CURRENT_ACADEMIC_YEAR'], and otherwise derived from
+    today's date and TIMETABLE_SETTINGS['ACADEMIC_YEAR_START_MONTH'].
+    """
+    name = cache.get(tenant_key(CURRENT_YEAR_CACHE_KEY))
+    if name:
+        return name
+
+    name = AcademicYear.objects.filter(is_current=True).values_list('name', flat=True).first()
+    if not name:
+        timetable_settings = getattr(settings, 'TIMETABLE_SETTINGS', {})
+        name = timetable_settings.get('CURRENT_ACADEMIC_YEAR')
+    if not name:
+        today = timezone.localdate()
+        start_month = getattr(settings, 'TIMETABLE_SETTINGS', {}).get('ACADEMIC_YEAR_START_MONTH', 6)
+        start_year = today.year if today.month >= start_month else today.year - 1
+        name = f"{start_year}-{start_year + 1}"
+
+    cache.set(tenant_key(CURRENT_YEAR_CACHE_KEY), name, 60)
+    return name
+
+class AcademicYearQuerySet(models.QuerySet):
+    """Queryset scoped by the academic_year column"""
+
+    def for_year(self, academic_year):
+        return self.filter(academic_year=academic_year)
+
+    def current(self):
+        """Rows of the current academic year only"""
+        return self.filter(academic_year=current_academic_year())
+
+class TenantManager(models.Manager):
+    """Default manager returning only the active school's rows (see apps/timetable/tenancy.py)
+
+    tenant_field is the lookup from the model to its School. With shared,
+    rows without a school (rooms and periods every school uses) are kept
+    too. While no school is active every row is returned.
+    """
+
+    def __init__(self, tenant_field='school', shared=False):
+        super().__init__()
+        self.tenant_field = tenant_field
+        self.shared = shared
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        school_id = current_school_id()
+        if school_id is None:
+            return queryset
+        return queryset.filter(tenant_filter(self.tenant_field, school_id, self.shared))
+
+    def for_school(self, school):
+        """Rows of one school, whichever school is active"""
+        return super().get_queryset().filter(tenant_filter(self.tenant_field, school, self.shared))
+
+class TenantValidationMixin:
+    """Model validation that sees every school's rows
+
+    Django checks unique fields and constraints through the default manager,
+    which only returns the active school's rows, so a clash with another
+    school's row would pass validation and fail on save; the checks run here
+    with no school active. school_unique names fields (or tuples of fields)
+    unique within a school that no database constraint covers, because the
+    school is reached through another table (the default manager's
+    tenant_field).
+    """
+    school_unique = ()
+
+    def _tenant_school_id(self):
+        *path, field = type(self)._default_manager.tenant_field.split('__')
+        obj = self
+        for name in path:
+            obj = getattr(obj, name, None)
+        return getattr(obj, f'{field}_id', None)
+
+    def validate_unique(self, exclude=None):
+        with school_context(None):
+            super().validate_unique(exclude)
+        errors = {}
+        manager = type(self)._default_manager
+        school_id = self._tenant_school_id()
+        for fields in self.school_unique:
+            # A field name, or a tuple of names unique together
+            fields = (fields,) if isinstance(fields, str) else tuple(fields)
+            if exclude and any(field in exclude for field in fields):
+                continue
+            rows = manager.for_school(school_id) if school_id else type(self)._base_manager.all()
+            if rows.filter(**{field: getattr(self, field) for field in fields}).exclude(pk=self.pk).exists():
+                if len(fields) == 1:
+                    label = self._meta.get_field(fields[0]).verbose_name
+                    errors[fields[0]] = [f'{label.capitalize()} is already used in this school.']
+                else:
+                    labels = ', '.join(str(self._meta.get_field(field).verbose_name) for field in fields)
+                    errors.setdefault(NON_FIELD_ERRORS, []).append(
+                        f'{self._meta.verbose_name} with this {labels} already exists in this school.'
+                    )
+        if errors:
+            raise ValidationError(errors)
+
+    def validate_constraints(self, exclude=None):
+        with school_context(None):
+            super().validate_constraints(exclude)
+
+def _revision_key():
+    return uuid.uuid4().hex
+
 # Core entities for timetable management
 
+class AcademicYear(models.Model):
+    """Academic years; closed years can be archived out of the live tables"""
+    name = models.CharField(max_length=9, unique=True)  # e.g., "2023-2024"
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    is_current = models.BooleanField(default=False)
+    is_archived = models.BooleanField(default=False)
+
+    def save(self, *args, **kwargs):
+        if self.is_current:
+            AcademicYear.objects.filter(is_current=True).exclude(pk=self.pk).update(is_current=False)
+        super().save(*args, **kwargs)
+        cache.delete(tenant_key(CURRENT_YEAR_CACHE_KEY))
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = "Academic Year"
+        verbose_name_plural = "Academic Years"
+        ordering = ['-name']
+
 class School(models.Model):
     """School information"""
     name = models.CharField(max_length=200)
@@ -13,6 +152,8 @@ class School(models.Model):
     phone = models.CharField(max_length=20, blank=True)
     email = models.EmailField(blank=True)
     established = models.DateField(null=True, blank=True)
+    # Host name serving this school when TIMETABLE_SETTINGS['MULTI_SCHOOL'] is on, e.g. "north.example.org"
+    domain = models.CharField(max_length=255, blank=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -21,13 +162,15 @@ class School(models.Model):
         verbose_name = "School"
         verbose_name_plural = "Schools"
 
-class Department(models.Model):
+class Department(TenantValidationMixin, models.Model):
     """Academic departments"""
     name = models.CharField(max_length=100)
-    code = models.CharField(max_length=10, unique=True)
+    code = models.CharField(max_length=10)
     head = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     school = models.ForeignKey(School, on_delete=models.CASCADE, related_name='departments')
 
+    objects = TenantManager('school')
+
     def __str__(self):
         return f"{self.code} - {self.name}"
 
@@ -35,16 +178,35 @@ class Department(models.Model):
         verbose_name = "Department"
         verbose_name_plural = "Departments"
         ordering = ['code']
+        constraints = [
+            models.UniqueConstraint(fields=['school', 'code'], name='department_school_code_unique'),
+        ]
 
-class Subject(models.Model):
+ROOM_TYPES = [
+    ('LECTURE', 'Lecture Hall'),
+    ('LAB', 'Laboratory'), 
+    ('COMPUTER', 'Computer Lab'),
+    ('LIBRARY', 'Library'),
+    ('AUDITORIUM', 'Auditorium'),
+    ('SPORTS', 'Sports Hall'),
+]
+
+class Subject(TenantValidationMixin, models.Model):
     """Subjects/Courses offered"""
     name = models.CharField(max_length=100)
-    code = models.CharField(max_length=20, unique=True)
+    code = models.CharField(max_length=20, db_index=True)
     department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='subjects')
     credits = models.PositiveIntegerField(default=1)
     description = models.TextField(blank=True)
+    # Room type lessons of this subject must be held in, e.g. LAB; blank for any room
+    required_room_type = models.CharField(max_length=20, choices=ROOM_TYPES, blank=True)
     is_active = models.BooleanField(default=True)
 
+    objects = TenantManager('department__school')
+
+    # Unique per school; the database can only check it per department
+    school_unique = ['code']
+
     def __str__(self):
         return f"{self.code} - {self.name}"
 
@@ -52,11 +214,14 @@ class Subject(models.Model):
         verbose_name = "Subject"
         verbose_name_plural = "Subjects"
         ordering = ['code']
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'code'], name='subject_department_code_unique'),
+        ]
 
-class Teacher(models.Model):
+class Teacher(TenantValidationMixin, models.Model):
     """Teaching staff information"""
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    employee_id = models.CharField(max_length=20, unique=True)
+    employee_id = models.CharField(max_length=20, db_index=True)
     department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='teachers')
     phone = models.CharField(max_length=20, blank=True)
     specialization = models.CharField(max_length=100, blank=True)
@@ -64,6 +229,11 @@ class Teacher(models.Model):
     max_periods_per_day = models.PositiveIntegerField(default=6)
     max_periods_per_week = models.PositiveIntegerField(default=30)
 
+    objects = TenantManager('department__school')
+
+    # Unique per school; the database can only check it per department
+    school_unique = ['employee_id']
+
     def __str__(self):
         return f"{self.employee_id} - {self.user.get_full_name() or self.user.username}"
 
@@ -71,20 +241,16 @@ class Teacher(models.Model):
         verbose_name = "Teacher"
         verbose_name_plural = "Teachers"
         ordering = ['employee_id']
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'employee_id'], name='teacher_department_employee_unique'),
+        ]
 
-class ClassRoom(models.Model):
+class ClassRoom(TenantValidationMixin, models.Model):
     """Physical classrooms and their details"""
-    ROOM_TYPES = [
-        ('LECTURE', 'Lecture Hall'),
-        ('LAB', 'Laboratory'), 
-        ('COMPUTER', 'Computer Lab'),
-        ('LIBRARY', 'Library'),
-        ('AUDITORIUM', 'Auditorium'),
-        ('SPORTS', 'Sports Hall'),
-    ]
+    ROOM_TYPES = ROOM_TYPES
 
     name = models.CharField(max_length=50)
-    room_number = models.CharField(max_length=20, unique=True)
+    room_number = models.CharField(max_length=20, db_index=True)
     room_type = models.CharField(max_length=20, choices=ROOM_TYPES, default='LECTURE')
     capacity = models.PositiveIntegerField()
     floor = models.CharField(max_length=10, blank=True)
@@ -93,6 +259,13 @@ class ClassRoom(models.Model):
     has_computer = models.BooleanField(default=False)
     has_whiteboard = models.BooleanField(default=True)
     is_active = models.BooleanField(default=True)
+    # Blank for rooms every school may book
+    school = models.ForeignKey(School, on_delete=models.CASCADE, null=True, blank=True, related_name='rooms')
+
+    objects = TenantManager('school', shared=True)
+
+    # A school's rooms and the shared ones are looked up together by number
+    school_unique = ['room_number']
 
     def __str__(self):
         return f"{self.room_number} - {self.name} (Capacity: {self.capacity})"
@@ -101,26 +274,39 @@ class ClassRoom(models.Model):
         verbose_name = "Class Room"
         verbose_name_plural = "Class Rooms"
         ordering = ['room_number']
+        constraints = [
+            models.UniqueConstraint(fields=['school', 'room_number'], name='classroom_school_number_unique'),
+            models.UniqueConstraint(fields=['room_number'], condition=models.Q(school__isnull=True),
+                                    name='classroom_shared_number_unique'),
+        ]
 
-class Class(models.Model):
+class Class(TenantValidationMixin, models.Model):
     """Student classes/sections"""
     name = models.CharField(max_length=50)
     section = models.CharField(max_length=10, blank=True)
     grade_level = models.PositiveIntegerField()  # e.g., 9, 10, 11, 12
     department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='classes')
-    academic_year = models.CharField(max_length=9)  # e.g., "2023-2024"
+    academic_year = models.CharField(max_length=9, default=current_academic_year, db_index=True)  # e.g., "2023-2024"
     class_teacher = models.ForeignKey(Teacher, on_delete=models.SET_NULL, null=True, blank=True)
     total_students = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
 
+    objects = TenantManager.from_queryset(AcademicYearQuerySet)('department__school')
+
+    # Unique per school; the database can only check it per department
+    school_unique = [('name', 'section', 'academic_year')]
+
     def __str__(self):
         return f"Class {self.grade_level}{self.section} - {self.name}"
 
     class Meta:
         verbose_name = "Class"
         verbose_name_plural = "Classes"
-        unique_together = ['name', 'section', 'academic_year']
         ordering = ['grade_level', 'section']
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'name', 'section', 'academic_year'],
+                                    name='class_department_name_unique'),
+        ]
 
 class Period(models.Model):
     """Time periods for scheduling"""
@@ -129,6 +315,10 @@ class Period(models.Model):
     end_time = models.TimeField()
     is_break = models.BooleanField(default=False)
     order = models.PositiveIntegerField()  # For sorting periods
+    # Blank for the bell schedule shared by every school
+    school = models.ForeignKey(School, on_delete=models.CASCADE, null=True, blank=True, related_name='periods')
+
+    objects = TenantManager('school', shared=True)
 
     def clean(self):
         if self.start_time >= self.end_time:
@@ -142,6 +332,18 @@ class Period(models.Model):
         verbose_name_plural = "Periods"
         ordering = ['order', 'start_time']
 
+class TimeSlotQuerySet(AcademicYearQuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        """Fill in the school of slots created without one, as TimeSlot.save() does"""
+        objs = list(objs)
+        class_ids = {slot.school_class_id for slot in objs if slot.school_id is None}
+        if class_ids:
+            schools = dict(Class.objects.filter(id__in=class_ids).values_list('id', 'department__school_id'))
+            for slot in objs:
+                if slot.school_id is None:
+                    slot.school_id = schools.get(slot.school_class_id)
+        return super().bulk_create(objs, *args, **kwargs)
+
 class TimeSlot(models.Model):
     """Individual timetable slots"""
     DAYS_OF_WEEK = [
@@ -160,11 +362,23 @@ class TimeSlot(models.Model):
     classroom = models.ForeignKey(ClassRoom, on_delete=models.CASCADE, null=True, blank=True)
     period = models.ForeignKey(Period, on_delete=models.CASCADE)
     day_of_week = models.CharField(max_length=3, choices=DAYS_OF_WEEK)
-    academic_year = models.CharField(max_length=9)
+    academic_year = models.CharField(max_length=9, default=current_academic_year)
     is_active = models.BooleanField(default=True)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # The class's school, copied here so tenant queries and indexes need no join
+    school = models.ForeignKey(School, on_delete=models.CASCADE, null=True, blank=True, editable=False,
+                               related_name='time_slots')
+
+    objects = TenantManager.from_queryset(TimeSlotQuerySet)('school')
+
+    def save(self, *args, **kwargs):
+        if self.school_id is None and self.school_class_id:
+            self.school_id = Class.objects.filter(id=self.school_class_id).values_list(
+                'department__school_id', flat=True
+            ).first()
+        super().save(*args, **kwargs)
 
     def clean(self):
         """Validate time slot constraints"""
@@ -174,6 +388,12 @@ class TimeSlot(models.Model):
         if not self.period.is_break and not (self.subject and self.teacher):
             raise ValidationError("Non-break periods must have both subject and teacher assigned")
 
+        # Workload caps and room capacity
+        from .validation import TimetableValidator
+        violations = TimetableValidator(self.academic_year).validate_slot(self)
+        if violations:
+            raise ValidationError([violation.message for violation in violations])
+
     def __str__(self):
         if self.period.is_break:
             return f"{self.school_class} - {self.day_of_week} - {self.period.name}"
@@ -185,6 +405,16 @@ class TimeSlot(models.Model):
         unique_together = [
             ['school_class', 'day_of_week', 'period', 'academic_year'],
         ]
+        indexes = [
+            # Year-scoped lookups used by conflict checks, generation and snapshots
+            models.Index(fields=['academic_year', 'is_active', 'day_of_week', 'period'], name='timeslot_year_cell_idx'),
+            models.Index(fields=['academic_year', 'teacher', 'day_of_week'], name='timeslot_year_teacher_idx'),
+            models.Index(fields=['academic_year', 'classroom', 'day_of_week'], name='timeslot_year_room_idx'),
+            # The same lookups within one school
+            models.Index(fields=['school', 'academic_year', 'is_active', 'day_of_week', 'period'],
+                         name='timeslot_school_cell_idx'),
+            models.Index(fields=['school', 'academic_year', 'classroom', 'day_of_week'], name='timeslot_school_room_idx'),
+        ]
         ordering = ['day_of_week', 'period__order']
 
 class ConflictLog(models.Model):
@@ -203,6 +433,8 @@ class ConflictLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
 
+    objects = TenantManager('time_slot1__school')
+
     def __str__(self):
         return f"{self.conflict_type} - {self.created_at.date()}"
 
@@ -221,6 +453,19 @@ class TimetableTemplate(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    def grade_level_list(self):
+        """grade_levels as a list of ints"""
+        return [int(level) for level in self.grade_levels.replace(' ', '').split(',') if level.isdigit()]
+
+    def matching_classes(self, academic_year=None):
+        """Active classes of the year whose grade (and department, if set) the template covers"""
+        classes = Class.objects.for_year(academic_year or current_academic_year()).filter(
+            is_active=True, grade_level__in=self.grade_level_list()
+        )
+        if self.department_id:
+            classes = classes.filter(department_id=self.department_id)
+        return classes
+
     def __str__(self):
         return self.name
 
@@ -228,3 +473,301 @@ class TimetableTemplate(models.Model):
         verbose_name = "Timetable Template"
         verbose_name_plural = "Timetable Templates"
         ordering = ['-created_at']
+
+class TemplateCell(models.Model):
+    """One (day, period) cell of a template; no subject means the cell stays free"""
+    template = models.ForeignKey(TimetableTemplate, on_delete=models.CASCADE, related_name='cells')
+    day_of_week = models.CharField(max_length=3, choices=TimeSlot.DAYS_OF_WEEK)
+    period = models.ForeignKey(Period, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.template} - {self.day_of_week} - {self.period.name}"
+
+    class Meta:
+        verbose_name = "Template Cell"
+        verbose_name_plural = "Template Cells"
+        unique_together = ['template', 'day_of_week', 'period']
+        ordering = ['template', 'day_of_week', 'period__order']
+
+class ArchivedTimeSlot(models.Model):
+    """Read-only copy of a time slot from a closed academic year
+
+    Names are stored alongside the original ids so archived timetables stay
+    readable after classes, teachers or rooms are removed. The ArchiveRouter
+    can place this table in a separate database.
+    """
+    original_id = models.BigIntegerField()
+    academic_year = models.CharField(max_length=9, db_index=True)
+    school_class_id = models.BigIntegerField()
+    class_name = models.CharField(max_length=100)
+    subject_id = models.BigIntegerField(null=True, blank=True)
+    subject_name = models.CharField(max_length=130, blank=True)
+    teacher_id = models.BigIntegerField(null=True, blank=True)
+    teacher_name = models.CharField(max_length=200, blank=True)
+    classroom_id = models.BigIntegerField(null=True, blank=True)
+    room_number = models.CharField(max_length=20, blank=True)
+    period_id = models.BigIntegerField()
+    period_name = models.CharField(max_length=20)
+    day_of_week = models.CharField(max_length=3, choices=TimeSlot.DAYS_OF_WEEK)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    # Id of the slot's school; an id only, like the columns above, as the archive may be another database
+    school_id = models.BigIntegerField(null=True, blank=True)
+
+    objects = TenantManager.from_queryset(AcademicYearQuerySet)('school_id')
+
+    def __str__(self):
+        return f"{self.academic_year} - {self.class_name} - {self.day_of_week} - {self.period_name}"
+
+    class Meta:
+        verbose_name = "Archived Time Slot"
+        verbose_name_plural = "Archived Time Slots"
+        ordering = ['academic_year', 'class_name', 'day_of_week', 'period_name']
+        indexes = [
+            models.Index(fields=['academic_year', 'school_class_id'], name='archived_year_class_idx'),
+            models.Index(fields=['academic_year', 'teacher_id'], name='archived_year_teacher_idx'),
+            models.Index(fields=['school_id', 'academic_year'], name='archived_school_year_idx'),
+        ]
+
+class TimetableRevision(models.Model):
+    """Change counter for one academic year's timetable
+
+    Bumped after every committed TimeSlot write so derived data (binary
+    snapshots, caches) can tell whether it is stale with a single lookup.
+    The key changes whenever the row is recreated, so a counter from one
+    database is never mistaken for another's. Each school has its own
+    counter per year, and the counter without a school covers every school:
+    a write bumps its school's counter and that one.
+    """
+    academic_year = models.CharField(max_length=9)
+    # None for the counter of every school's timetable
+    school = models.ForeignKey(School, on_delete=models.CASCADE, null=True, blank=True, related_name='timetable_revisions')
+    revision = models.PositiveBigIntegerField(default=0)
+    key = models.CharField(max_length=32, default=_revision_key, editable=False)
+    # Change-log cursors below this were pruned; clients holding one must reload
+    changes_pruned_through = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # The active school's counters and the one of every school; all of them while no school is active
+    objects = TenantManager('school', shared=True)
+
+    @classmethod
+    def current(cls, academic_year):
+        """(revision, key) of the active school's counter for a year, creating it on first use"""
+        school_id = current_school_id()
+        row = cls.objects.filter(school_id=school_id, academic_year=academic_year).values_list('revision', 'key').first()
+        if row is None:
+            counter, _ = cls.objects.get_or_create(school_id=school_id, academic_year=academic_year)
+            row = (counter.revision, counter.key)
+        return row
+
+    @classmethod
+    def bump(cls, academic_year, school=None):
+        """Increment the year's revision for a school (the active one by default) and for every school"""
+        counters = cls.objects.for_school(school) if school else cls.objects.all()
+        updated = counters.filter(academic_year=academic_year).update(
+            revision=models.F('revision') + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            _, created = cls.objects.get_or_create(
+                school_id=school or current_school_id(), academic_year=academic_year, defaults={'revision': 1}
+            )
+            if not created:
+                cls.bump(academic_year, school)
+
+    def __str__(self):
+        return f"{self.academic_year} r{self.revision}"
+
+    class Meta:
+        verbose_name = "Timetable Revision"
+        verbose_name_plural = "Timetable Revisions"
+        constraints = [
+            models.UniqueConstraint(fields=['school', 'academic_year'], name='revision_school_year_unique'),
+            models.UniqueConstraint(fields=['academic_year'], condition=models.Q(school__isnull=True),
+                                    name='revision_shared_year_unique'),
+        ]
+
+class TimetableVersion(models.Model):
+    """Named copy of one academic year's timetable
+
+    Base versions store every active lesson; other versions store only the
+    cells that differ from their base, so frequent backups stay small. Both
+    are zlib-compressed integer arrays, see apps/timetable/versions.py.
+    """
+    name = models.CharField(max_length=100)
+    academic_year = models.CharField(max_length=9, db_index=True)
+    # School whose lessons the version holds, blank for every school's
+    school = models.ForeignKey(School, on_delete=models.CASCADE, null=True, blank=True, related_name='timetable_versions')
+    base = models.ForeignKey('self', on_delete=models.PROTECT, null=True, blank=True, related_name='deltas')
+    data = models.BinaryField()
+    lesson_count = models.PositiveIntegerField(default=0)
+    stored_rows = models.PositiveIntegerField(default=0)
+    revision = models.PositiveBigIntegerField(default=0)
+    is_automatic = models.BooleanField(default=False)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def is_base(self):
+        return self.base_id is None
+
+    def __str__(self):
+        return f"{self.academic_year} - {self.name}"
+
+    class Meta:
+        verbose_name = "Timetable Version"
+        verbose_name_plural = "Timetable Versions"
+        ordering = ['-created_at', '-id']
+
+class TimeSlotChange(models.Model):
+    """Append-only log of TimeSlot writes, read by the change feed
+
+    The id is the feed cursor. Each entry holds the slot's full state after
+    the write (no state for deletions), so superseded entries of the same
+    slot can be compacted away without changing what a client ends up with.
+    Entries are written in the same transaction as the slot.
+    """
+    SAVE = 'SAVE'
+    DELETE = 'DELETE'
+    ACTIONS = [
+        (SAVE, 'Saved'),
+        (DELETE, 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    academic_year = models.CharField(max_length=9)
+    # The slot's school; the feed of a school only returns its own entries
+    school = models.ForeignKey(School, on_delete=models.CASCADE, null=True, blank=True, editable=False,
+                               related_name='timeslot_changes')
+    slot_id = models.PositiveBigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTIONS)
+    data = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = TenantManager('school')
+
+    def __str__(self):
+        return f"#{self.id} {self.action} slot {self.slot_id}"
+
+    class Meta:
+        verbose_name = "Time Slot Change"
+        verbose_name_plural = "Time Slot Changes"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['academic_year', 'id'], name='change_year_cursor_idx'),
+            models.Index(fields=['academic_year', 'slot_id'], name='change_year_slot_idx'),
+            models.Index(fields=['school', 'academic_year', 'id'], name='change_school_cursor_idx'),
+        ]
+
+class SearchDocument(models.Model):
+    """Searchable entry for one teacher, subject, room or class
+
+    Kept in sync by signals; see apps/timetable/search.py. The trigrams of
+    text are stored in SearchTrigram so lookups use an index instead of
+    scanning the source tables with icontains.
+    """
+    KINDS = [
+        ('teacher', 'Teacher'),
+        ('subject', 'Subject'),
+        ('room', 'Room'),
+        ('class', 'Class'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField()
+    # None for rooms shared by every school
+    school = models.ForeignKey(School, on_delete=models.CASCADE, null=True, blank=True, editable=False,
+                               related_name='search_documents')
+    label = models.CharField(max_length=200)
+    detail = models.CharField(max_length=200, blank=True)
+    text = models.CharField(max_length=300)
+    trigram_count = models.PositiveIntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.kind}: {self.label}"
+
+    class Meta:
+        verbose_name = "Search Document"
+        verbose_name_plural = "Search Documents"
+        unique_together = ['kind', 'object_id']
+
+class SearchTrigram(models.Model):
+    """One trigram of a SearchDocument's text"""
+    trigram = models.CharField(max_length=3)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='trigrams')
+
+    class Meta:
+        verbose_name = "Search Trigram"
+        verbose_name_plural = "Search Trigrams"
+        indexes = [
+            models.Index(fields=['trigram', 'document'], name='search_trigram_idx'),
+        ]
+
+class TimetableAggregate(models.Model):
+    """Lesson count of one academic year for one day, subject, teacher or room
+
+    Read by the dashboard charts instead of grouping TimeSlot on every page
+    view; room_period counts the lessons held in a room in each period.
+    Counts are kept per school and for all schools together (school 0).
+    Signals and the bulk writers keep the counts current; the row with
+    dimension 'total' marks a year whose counts have been built, see
+    apps/timetable/aggregates.py.
+    """
+    DIMENSIONS = [
+        ('total', 'Total'),
+        ('day', 'Day'),
+        ('subject', 'Subject'),
+        ('teacher', 'Teacher'),
+        ('room', 'Room'),
+        ('room_period', 'Rooms in use per period'),
+    ]
+
+    academic_year = models.CharField(max_length=9)
+    school = models.PositiveIntegerField(default=0)  # School id, 0 for every school together
+    dimension = models.CharField(max_length=12, choices=DIMENSIONS)
+    key = models.CharField(max_length=20, blank=True)
+    lessons = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.academic_year} {self.dimension}={self.key}: {self.lessons}"
+
+    class Meta:
+        verbose_name = "Timetable Aggregate"
+        verbose_name_plural = "Timetable Aggregates"
+        unique_together = ['school', 'academic_year', 'dimension', 'key']
+
+class ProfileRecord(models.Model):
+    """cProfile run of one request, engine call or background task
+
+    data holds the zlib-compressed marshal of the pstats table, the same
+    format as a .prof file; summary keeps the hottest functions so the admin
+    can list them without decompressing. See apps/timetable/profiling.py.
+    """
+    KINDS = [
+        ('request', 'Request'),
+        ('engine', 'Engine call'),
+        ('task', 'Background task'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    name = models.CharField(max_length=200)
+    path = models.CharField(max_length=500, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    duration_ms = models.FloatField()
+    function_calls = models.PositiveIntegerField(default=0)
+    summary = models.JSONField(default=list)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.duration_ms:.0f} ms)"
+
+    class Meta:
+        verbose_name = "Profile Record"
+        verbose_name_plural = "Profile Records"
+        ordering = ['-created_at', '-id']
@@ -0,0 +1,227 @@
+# apps/timetable/occupancy.py
+from collections import defaultdict
+
+from django.db import transaction
+
+from .conf import timetable_setting
+from .models import TimeSlot, Period, ClassRoom, Teacher, Class, Subject, current_academic_year
+from .overlap import intervals_of, overlapping_periods
+from .snapshot import TimetableSnapshot
+from .tenancy import tenant_db_alias
+
+DEFAULT_DAYS = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT']
+
+def working_days():
+    """Days the school timetables, from TIMETABLE_SETTINGS"""
+    return list(timetable_setting('DEFAULT_WORKING_DAYS', DEFAULT_DAYS))
+
+class OccupancySnapshot:
+    """In-memory view of which classes, teachers and rooms are busy in each cell
+
+    Built from a handful of flat queries so callers can test thousands of
+    (day, period) candidates without touching the database. Slots are stored
+    as tuples: (id, class_id, subject_id, teacher_id, room_id, day, period_id).
+    Cells are compared by time, so a lesson in a long period also makes the
+    shorter periods it overlaps busy (see apps/timetable/overlap.py).
+    """
+
+    ID, CLASS, SUBJECT, TEACHER, ROOM, DAY, PERIOD = range(7)
+
+    def __init__(self, slots, periods, rooms, teachers, classes, subjects=None, days=None, room_types=None):
+        self.days = days or working_days()
+        self.periods = periods      # period_id -> {'order', 'is_break', 'start_time', 'end_time'}
+        self.rooms = rooms          # room_id -> {'capacity', 'room_type'}
+        self.teachers = teachers    # teacher_id -> {'department_id', 'max_per_day', 'max_per_week'}
+        self.classes = classes      # class_id -> {'total_students', 'department_id'}
+        self.subjects = subjects or {}  # subject_id -> department_id
+        self.room_types = room_types or {}  # subject_id -> required_room_type, for subjects that need one
+
+        # period_id -> ids of the periods sharing some of its time, itself included
+        intervals = intervals_of(periods)
+        self.overlaps = {period_id: overlapping_periods(period_id, intervals) for period_id in intervals}
+
+        self.slots = {}
+        self.class_index = defaultdict(set)
+        self.by_class = defaultdict(set)
+        self.by_teacher = defaultdict(set)
+        self.by_room = defaultdict(set)
+        self.teacher_day_load = defaultdict(int)
+        self.teacher_week_load = defaultdict(int)
+
+        for slot in slots:
+            self.add(slot)
+
+    @classmethod
+    def load(cls, academic_year=None, queryset=None, days=None):
+        """Load the active timetable of one academic year (the current one by default)"""
+        # Uncommitted writes have not bumped the revision yet, so read them directly
+        use_snapshot = timetable_setting('BINARY_SNAPSHOTS', True) and not transaction.get_connection(tenant_db_alias()).in_atomic_block
+        if queryset is None and use_snapshot:
+            # Shared memory-mapped copy of the year, rebuilt only when its revision changes
+            slots = TimetableSnapshot.load(academic_year).rows(days=days)
+        else:
+            if queryset is None:
+                queryset = TimeSlot.objects.for_year(academic_year or current_academic_year()).filter(is_active=True)
+                if days:
+                    queryset = queryset.filter(day_of_week__in=days)
+            slots = queryset.values_list(
+                'id', 'school_class_id', 'subject_id', 'teacher_id', 'classroom_id', 'day_of_week', 'period_id'
+            )
+        periods = {
+            period['id']: period
+            for period in Period.objects.order_by('order').values('id', 'order', 'is_break', 'start_time', 'end_time')
+        }
+        rooms = {
+            room['id']: room
+            for room in ClassRoom.objects.filter(is_active=True).values('id', 'capacity', 'room_type')
+        }
+        teachers = {
+            teacher['id']: {
+                'department_id': teacher['department_id'],
+                'max_per_day': teacher['max_periods_per_day'],
+                'max_per_week': teacher['max_periods_per_week'],
+            }
+            for teacher in Teacher.objects.filter(is_active=True).values(
+                'id', 'department_id', 'max_periods_per_day', 'max_periods_per_week'
+            )
+        }
+        classes = {
+            school_class['id']: school_class
+            for school_class in Class.objects.values('id', 'total_students', 'department_id')
+        }
+        subjects, room_types = {}, {}
+        for subject_id, department_id, room_type in Subject.objects.values_list('id', 'department_id', 'required_room_type'):
+            subjects[subject_id] = department_id
+            if room_type:
+                room_types[subject_id] = room_type
+        return cls(list(slots), periods, rooms, teachers, classes, subjects=subjects, days=days, room_types=room_types)
+
+    # Cells
+
+    def teaching_periods(self):
+        """Non-break period ids in timetable order"""
+        return [period_id for period_id, period in self.periods.items() if not period['is_break']]
+
+    def teaching_cells(self):
+        """All (day, period_id) cells that can hold a lesson"""
+        periods = self.teaching_periods()
+        return [(day, period_id) for day in self.days for period_id in periods]
+
+    def is_teaching_period(self, period_id):
+        period = self.periods.get(period_id)
+        return period is not None and not period['is_break']
+
+    # Mutation
+
+    def add(self, slot):
+        """Register a slot tuple in every index"""
+        slot = tuple(slot)
+        slot_id, class_id, _, teacher_id, room_id, day, period_id = slot
+        self.slots[slot_id] = slot
+        self.class_index[class_id].add(slot_id)
+        self.by_class[(class_id, day, period_id)].add(slot_id)
+        if teacher_id:
+            self.by_teacher[(teacher_id, day, period_id)].add(slot_id)
+            if self.is_teaching_period(period_id):
+                self.teacher_day_load[(teacher_id, day)] += 1
+                self.teacher_week_load[teacher_id] += 1
+        if room_id:
+            self.by_room[(room_id, day, period_id)].add(slot_id)
+
+    def remove(self, slot_id):
+        """Drop a slot from every index and return its tuple"""
+        slot = self.slots.pop(slot_id)
+        _, class_id, _, teacher_id, room_id, day, period_id = slot
+        self.class_index[class_id].discard(slot_id)
+        self.by_class[(class_id, day, period_id)].discard(slot_id)
+        if teacher_id:
+            self.by_teacher[(teacher_id, day, period_id)].discard(slot_id)
+            if self.is_teaching_period(period_id):
+                self.teacher_day_load[(teacher_id, day)] -= 1
+                self.teacher_week_load[teacher_id] -= 1
+        if room_id:
+            self.by_room[(room_id, day, period_id)].discard(slot_id)
+        return slot
+
+    def update(self, slot_id, **changes):
+        """Move or reassign a slot in place; keys are 'day', 'period_id', 'teacher_id', 'room_id', 'subject_id'"""
+        slot = list(self.remove(slot_id))
+        fields = {'subject_id': self.SUBJECT, 'teacher_id': self.TEACHER, 'room_id': self.ROOM,
+                  'day': self.DAY, 'period_id': self.PERIOD}
+        for key, value in changes.items():
+            slot[fields[key]] = value
+        self.add(slot)
+        return tuple(slot)
+
+    # Queries
+
+    def _overlapping(self, index, entity_id, day, period_id):
+        """Slot ids holding the entity in any period overlapping period_id on the day"""
+        occupants = set()
+        for other in self.overlaps.get(period_id) or (period_id,):
+            occupants.update(index.get((entity_id, day, other), ()))
+        return occupants
+
+    def _busy(self, index, entity_id, day, period_id, ignore):
+        for other in self.overlaps.get(period_id) or (period_id,):
+            for slot_id in index.get((entity_id, day, other), ()):
+                if slot_id not in ignore:
+                    return True
+        return False
+
+    def class_free(self, class_id, day, period_id, ignore=()):
+        return not self._busy(self.by_class, class_id, day, period_id, ignore)
+
+    def teacher_free(self, teacher_id, day, period_id, ignore=()):
+        return not self._busy(self.by_teacher, teacher_id, day, period_id, ignore)
+
+    def room_free(self, room_id, day, period_id, ignore=()):
+        return not self._busy(self.by_room, room_id, day, period_id, ignore)
+
+    def occupants(self, kind, entity_id, day, period_id):
+        """Slot ids holding a class, teacher or room in a cell or any cell overlapping it"""
+        index = {'class': self.by_class, 'teacher': self.by_teacher, 'room': self.by_room}[kind]
+        return self._overlapping(index, entity_id, day, period_id)
+
+    def free_rooms(self, day, period_id, ignore=()):
+        """Active room ids with nothing booked in the cell"""
+        return [
+            room_id for room_id in self.rooms
+            if self.room_free(room_id, day, period_id, ignore)
+        ]
+
+    def room_fits(self, room_id, class_id, subject_id):
+        """Whether an active room seats the class and is of the type the subject requires, as in RoomAssigner.cost"""
+        room = self.rooms.get(room_id)
+        if room is None or room['capacity'] < self.classes.get(class_id, {}).get('total_students', 0):
+            return False
+        required = self.room_types.get(subject_id)
+        return not required or room['room_type'] == required
+
+    def teacher_day_slots(self, teacher_id, day):
+        """Slot tuples a teacher holds on one day, in period order"""
+        slots = []
+        for period_id in self.periods:
+            for slot_id in self.by_teacher.get((teacher_id, day, period_id), ()):
+                slots.append(self.slots[slot_id])
+        return slots
+
+    def class_slots(self, class_id):
+        """All slot tuples of one class"""
+        return [self.slots[slot_id] for slot_id in self.class_index.get(class_id, ())]
+
+    def teacher_daily_capacity(self, teacher_id, day):
+        """Teaching periods the teacher can still take on a day under their daily cap"""
+        teacher = self.teachers.get(teacher_id)
+        if teacher is None:
+            return 0
+        cap = min(teacher['max_per_day'], timetable_setting('MAX_PERIODS_PER_TEACHER_PER_DAY', teacher['max_per_day']))
+        return cap - self.teacher_day_load[(teacher_id, day)]
+
+    def teacher_weekly_capacity(self, teacher_id):
+        """Teaching periods the teacher can still take this week under their weekly cap"""
+        teacher = self.teachers.get(teacher_id)
+        if teacher is None:
+            return 0
+        cap = min(teacher['max_per_week'], timetable_setting('MAX_PERIODS_PER_TEACHER_PER_WEEK', teacher['max_per_week']))
+        return cap - self.teacher_week_load[teacher_id]
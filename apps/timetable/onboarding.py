@@ -0,0 +1,175 @@
+# apps/timetable/onboarding.py
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.db import transaction
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from apps.users.models import UserProfile
+
+from .conf import timetable_setting
+from .models import Department, Teacher
+from .search import index_objects
+from .tenancy import tenant_db_alias
+
+# Columns of a staff row; employee_id and department (code or id) are required
+STAFF_FIELDS = (
+    'username', 'email', 'first_name', 'last_name', 'employee_id', 'department',
+    'phone', 'specialization', 'max_periods_per_day', 'max_periods_per_week',
+)
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def invite_path(user):
+    """Path of the page where an onboarded user chooses a password
+
+    The token is Django's password reset token, so it stops working once a
+    password is set or after PASSWORD_RESET_TIMEOUT.
+    """
+    uidb64 = urlsafe_base64_encode(force_bytes(user.pk))
+    return reverse('users:invite', args=[uidb64, default_token_generator.make_token(user)])
+
+class StaffOnboarder:
+    """Create teachers, with their users and profiles, from rows of staff details
+
+    Saving users one at a time fires the profile signals for each (two
+    queries and a write) and set_password() runs the password hasher, a few
+    hundred milliseconds per person. Here users, profiles and teachers are
+    written with chunked bulk_create in one transaction, so no signal
+    fires, and every password is left unusable: with invite, each user gets
+    a link to choose one, and the hash is computed then. All rows are
+    checked first; if any is invalid nothing is written.
+    """
+
+    def __init__(self, invite=False, chunk_size=None):
+        self.invite = invite
+        self.chunk_size = chunk_size or timetable_setting('ONBOARDING_CHUNK_SIZE', 500)
+
+    def onboard(self, rows, dry_run=False):
+        started = time.perf_counter()
+        rows = [self._clean(row) for row in rows]
+        errors = self._validate(rows)
+
+        result = {
+            'rows': len(rows),
+            'created': 0,
+            'errors': errors,
+            'invites': [],
+            'dry_run': dry_run,
+        }
+        if errors or dry_run or not rows:
+            result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            return result
+
+        teachers = []
+        with transaction.atomic(using=tenant_db_alias()):
+            for chunk in _chunks(rows, self.chunk_size):
+                users = User.objects.bulk_create([
+                    User(
+                        username=row['username'], email=row['email'],
+                        first_name=row['first_name'], last_name=row['last_name'],
+                        password=make_password(None),
+                    )
+                    for row in chunk
+                ])
+                UserProfile.objects.bulk_create([
+                    UserProfile(user=user, user_type='TEACHER', phone=row['phone'])
+                    for user, row in zip(users, chunk)
+                ])
+                teachers += Teacher.objects.bulk_create([
+                    Teacher(
+                        user=user, employee_id=row['employee_id'], department_id=row['department_id'],
+                        phone=row['phone'], specialization=row['specialization'],
+                        max_periods_per_day=row['max_periods_per_day'],
+                        max_periods_per_week=row['max_periods_per_week'],
+                    )
+                    for user, row in zip(users, chunk)
+                ])
+            for chunk in _chunks(teachers, self.chunk_size):
+                index_objects(chunk)
+
+        result['created'] = len(teachers)
+        if self.invite:
+            result['invites'] = [
+                {'username': teacher.user.username, 'email': teacher.user.email,
+                 'employee_id': teacher.employee_id, 'path': invite_path(teacher.user)}
+                for teacher in teachers
+            ]
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    @staticmethod
+    def _clean(row):
+        row = {field: str(row.get(field) or '').strip() for field in STAFF_FIELDS}
+        row['username'] = User.normalize_username(row['username'])
+        row['email'] = User.objects.normalize_email(row['email'])
+        return row
+
+    def _validate(self, rows):
+        """Resolve departments, limits and usernames in place; returns [{'row', 'message'}]"""
+        errors = []
+
+        def error(number, message):
+            errors.append({'row': number, 'message': message})
+
+        departments, schools = {}, {}
+        references = {row['department'] for row in rows if row['department']}
+        for chunk in _chunks(sorted(references), self.chunk_size):
+            for department in Department.objects.filter(code__in=chunk).only('id', 'code', 'school_id'):
+                # Codes are unique per school; with no school active one may name several departments
+                departments[department.code] = None if department.code in departments else department.id
+                schools[department.id] = department.school_id
+            ids = [int(value) for value in chunk if value.isdigit()]
+            for department_id, school_id in Department.objects.filter(id__in=ids).values_list('id', 'school_id'):
+                departments.setdefault(str(department_id), department_id)
+                schools[department_id] = school_id
+
+        # Employee ids are unique within a school, usernames across the database
+        employee_ids = [row['employee_id'] for row in rows if row['employee_id']]
+        taken_ids = set()
+        for chunk in _chunks(employee_ids, self.chunk_size):
+            taken_ids.update(Teacher._base_manager.filter(employee_id__in=chunk).values_list(
+                'employee_id', 'department__school_id'
+            ))
+
+        for row in rows:
+            if not row['username']:
+                name = '.'.join(part for part in (row['first_name'], row['last_name']) if part)
+                row['username'] = (row['email'].split('@')[0] or name or row['employee_id']).lower().replace(' ', '')
+        taken_names = set()
+        for chunk in _chunks([row['username'] for row in rows], self.chunk_size):
+            taken_names.update(User.objects.filter(username__in=chunk).values_list('username', flat=True))
+
+        seen_ids, seen_names = set(), set()
+        for number, row in enumerate(rows, 1):
+            row['department_id'] = departments.get(row['department'])
+            if row['department'] in departments and row['department_id'] is None:
+                error(number, f"Department \"{row['department']}\" is used by several schools; give its id")
+            elif row['department_id'] is None:
+                error(number, f"Unknown department \"{row['department']}\"")
+
+            employee = (row['employee_id'], schools.get(row['department_id']))
+            if not row['employee_id']:
+                error(number, 'employee_id is required')
+            elif employee in taken_ids or employee in seen_ids:
+                error(number, f"Employee id {row['employee_id']} is already used")
+            seen_ids.add(employee)
+
+            for field in ('max_periods_per_day', 'max_periods_per_week'):
+                value = row[field] or str(Teacher._meta.get_field(field).default)
+                if not value.isdigit():
+                    error(number, f'{field} must be a whole number, not "{value}"')
+                row[field] = int(value) if value.isdigit() else None
+
+            if row['username'] in taken_names or row['username'] in seen_names:
+                error(number, f"Username {row['username']} is already taken")
+            elif len(row['username']) > User._meta.get_field('username').max_length:
+                error(number, f"Username {row['username']} is too long")
+            seen_names.add(row['username'])
+        return errors
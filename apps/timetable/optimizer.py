@@ -0,0 +1,363 @@
+# apps/timetable/optimizer.py
+import math
+import random
+import time
+
+import numpy as np
+
+from .conf import timetable_setting
+from .models import TimeSlot, Period, ClassRoom, Teacher, current_academic_year
+from .occupancy import working_days
+from .overlap import overlapping_periods, period_intervals
+from .repair import TimetableRepairer
+
+DEFAULT_WEIGHTS = {
+    'teacher_gaps': 1.0,        # idle periods between a teacher's first and last lesson of a day
+    'subject_spread': 2.0,      # each extra lesson of a subject on a day the class already has it
+    'back_to_back_labs': 3.0,   # a class in lab rooms for two adjacent periods
+}
+LAB_ROOM_TYPES = ('LAB', 'COMPUTER')
+
+def soft_constraint_weights():
+    """DEFAULT_WEIGHTS overridden by TIMETABLE_SETTINGS['SOFT_CONSTRAINT_WEIGHTS']"""
+    weights = dict(DEFAULT_WEIGHTS)
+    weights.update(timetable_setting('SOFT_CONSTRAINT_WEIGHTS', {}))
+    return weights
+
+class TimetableOptimizer:
+    """Improve a feasible timetable against weighted soft constraints
+
+    Lessons are held as integer arrays and occupancy as count grids
+    (class/teacher/room x day x period), so the full score is a few numpy
+    reductions and a candidate move is scored by recomputing only the
+    teacher-day, class-day and class-subject-day rows it touches.
+
+    The search is simulated annealing over two neighbourhoods: moving a
+    lesson to a free cell of its class, and swapping two lessons of the
+    same class. Only moves that keep every class, teacher and room
+    clash-free and respect teacher daily caps are considered, so hard
+    constraints never get worse. The search stops at the time budget.
+    """
+
+    def __init__(self, academic_year=None, class_ids=None, weights=None):
+        self.academic_year = academic_year or current_academic_year()
+        self.class_ids = set(class_ids) if class_ids else None
+        self.weights = weights or soft_constraint_weights()
+        self._load()
+
+    # Loading
+
+    def _load(self):
+        self.days = working_days()
+        periods = list(Period.objects.order_by('order').values_list('id', 'is_break'))
+        self.period_ids = [period_id for period_id, is_break in periods if not is_break]
+
+        # Adjacent teaching periods with no break between them
+        adjacent = []
+        for (period_id, is_break), (_, next_is_break) in zip(periods, periods[1:]):
+            if not is_break:
+                adjacent.append(not next_is_break)
+        self.adjacent = np.array(adjacent[:max(len(self.period_ids) - 1, 0)], dtype=bool)
+
+        day_index = {day: index for index, day in enumerate(self.days)}
+        period_index = {period_id: index for index, period_id in enumerate(self.period_ids)}
+        # Grid columns sharing some time with each column; a plain index when only itself, to keep lookups scalar
+        intervals = period_intervals()
+        self.overlaps = []
+        for index, period_id in enumerate(self.period_ids):
+            columns = sorted(period_index[other] for other in overlapping_periods(period_id, intervals) if other in period_index)
+            self.overlaps.append(columns if len(columns) > 1 else index)
+        lab_rooms = set(ClassRoom.objects.filter(room_type__in=LAB_ROOM_TYPES).values_list('id', flat=True))
+
+        slots = TimeSlot.objects.for_year(self.academic_year).values_list(
+            'id', 'school_class_id', 'subject_id', 'teacher_id', 'classroom_id', 'day_of_week', 'period_id', 'is_active'
+        )
+        lessons, blockers = [], []
+        for row in slots:
+            if row[5] not in day_index or row[6] not in period_index:
+                continue
+            (lessons if row[7] else blockers).append(row)
+
+        self.class_keys = sorted({row[1] for row in lessons + blockers})
+        self.teacher_keys = sorted({row[3] for row in lessons if row[3]})
+        self.room_keys = sorted({row[4] for row in lessons if row[4]})
+        self.subject_keys = sorted({row[2] for row in lessons if row[2]})
+        class_index = {key: index for index, key in enumerate(self.class_keys)}
+        teacher_index = {key: index for index, key in enumerate(self.teacher_keys)}
+        room_index = {key: index for index, key in enumerate(self.room_keys)}
+        subject_index = {key: index for index, key in enumerate(self.subject_keys)}
+
+        # Lesson arrays; -1 marks a missing teacher, room or subject
+        self.row_id = np.array([row[0] for row in lessons], dtype=np.int64)
+        self.cls = np.array([class_index[row[1]] for row in lessons], dtype=np.int32)
+        self.subject = np.array([subject_index.get(row[2], -1) for row in lessons], dtype=np.int32)
+        self.teacher = np.array([teacher_index.get(row[3], -1) for row in lessons], dtype=np.int32)
+        self.room = np.array([room_index.get(row[4], -1) for row in lessons], dtype=np.int32)
+        self.lab = np.array([row[4] in lab_rooms for row in lessons], dtype=bool)
+        self.day = np.array([day_index[row[5]] for row in lessons], dtype=np.int32)
+        self.period = np.array([period_index[row[6]] for row in lessons], dtype=np.int32)
+        self.original_day = self.day.copy()
+        self.original_period = self.period.copy()
+        self.movable = np.array(
+            [self.class_ids is None or row[1] in self.class_ids for row in lessons], dtype=bool
+        )
+        self.blockers = [(class_index[row[1]], day_index[row[5]], period_index[row[6]]) for row in blockers]
+
+        max_per_day = timetable_setting('MAX_PERIODS_PER_TEACHER_PER_DAY', None)
+        caps = dict(Teacher.objects.filter(id__in=self.teacher_keys).values_list('id', 'max_periods_per_day'))
+        self.teacher_day_cap = np.array([
+            min(caps.get(key) or len(self.period_ids), max_per_day or len(self.period_ids)) for key in self.teacher_keys
+        ], dtype=np.int32)
+
+        self.lessons_by_class = {}
+        for lesson, class_position in enumerate(self.cls):
+            self.lessons_by_class.setdefault(int(class_position), []).append(lesson)
+
+        self._build_grids()
+
+    def _build_grids(self):
+        shape = (len(self.days), len(self.period_ids))
+        self.class_grid = np.zeros((len(self.class_keys),) + shape, dtype=np.int16)
+        self.teacher_grid = np.zeros((len(self.teacher_keys),) + shape, dtype=np.int16)
+        self.room_grid = np.zeros((len(self.room_keys),) + shape, dtype=np.int16)
+        self.lab_grid = np.zeros((len(self.class_keys),) + shape, dtype=np.int16)
+        self.subject_days = np.zeros((len(self.class_keys), len(self.subject_keys), len(self.days)), dtype=np.int16)
+
+        for class_position, day, period in self.blockers:
+            self.class_grid[class_position, day, period] += 1
+        for lesson in range(len(self.row_id)):
+            self._place(lesson, 1)
+
+    def _place(self, lesson, sign):
+        """Add (sign=1) or remove (sign=-1) a lesson at its current cell in every grid"""
+        class_position, day, period = self.cls[lesson], self.day[lesson], self.period[lesson]
+        self.class_grid[class_position, day, period] += sign
+        if self.teacher[lesson] >= 0:
+            self.teacher_grid[self.teacher[lesson], day, period] += sign
+        if self.room[lesson] >= 0:
+            self.room_grid[self.room[lesson], day, period] += sign
+        if self.lab[lesson]:
+            self.lab_grid[class_position, day, period] += sign
+        if self.subject[lesson] >= 0:
+            self.subject_days[class_position, self.subject[lesson], day] += sign
+
+    # Scoring
+
+    def breakdown(self):
+        """Unweighted penalty counts for the whole timetable"""
+        busy = self.teacher_grid > 0
+        count = busy.sum(axis=2)
+        first = busy.argmax(axis=2)
+        last = busy.shape[2] - 1 - busy[..., ::-1].argmax(axis=2)
+        gaps = np.where(count > 0, last - first + 1 - count, 0).sum() if busy.size else 0
+
+        labs = self.lab_grid > 0
+        back_to_back = (labs[..., :-1] & labs[..., 1:] & self.adjacent).sum() if labs.size else 0
+
+        return {
+            'teacher_gaps': int(gaps),
+            'subject_spread': int(np.maximum(self.subject_days - 1, 0).sum()),
+            'back_to_back_labs': int(back_to_back),
+        }
+
+    def score(self):
+        """Weighted soft-constraint penalty of the whole timetable (lower is better)"""
+        return sum(self.weights.get(name, 0) * value for name, value in self.breakdown().items())
+
+    def _teacher_row_cost(self, teacher, day):
+        busy = np.flatnonzero(self.teacher_grid[teacher, day])
+        if busy.size == 0:
+            return 0.0
+        return self.weights['teacher_gaps'] * (busy[-1] - busy[0] + 1 - busy.size)
+
+    def _lab_row_cost(self, class_position, day):
+        labs = self.lab_grid[class_position, day] > 0
+        return self.weights['back_to_back_labs'] * int((labs[:-1] & labs[1:] & self.adjacent).sum())
+
+    def _subject_cost(self, class_position, subject, day):
+        return self.weights['subject_spread'] * max(int(self.subject_days[class_position, subject, day]) - 1, 0)
+
+    def _local_cost(self, lessons, days):
+        """Weighted penalty of only the rows the given lessons touch on the given days"""
+        cost = 0.0
+        teachers = {int(self.teacher[lesson]) for lesson in lessons if self.teacher[lesson] >= 0}
+        subjects = {int(self.subject[lesson]) for lesson in lessons if self.subject[lesson] >= 0}
+        class_position = int(self.cls[lessons[0]])
+        has_lab = any(self.lab[lesson] for lesson in lessons)
+        for day in days:
+            for teacher in teachers:
+                cost += self._teacher_row_cost(teacher, day)
+            for subject in subjects:
+                cost += self._subject_cost(class_position, subject, day)
+            if has_lab:
+                cost += self._lab_row_cost(class_position, day)
+        return cost
+
+    # Moves
+
+    def _free(self, grid, index, day, period, ignore=0):
+        return index < 0 or grid[index, day, self.overlaps[period]].sum() - ignore <= 0
+
+    def _under_cap(self, lesson, day, leaving_day):
+        teacher = self.teacher[lesson]
+        if teacher < 0 or day == leaving_day:
+            return True
+        return self.teacher_grid[teacher, day].sum() < self.teacher_day_cap[teacher]
+
+    def _apply(self, changes):
+        """Move lessons to new cells: changes is [(lesson, day, period)]"""
+        for lesson, _, _ in changes:
+            self._place(lesson, -1)
+        for lesson, day, period in changes:
+            self.day[lesson], self.period[lesson] = day, period
+            self._place(lesson, 1)
+
+    def _propose(self, rng, lesson):
+        """A feasible move or swap for a lesson as [(lesson, day, period)], or None"""
+        class_position = int(self.cls[lesson])
+        day, period = int(self.day[lesson]), int(self.period[lesson])
+
+        if rng.random() < 0.5:
+            new_day, new_period = rng.randrange(len(self.days)), rng.randrange(len(self.period_ids))
+            if not self._free(self.class_grid, class_position, new_day, new_period):
+                return None
+            if not self._free(self.teacher_grid, self.teacher[lesson], new_day, new_period):
+                return None
+            if not self._free(self.room_grid, self.room[lesson], new_day, new_period):
+                return None
+            if not self._under_cap(lesson, new_day, day):
+                return None
+            return [(lesson, new_day, new_period)]
+
+        other = rng.choice(self.lessons_by_class[class_position])
+        if other == lesson or not self.movable[other]:
+            return None
+        other_day, other_period = int(self.day[other]), int(self.period[other])
+        if (other_day, other_period) == (day, period):
+            return None
+        # A shared teacher or room is vacated by the partner, so it does not count as busy
+        same_teacher = int(self.teacher[lesson] == self.teacher[other])
+        same_room = int(self.room[lesson] == self.room[other])
+        if not (self._free(self.teacher_grid, self.teacher[lesson], other_day, other_period, same_teacher)
+                and self._free(self.teacher_grid, self.teacher[other], day, period, same_teacher)
+                and self._free(self.room_grid, self.room[lesson], other_day, other_period, same_room)
+                and self._free(self.room_grid, self.room[other], day, period, same_room)):
+            return None
+        if not same_teacher and not (self._under_cap(lesson, other_day, day) and self._under_cap(other, day, other_day)):
+            return None
+        return [(lesson, other_day, other_period), (other, day, period)]
+
+    # Search
+
+    def optimize(self, time_budget_ms=None, seed=None):
+        """Simulated annealing until the time budget runs out; keeps the best timetable found"""
+        started = time.perf_counter()
+        if time_budget_ms is None:
+            time_budget_ms = timetable_setting('OPTIMIZER_TIME_BUDGET_MS', 2000)
+        budget = time_budget_ms / 1000.0
+        rng = random.Random(seed)
+        start_temperature = timetable_setting('OPTIMIZER_INITIAL_TEMPERATURE', 2.0)
+        end_temperature = 0.01
+
+        initial = self.breakdown()
+        current = best = self.score()
+        best_state = (self.day.copy(), self.period.copy())
+        candidates = [int(lesson) for lesson in np.flatnonzero(self.movable)]
+        iterations = accepted = 0
+
+        temperature = start_temperature
+        while candidates and self.period_ids:
+            if iterations % 64 == 0:
+                elapsed = time.perf_counter() - started
+                if elapsed >= budget:
+                    break
+                temperature = start_temperature * (end_temperature / start_temperature) ** (elapsed / budget)
+            iterations += 1
+
+            changes = self._propose(rng, rng.choice(candidates))
+            if changes is None:
+                continue
+
+            lessons = [lesson for lesson, _, _ in changes]
+            days = {int(self.day[lesson]) for lesson in lessons} | {day for _, day, _ in changes}
+            undo = [(lesson, int(self.day[lesson]), int(self.period[lesson])) for lesson in lessons]
+
+            before = self._local_cost(lessons, days)
+            self._apply(changes)
+            delta = self._local_cost(lessons, days) - before
+
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                accepted += 1
+                current += delta
+                if current < best - 1e-9:
+                    best = current
+                    best_state = (self.day.copy(), self.period.copy())
+            else:
+                self._apply(undo)
+
+        self.day, self.period = best_state
+        self._build_grids()
+
+        return {
+            'academic_year': self.academic_year,
+            'initial': initial,
+            'final': self.breakdown(),
+            'initial_score': round(sum(self.weights.get(k, 0) * v for k, v in initial.items()), 3),
+            'final_score': round(self.score(), 3),
+            'iterations': iterations,
+            'accepted': accepted,
+            'lessons_moved': int(((self.day != self.original_day) | (self.period != self.original_period)).sum()),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    # Persistence
+
+    def diff(self):
+        """Per-row field changes that turn the stored timetable into the optimised one
+
+        Rows whose cell stays in use keep it and take over the lesson that
+        ends up there; only rows whose cell becomes empty change cell, and
+        always into a cell no row held before. No intermediate state of a
+        single bulk update can therefore break the (class, day, period)
+        unique constraint.
+        """
+        diff = []
+        for lessons in self.lessons_by_class.values():
+            before = {(int(self.original_day[l]), int(self.original_period[l])): l for l in lessons}
+            after = {(int(self.day[l]), int(self.period[l])): l for l in lessons}
+            new_cells = [cell for cell in after if cell not in before]
+            vacated = [cell for cell in before if cell not in after]
+
+            targets = {}
+            for cell, row_lesson in before.items():
+                if cell in after:
+                    targets[row_lesson] = (cell, after[cell])
+            for cell, new_cell in zip(vacated, new_cells):
+                targets[before[cell]] = (new_cell, after[new_cell])
+
+            for row_lesson, (cell, lesson) in targets.items():
+                changes = {}
+                old_cell = (int(self.original_day[row_lesson]), int(self.original_period[row_lesson]))
+                if cell != old_cell:
+                    changes['day_of_week'] = [self.days[old_cell[0]], self.days[cell[0]]]
+                    changes['period_id'] = [self.period_ids[old_cell[1]], self.period_ids[cell[1]]]
+                if lesson != row_lesson:
+                    for field, values, keys in (
+                        ('subject_id', self.subject, self.subject_keys),
+                        ('teacher_id', self.teacher, self.teacher_keys),
+                        ('classroom_id', self.room, self.room_keys),
+                    ):
+                        old = keys[values[row_lesson]] if values[row_lesson] >= 0 else None
+                        new = keys[values[lesson]] if values[lesson] >= 0 else None
+                        if old != new:
+                            changes[field] = [old, new]
+                if changes:
+                    diff.append({'slot_id': int(self.row_id[row_lesson]), 'changes': changes})
+        return diff
+
+    def apply(self):
+        """Save the optimised timetable with one bulk update; returns the diff"""
+        diff = self.diff()
+        if diff:
+            TimetableRepairer.apply(diff)
+        return diff
@@ -0,0 +1,105 @@
+# apps/timetable/overlap.py
+import heapq
+from collections import defaultdict, namedtuple
+
+from .models import Period
+
+# One clash between two lessons that share a teacher, room or class at overlapping times
+Clash = namedtuple('Clash', ['kind', 'resource_id', 'day', 'slot_ids'])
+
+# kind -> position of its id in a slot row (id, class_id, subject_id, teacher_id, room_id, day, period_id)
+RESOURCE_COLUMNS = {'teacher': 3, 'room': 4, 'class': 1}
+CONFLICT_TYPES = {'teacher': 'TEACHER_DOUBLE_BOOK', 'room': 'ROOM_DOUBLE_BOOK', 'class': 'CLASS_DOUBLE_BOOK'}
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+def period_intervals():
+    """(start, end) in minutes of every teaching period, keyed by period id"""
+    return {
+        period_id: (_minutes(start), _minutes(end))
+        for period_id, start, end in Period.objects.filter(is_break=False).values_list('id', 'start_time', 'end_time')
+    }
+
+def intervals_of(periods):
+    """Like period_intervals, from a period_id -> {'is_break', 'start_time', 'end_time'} mapping already loaded"""
+    return {
+        period_id: (_minutes(period['start_time']), _minutes(period['end_time']))
+        for period_id, period in periods.items()
+        if not period['is_break'] and period.get('start_time') and period.get('end_time')
+    }
+
+def overlapping_periods(period_id, intervals):
+    """Ids of the teaching periods whose time overlaps period_id's, itself included"""
+    if period_id not in intervals:
+        return set()
+    start, end = intervals[period_id]
+    return {other for other, (other_start, other_end) in intervals.items() if other_start < end and start < other_end}
+
+def overlap_pairs(items):
+    """Overlapping pairs among (start, end, key) items, by a sweep over start times
+
+    Ends of open intervals sit in a min-heap, so each item only meets the
+    intervals still running when it starts: O(n log n + pairs).
+    """
+    pairs = []
+    running = []
+    # Keys (slot ids) may be None for unsaved slots, so they are never compared
+    for order, (start, end, key) in enumerate(sorted(items, key=lambda item: item[:2])):
+        while running and running[0][0] <= start:
+            heapq.heappop(running)
+        pairs.extend((other, key) for _, _, other in running)
+        heapq.heappush(running, (end, order, key))
+    return pairs
+
+def overlap_groups(items):
+    """Groups of two or more (start, end, key) items chained together by overlaps"""
+    groups, current, current_end = [], [], None
+    for start, end, key in sorted(items, key=lambda item: item[:2]):
+        if current and start >= current_end:
+            if len(current) > 1:
+                groups.append(current)
+            current = []
+        if not current:
+            current_end = end
+        current.append(key)
+        current_end = max(current_end, end)
+    if len(current) > 1:
+        groups.append(current)
+    return groups
+
+def _timelines(rows, intervals, kinds):
+    """Slot intervals per (kind, resource, day)"""
+    timelines = defaultdict(list)
+    for row in rows:
+        interval = intervals.get(row[6])
+        if interval is None:
+            continue
+        for kind in kinds:
+            resource_id = row[RESOURCE_COLUMNS[kind]]
+            if resource_id:
+                timelines[(kind, resource_id, row[5])].append((interval[0], interval[1], row[0]))
+    return timelines
+
+def find_clashes(rows, intervals=None, kinds=('teacher', 'room', 'class')):
+    """Every pair of lessons sharing a teacher, room or class at overlapping times
+
+    rows are (id, class_id, subject_id, teacher_id, room_id, day, period_id)
+    tuples. Periods are compared by time rather than by id, so a lab block
+    overlapping two ordinary periods is caught too.
+    """
+    intervals = period_intervals() if intervals is None else intervals
+    return [
+        Clash(kind, resource_id, day, pair)
+        for (kind, resource_id, day), items in _timelines(rows, intervals, kinds).items()
+        for pair in overlap_pairs(items)
+    ]
+
+def find_clash_groups(rows, intervals=None, kinds=('teacher', 'room', 'class')):
+    """Like find_clashes, with all lessons of a chain of overlaps in one Clash"""
+    intervals = period_intervals() if intervals is None else intervals
+    return [
+        Clash(kind, resource_id, day, group)
+        for (kind, resource_id, day), items in _timelines(rows, intervals, kinds).items()
+        for group in overlap_groups(items)
+    ]
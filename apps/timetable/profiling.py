@@ -0,0 +1,151 @@
+# apps/timetable/profiling.py
+import cProfile
+import marshal
+import os
+import pstats
+import threading
+import time
+import zlib
+from functools import wraps
+
+from .conf import timetable_setting
+
+# Held while a profile runs anywhere in the process; Python 3.12 allows only one active profiler per process
+_running = threading.Lock()
+
+def profiling_enabled_for(name):
+    """Whether PROFILE_TARGETS asks for every call of an engine method or task to be profiled"""
+    targets = timetable_setting('PROFILE_TARGETS', ())
+    return bool(targets) and ('*' in targets or name in targets)
+
+def _location(function):
+    filename, line, name = function
+    if filename == '~':
+        return name  # built-ins are reported as ('~', 0, '<built-in method ...>')
+    return f'{os.path.basename(filename)}:{line}({name})'
+
+def hot_functions(stats, limit=None):
+    """The functions with the most own time, as JSON-ready dicts"""
+    limit = limit or timetable_setting('PROFILE_TOP_FUNCTIONS', 25)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {
+            'function': _location(function),
+            'calls': total_calls,
+            'primitive_calls': primitive_calls,
+            'own_ms': round(own_time * 1000, 3),
+            'cumulative_ms': round(cumulative_time * 1000, 3),
+        }
+        for function, (primitive_calls, total_calls, own_time, cumulative_time, _) in rows
+    ]
+
+def load_stats(data):
+    """pstats.Stats from a ProfileRecord's data"""
+    stats = pstats.Stats()
+    stats.stats = marshal.loads(zlib.decompress(bytes(data)))
+    stats.get_top_level_stats()
+    return stats
+
+def store_profile(profiler, kind, name, duration, **fields):
+    """Save a finished cProfile run as a ProfileRecord and keep the table bounded"""
+    from .models import ProfileRecord
+
+    profiler.create_stats()
+    stats = pstats.Stats(profiler)
+    record = ProfileRecord.objects.create(
+        kind=kind,
+        name=name[:200],
+        duration_ms=round(duration * 1000, 3),
+        function_calls=stats.total_calls,
+        summary=hot_functions(stats),
+        data=zlib.compress(marshal.dumps(stats.stats)),
+        **fields,
+    )
+
+    keep = timetable_setting('PROFILE_MAX_RECORDS', 500)
+    if keep:
+        cutoff = list(ProfileRecord.objects.order_by('-id').values_list('id', flat=True)[keep:keep + 1])
+        if cutoff:
+            ProfileRecord.objects.filter(id__lte=cutoff[0]).delete()
+    return record
+
+class Profile:
+    """cProfile run around a block, usable as a context manager
+
+    Only one profile runs in the process at a time: a profile started while
+    another is running does nothing. That covers nested profiles (an engine
+    call within a profiled request, already in the outer profile) as well as
+    concurrent requests, which are simply not profiled. Under ASGI every
+    request shares the event loop thread, so a request's profile also
+    records whatever other requests ran on the loop meanwhile. stop() must
+    run on the thread that called start(); save() may run anywhere. record
+    is the saved ProfileRecord, or None when nothing was stored.
+    """
+
+    def __init__(self, kind, name, min_ms=0, **fields):
+        self.kind = kind
+        self.name = name
+        self.min_ms = min_ms
+        self.fields = fields
+        self.duration = None
+        self.record = None
+        self._profiler = None
+
+    def start(self):
+        if not _running.acquire(blocking=False):
+            return self
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+: a profiler outside this module (cProfile run by hand, a debugger) is active
+            _running.release()
+            return self
+        self._profiler = profiler
+        self._started = time.perf_counter()
+        return self
+
+    def stop(self):
+        """Stop profiling; False if this profile never ran"""
+        if self._profiler is None:
+            return False
+        self._profiler.disable()
+        self.duration = time.perf_counter() - self._started
+        _running.release()
+        return True
+
+    def save(self, **fields):
+        """Store the stopped profile unless it was shorter than min_ms"""
+        if self.duration is not None and self.duration * 1000 >= self.min_ms:
+            self.record = store_profile(self._profiler, self.kind, self.name, self.duration, **self.fields, **fields)
+        return self.record
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.stop():
+            self.save()
+        return False
+
+def profiled(name=None, kind='engine'):
+    """Profile calls of a function when PROFILE_TARGETS lists it (or '*')
+
+    name defaults to the function's qualified name, e.g.
+    "TimetableGenerator.generate_for_class". When profiling is off the
+    wrapper only does a settings lookup.
+    """
+
+    def decorator(function):
+        label = name or function.__qualname__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiling_enabled_for(label):
+                return function(*args, **kwargs)
+            with Profile(kind, label, min_ms=timetable_setting('PROFILE_MIN_MS', 50)):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
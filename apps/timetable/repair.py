@@ -0,0 +1,306 @@
+# apps/timetable/repair.py
+import time
+
+from django.db import transaction
+
+from .aggregates import lesson_states, record_bulk_slot_changes
+from .changes import record_bulk_changes
+from .conf import timetable_setting
+from .models import TimeSlot, TimetableRevision, current_academic_year
+from .occupancy import OccupancySnapshot
+from .tenancy import tenant_db_alias
+
+class TimetableRepairer:
+    """Incrementally repair a timetable after teachers or rooms become unavailable
+
+    Only slots whose teacher or room is inactive (or explicitly listed) are
+    touched; the rest of the timetable stays fixed. Each broken slot is
+    repaired with the least disruptive local move that works:
+
+    1. reassign: keep the cell, pick another teacher and/or room
+    2. move: put the lesson in a free cell of the same class
+    3. swap: exchange cells with another lesson of the same class
+
+    Swaps exchange the lessons between the two rows instead of their cells,
+    so no write ever collides with the (class, day, period) unique constraint.
+
+    repair() returns the resulting diff; nothing is written unless apply=True.
+    """
+
+    def __init__(self, academic_year=None, snapshot=None, time_budget_ms=None):
+        self.academic_year = academic_year or current_academic_year()
+        self.snapshot = snapshot
+        if time_budget_ms is None:
+            time_budget_ms = timetable_setting('REPAIR_TIME_BUDGET_MS', 2000)
+        self.time_budget = time_budget_ms / 1000.0
+        # (class_id, day, period_id) cells a move may not use
+        self.blocked_cells = set()
+        # Teachers and rooms listed as unavailable; still active, so the snapshot offers them
+        self.unavailable_teachers, self.unavailable_rooms = set(), set()
+
+    def repair(self, teacher_ids=(), room_ids=(), apply=False):
+        started = time.perf_counter()
+        snapshot = self.snapshot or OccupancySnapshot.load(academic_year=self.academic_year)
+        # Inactive rows still hold their cell in the unique constraint
+        self.blocked_cells = set(
+            TimeSlot.objects.for_year(self.academic_year).filter(is_active=False)
+            .values_list('school_class_id', 'day_of_week', 'period_id')
+        )
+
+        teacher_ids, room_ids = set(teacher_ids), set(room_ids)
+        self.unavailable_teachers, self.unavailable_rooms = teacher_ids, room_ids
+        broken = self.invalidated_slots(snapshot, teacher_ids, room_ids)
+        deadline = time.perf_counter() + self.time_budget
+
+        changes, unresolved = {}, []
+        for slot_id in broken:
+            if time.perf_counter() > deadline:
+                unresolved.append({'slot_id': slot_id, 'reason': 'time budget exhausted'})
+                continue
+
+            # An earlier swap may already have given this row a valid lesson
+            original = snapshot.slots[slot_id]
+            needs_teacher, needs_room = self._needs(snapshot, original, teacher_ids, room_ids)
+            if not (needs_teacher or needs_room):
+                continue
+
+            # Free the unavailable resources before searching
+            release = {}
+            if needs_teacher:
+                release['teacher_id'] = None
+            if needs_room:
+                release['room_id'] = None
+            snapshot.update(slot_id, **release)
+
+            result = (
+                self._reassign(snapshot, original, needs_teacher, needs_room)
+                or self._move(snapshot, original, needs_teacher, needs_room)
+                or self._swap(snapshot, original, needs_teacher, needs_room)
+            )
+            if result is None:
+                snapshot.update(slot_id, teacher_id=original[snapshot.TEACHER], room_id=original[snapshot.ROOM])
+                unresolved.append({'slot_id': slot_id, 'reason': 'no free teacher, room or cell found'})
+                continue
+
+            strategy, updates = result
+            for row_id, fields in updates.items():
+                if row_id in changes:
+                    before = changes[row_id]['before']
+                elif row_id == slot_id:
+                    before = self._fields(original)
+                else:
+                    before = self._fields(snapshot.slots[row_id])
+                snapshot.update(row_id, **fields)
+                changes[row_id] = {
+                    'slot_id': row_id,
+                    'strategy': strategy,
+                    'before': before,
+                    'after': self._fields(snapshot.slots[row_id]),
+                }
+
+        diff = []
+        for change in changes.values():
+            fields = {
+                key: [change['before'][key], change['after'][key]]
+                for key in change['after'] if change['before'][key] != change['after'][key]
+            }
+            if fields:
+                diff.append({'slot_id': change['slot_id'], 'strategy': change['strategy'], 'changes': fields})
+
+        if apply and diff:
+            self.apply(diff)
+
+        return {
+            'academic_year': self.academic_year,
+            'invalidated': len(broken),
+            'changes': diff,
+            'unresolved': unresolved,
+            'applied': bool(apply and diff),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    @staticmethod
+    def _needs(snapshot, slot, teacher_ids=(), room_ids=()):
+        """Whether a slot needs a new teacher and/or a new room"""
+        teacher_id, room_id = slot[snapshot.TEACHER], slot[snapshot.ROOM]
+        needs_teacher = bool(teacher_id) and (teacher_id in teacher_ids or teacher_id not in snapshot.teachers)
+        needs_room = bool(room_id) and (room_id in room_ids or room_id not in snapshot.rooms)
+        return needs_teacher, needs_room
+
+    def invalidated_slots(self, snapshot, teacher_ids=(), room_ids=()):
+        """Ids of lessons whose teacher or room is inactive or listed as unavailable"""
+        return sorted(
+            slot[snapshot.ID] for slot in snapshot.slots.values()
+            if snapshot.is_teaching_period(slot[snapshot.PERIOD])
+            and any(self._needs(snapshot, slot, teacher_ids, room_ids))
+        )
+
+    @staticmethod
+    def _fields(slot):
+        return {
+            'teacher_id': slot[OccupancySnapshot.TEACHER],
+            'classroom_id': slot[OccupancySnapshot.ROOM],
+            'subject_id': slot[OccupancySnapshot.SUBJECT],
+            'day_of_week': slot[OccupancySnapshot.DAY],
+            'period_id': slot[OccupancySnapshot.PERIOD],
+        }
+
+    # Resource choice
+
+    def _teacher_for(self, snapshot, slot, day, period_id, ignore=(), exclude=()):
+        """Best free teacher for the slot's subject in a cell, or None"""
+        subject_department = snapshot.subjects.get(slot[snapshot.SUBJECT])
+        class_department = snapshot.classes.get(slot[snapshot.CLASS], {}).get('department_id')
+        best = None
+        for teacher_id, teacher in snapshot.teachers.items():
+            if teacher_id in exclude or teacher_id in self.unavailable_teachers:
+                continue
+            if teacher['department_id'] not in (subject_department, class_department):
+                continue
+            if not snapshot.teacher_free(teacher_id, day, period_id, ignore):
+                continue
+            daily = snapshot.teacher_daily_capacity(teacher_id, day)
+            weekly = snapshot.teacher_weekly_capacity(teacher_id)
+            if daily <= 0 or weekly <= 0:
+                continue
+            rank = (teacher['department_id'] == subject_department, weekly, daily, -teacher_id)
+            if best is None or rank > best[0]:
+                best = (rank, teacher_id)
+        return best[1] if best else None
+
+    def _room_for(self, snapshot, slot, day, period_id, ignore=()):
+        """Smallest free room of the subject's required type that fits the class
+
+        Lessons with no required type prefer lecture rooms, keeping labs and
+        other special rooms free, as RoomAssigner does.
+        """
+        class_id, subject_id = slot[snapshot.CLASS], slot[snapshot.SUBJECT]
+        class_size = snapshot.classes.get(class_id, {}).get('total_students', 0)
+        required = snapshot.room_types.get(subject_id)
+        best = None
+        for room_id in snapshot.free_rooms(day, period_id, ignore):
+            if room_id in self.unavailable_rooms or not snapshot.room_fits(room_id, class_id, subject_id):
+                continue
+            room = snapshot.rooms[room_id]
+            rank = (not required and room['room_type'] != 'LECTURE', room['capacity'] - class_size)
+            if best is None or rank < best[0]:
+                best = (rank, room_id)
+        return best[1] if best else None
+
+    def _resources(self, snapshot, original, day, period_id, needs_teacher, needs_room, ignore=()):
+        """Teacher and room for the lesson in a cell, or None if either is missing"""
+        current = snapshot.slots[original[snapshot.ID]]
+        teacher_id = current[snapshot.TEACHER]
+        room_id = current[snapshot.ROOM]
+
+        keep_teacher = teacher_id and snapshot.teacher_free(teacher_id, day, period_id, ignore) and (
+            day == original[snapshot.DAY] or snapshot.teacher_daily_capacity(teacher_id, day) > 0
+        )
+        if needs_teacher or (teacher_id and not keep_teacher):
+            teacher_id = self._teacher_for(snapshot, original, day, period_id, ignore,
+                                           exclude={original[snapshot.TEACHER]} if needs_teacher else ())
+            if teacher_id is None:
+                return None
+        if needs_room or (room_id and not snapshot.room_free(room_id, day, period_id, ignore)):
+            room_id = self._room_for(snapshot, original, day, period_id, ignore)
+            if room_id is None:
+                return None
+        return teacher_id, room_id
+
+    # Strategies
+
+    def _reassign(self, snapshot, original, needs_teacher, needs_room):
+        slot_id = original[snapshot.ID]
+        day, period_id = original[snapshot.DAY], original[snapshot.PERIOD]
+        resources = self._resources(snapshot, original, day, period_id, needs_teacher, needs_room, {slot_id})
+        if resources is None:
+            return None
+        teacher_id, room_id = resources
+        return 'reassign', {slot_id: {'teacher_id': teacher_id, 'room_id': room_id}}
+
+    def _move(self, snapshot, original, needs_teacher, needs_room):
+        """Move the lesson to a free cell of its class, same day first"""
+        slot_id, class_id = original[snapshot.ID], original[snapshot.CLASS]
+        current_day = original[snapshot.DAY]
+        ignore = {slot_id}
+
+        cells = sorted(snapshot.teaching_cells(), key=lambda cell: cell[0] != current_day)
+        for day, period_id in cells:
+            if (class_id, day, period_id) in self.blocked_cells:
+                continue
+            if not snapshot.class_free(class_id, day, period_id, ignore):
+                continue
+            resources = self._resources(snapshot, original, day, period_id, needs_teacher, needs_room, ignore)
+            if resources is None:
+                continue
+            teacher_id, room_id = resources
+            # Later moves in this run must not land in the cell being vacated
+            self.blocked_cells.add((class_id, original[snapshot.DAY], original[snapshot.PERIOD]))
+            return 'move', {slot_id: {'day': day, 'period_id': period_id, 'teacher_id': teacher_id, 'room_id': room_id}}
+        return None
+
+    def _swap(self, snapshot, original, needs_teacher, needs_room):
+        slot_id = original[snapshot.ID]
+        day, period_id = original[snapshot.DAY], original[snapshot.PERIOD]
+
+        for other in snapshot.class_slots(original[snapshot.CLASS]):
+            other_id = other[snapshot.ID]
+            other_day, other_period = other[snapshot.DAY], other[snapshot.PERIOD]
+            if other_id == slot_id or not snapshot.is_teaching_period(other_period):
+                continue
+            # A partner that is itself broken would just pass its problem back
+            if any(self._needs(snapshot, other)):
+                continue
+            ignore = {slot_id, other_id}
+
+            # The other lesson must fit into this cell with its own teacher and room
+            other_teacher = other[snapshot.TEACHER]
+            if other_teacher and not snapshot.teacher_free(other_teacher, day, period_id, ignore):
+                continue
+            if other_teacher and other_day != day and snapshot.teacher_daily_capacity(other_teacher, day) <= 0:
+                continue
+            if other[snapshot.ROOM] and not snapshot.room_free(other[snapshot.ROOM], day, period_id, ignore):
+                continue
+
+            resources = self._resources(snapshot, original, other_day, other_period, needs_teacher, needs_room, ignore)
+            if resources is None:
+                continue
+            teacher_id, room_id = resources
+
+            # Lessons are exchanged between the two rows, so each row keeps its cell
+            return 'swap', {
+                slot_id: {
+                    'subject_id': other[snapshot.SUBJECT],
+                    'teacher_id': other[snapshot.TEACHER],
+                    'room_id': other[snapshot.ROOM],
+                },
+                other_id: {
+                    'subject_id': original[snapshot.SUBJECT],
+                    'teacher_id': teacher_id,
+                    'room_id': room_id,
+                },
+            }
+        return None
+
+    # Persistence
+
+    @staticmethod
+    def apply(diff):
+        """Write a repair diff in one transaction with a single bulk update"""
+        slots = TimeSlot.objects.in_bulk([change['slot_id'] for change in diff])
+        before = lesson_states(slots.keys())
+        for change in diff:
+            slot = slots[change['slot_id']]
+            for field, (_, new) in change['changes'].items():
+                setattr(slot, field, new)
+
+        with transaction.atomic(using=tenant_db_alias()):
+            for academic_year in {slot.academic_year for slot in slots.values()}:
+                transaction.on_commit(lambda year=academic_year: TimetableRevision.bump(year), using=tenant_db_alias())
+            TimeSlot.objects.bulk_update(
+                list(slots.values()),
+                ['subject_id', 'teacher_id', 'classroom_id', 'day_of_week', 'period_id'],
+                batch_size=500,
+            )
+            record_bulk_changes(slots.keys())
+            record_bulk_slot_changes(before, slots.keys())
@@ -0,0 +1,205 @@
+# apps/timetable/rooming.py
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from .models import ClassRoom, Class, Period, Subject, TimeSlot, current_academic_year
+
+# Cost of a session left without a room; larger than any total of real costs
+UNASSIGNED = 1e7
+# Cost of a session kept in its current room although it does not fit there
+MISFIT = UNASSIGNED / 2
+# Extra cost of using a specialised room for a lesson that does not need one
+SPECIAL_ROOM_COST = 25
+# Reward for keeping the current room, so equally good matchings move nothing
+KEEP_ROOM_BONUS = 0.5
+
+def min_cost_assignment(cost):
+    """Rows -> columns of a minimum-cost matching (Hungarian method with potentials)
+
+    cost is an n x m array with n <= m; every row is matched to a distinct
+    column. O(n^2 m) with the inner column scans done by numpy.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    match = np.zeros(m + 1, dtype=np.int64)  # column -> row, 1-based; 0 is free
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for row in range(1, n + 1):
+        match[0] = row
+        column = 0
+        min_reduced = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current = match[column]
+            free = ~used
+            free[0] = False
+            reduced = cost[current - 1] - u[current] - v[1:]
+            better = free[1:] & (reduced < min_reduced[1:])
+            min_reduced[1:][better] = reduced[better]
+            way[1:][better] = column
+
+            candidates = np.where(free, min_reduced, np.inf)
+            next_column = int(np.argmin(candidates))
+            delta = candidates[next_column]
+            u[match[used]] += delta
+            v[used] -= delta
+            min_reduced[free] -= delta
+
+            column = next_column
+            if match[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+
+    assignment = np.full(n, -1, dtype=np.int64)
+    for column in range(1, m + 1):
+        if match[column]:
+            assignment[match[column] - 1] = column - 1
+    return assignment
+
+class RoomAssigner:
+    """Give every lesson of a (day, period) a room by minimum-cost bipartite matching
+
+    A room fits a lesson when it seats the class and has the subject's
+    required_room_type. Among fitting rooms the matching minimises empty
+    seats, keeps labs free for lessons that need them and prefers each
+    lesson's current room, so one call places all lessons of a cell at once
+    instead of first-come-first-served.
+    """
+
+    def __init__(self, academic_year=None):
+        self.academic_year = academic_year or current_academic_year()
+        self.rooms = {
+            room['id']: room for room in ClassRoom.objects.filter(is_active=True).values('id', 'capacity', 'room_type')
+        }
+
+    def cost(self, session, room_id):
+        """Cost of holding a session in a room, None if the room does not fit"""
+        room = self.rooms[room_id]
+        required = session['required_room_type']
+        if room['capacity'] < session['students'] or (required and room['room_type'] != required):
+            return None
+        cost = room['capacity'] - session['students']
+        if not required and room['room_type'] != 'LECTURE':
+            cost += SPECIAL_ROOM_COST
+        if room_id == session.get('room_id'):
+            cost -= KEEP_ROOM_BONUS
+        return cost
+
+    def match(self, sessions, room_ids):
+        """Room id (or None) for each session of one cell, from the given free rooms"""
+        if not sessions:
+            return []
+        room_ids = list(room_ids)
+        capacity = np.array([self.rooms[room_id]['capacity'] for room_id in room_ids], dtype=float)
+        room_type = np.array([self.rooms[room_id]['room_type'] for room_id in room_ids], dtype=object)
+        students = np.array([session['students'] for session in sessions], dtype=float)[:, None]
+        required = np.array([session['required_room_type'] for session in sessions], dtype=object)[:, None]
+        current = np.array([session.get('room_id') or 0 for session in sessions])[:, None] == np.array(room_ids)
+
+        # Same rules as cost(), for the whole cell at once
+        fits = (capacity >= students) & ((required == '') | (room_type == required))
+        rooms_cost = capacity - students
+        rooms_cost = rooms_cost + np.where((required == '') & (room_type != 'LECTURE'), SPECIAL_ROOM_COST, 0)
+        rooms_cost = rooms_cost - np.where(current, KEEP_ROOM_BONUS, 0)
+        rooms_cost = np.where(fits, rooms_cost, np.where(current, MISFIT, UNASSIGNED))
+
+        # One dummy column per session stands for "no room"
+        cost = np.hstack([rooms_cost, np.full((len(sessions), len(sessions)), UNASSIGNED)])
+        assignment = min_cost_assignment(cost)
+        return [room_ids[column] if column < len(room_ids) else None for column in assignment.tolist()]
+
+    def fits(self, session, room_id):
+        return room_id in self.rooms and self.cost(session, room_id) is not None
+
+    def wasted_seats(self, session, room_id):
+        return self.rooms[room_id]['capacity'] - session['students']
+
+    def assign_sessions(self, sessions, busy_rooms):
+        """Rooms for sessions spread over many cells
+
+        sessions are dicts with day, period_id, students, required_room_type
+        and optionally room_id; busy_rooms maps (day, period_id) to rooms
+        already taken there.
+        """
+        by_cell = defaultdict(list)
+        for index, session in enumerate(sessions):
+            by_cell[(session['day'], session['period_id'])].append(index)
+
+        rooms = [None] * len(sessions)
+        for cell, indexes in by_cell.items():
+            free = [room_id for room_id in self.rooms if room_id not in busy_rooms.get(cell, ())]
+            for index, room_id in zip(indexes, self.match([sessions[index] for index in indexes], free)):
+                rooms[index] = room_id
+        return rooms
+
+    def reassign(self, class_ids=None, apply=False):
+        """Re-room the year's lessons (only those of class_ids if given) and return a repair-style diff"""
+        started = time.perf_counter()
+        class_ids = set(class_ids) if class_ids else None
+        students = dict(Class.objects.for_year(self.academic_year).values_list('id', 'total_students'))
+        required = dict(Subject.objects.exclude(required_room_type='').values_list('id', 'required_room_type'))
+        teaching = set(Period.objects.filter(is_break=False).values_list('id', flat=True))
+
+        sessions, busy_rooms = [], defaultdict(set)
+        for slot_id, class_id, subject_id, room_id, day, period_id in TimeSlot.objects.for_year(self.academic_year).filter(
+            is_active=True
+        ).values_list('id', 'school_class_id', 'subject_id', 'classroom_id', 'day_of_week', 'period_id'):
+            if period_id not in teaching:
+                continue
+            if class_ids is not None and class_id not in class_ids:
+                if room_id:
+                    busy_rooms[(day, period_id)].add(room_id)
+                continue
+            sessions.append({
+                'slot_id': slot_id, 'class_id': class_id, 'day': day, 'period_id': period_id,
+                'students': students.get(class_id, 0), 'required_room_type': required.get(subject_id, ''),
+                'room_id': room_id,
+            })
+
+        rooms = self.assign_sessions(sessions, busy_rooms)
+        changes, unassigned = [], []
+        misfits_before = wasted_before = wasted_after = 0
+        for session, room_id in zip(sessions, rooms):
+            if self.fits(session, session['room_id']):
+                wasted_before += self.wasted_seats(session, session['room_id'])
+            else:
+                misfits_before += 1
+            if room_id is not None and self.fits(session, room_id):
+                wasted_after += self.wasted_seats(session, room_id)
+            else:
+                unassigned.append({
+                    'slot_id': session['slot_id'], 'class_id': session['class_id'],
+                    'day_of_week': session['day'], 'period_id': session['period_id'],
+                    'students': session['students'], 'required_room_type': session['required_room_type'] or None,
+                })
+            if room_id != session['room_id']:
+                changes.append({
+                    'slot_id': session['slot_id'],
+                    'strategy': 'rooming',
+                    'changes': {'classroom_id': [session['room_id'], room_id]},
+                })
+
+        if apply and changes:
+            from .repair import TimetableRepairer
+            from .versions import auto_backup
+            auto_backup('Before reassigning rooms', self.academic_year)
+            TimetableRepairer.apply(changes)
+
+        return {
+            'academic_year': self.academic_year,
+            'lessons': len(sessions),
+            'changes': changes,
+            'unassigned': unassigned,
+            'misfits_before': misfits_before,
+            'wasted_seats_before': wasted_before,
+            'wasted_seats_after': wasted_after,
+            'applied': bool(apply and changes),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
@@ -0,0 +1,130 @@
+# apps/timetable/routers.py
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from .conf import timetable_setting
+from .tenancy import school_database, tenant_db_alias
+
+ARCHIVE_DB = 'archive'
+ARCHIVE_MODELS = {'archivedtimeslot'}
+
+REPLICA_DB = 'replica'
+DEFAULT_REPLICA_MODELS = ['timeslot', 'period', 'class', 'subject', 'teacher', 'classroom', 'department']
+
+# Set once the current request/task has written, so it reads its own writes from the primary
+_pinned_to_primary = ContextVar('timetable_pinned_to_primary', default=False)
+
+def unpin_primary(**kwargs):
+    """request_started and task_prerun receiver: every request and task starts reading from the replica again"""
+    _pinned_to_primary.set(False)
+
+def archive_db_alias():
+    """Database alias holding archived timetables ('archive' if configured)"""
+    return ARCHIVE_DB if ARCHIVE_DB in settings.DATABASES else 'default'
+
+class SchoolDatabaseRouter:
+    """Send every query to the active school's own database when it has one
+
+    TIMETABLE_SETTINGS['SCHOOL_DATABASES'] maps school ids to database
+    aliases. Such a database holds the whole schema, users and sessions
+    included (see the init_school_database command), so no relation crosses
+    databases. Archived years still go to ArchiveRouter; schools without a
+    database of their own share 'default' and are kept apart by the tenant
+    managers.
+    """
+
+    def _database(self, model):
+        if model._meta.app_label == 'timetable' and model._meta.model_name in ARCHIVE_MODELS:
+            return None
+        return school_database()
+
+    def db_for_read(self, model, **hints):
+        return self._database(model)
+
+    def db_for_write(self, model, **hints):
+        return self._database(model)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+class ArchiveRouter:
+    """Route archived timetable tables to the optional 'archive' database
+
+    Without an 'archive' entry in DATABASES everything stays on 'default'.
+    """
+
+    @staticmethod
+    def _is_archive(model):
+        return model._meta.app_label == 'timetable' and model._meta.model_name in ARCHIVE_MODELS
+
+    def db_for_read(self, model, **hints):
+        if self._is_archive(model):
+            return archive_db_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if self._is_archive(model):
+            return archive_db_alias()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if ARCHIVE_DB not in settings.DATABASES:
+            return None
+        is_archive = app_label == 'timetable' and model_name in ARCHIVE_MODELS
+        if db == ARCHIVE_DB:
+            return is_archive
+        if is_archive:
+            return False
+        return None
+
+class ReadReplicaRouter:
+    """Send read-only timetable queries to the optional 'replica' database
+
+    The replica is a periodically refreshed copy of the primary SQLite file
+    (see the refresh_replica command). Reads go to the primary instead when
+    inside a transaction or after the current request has written anything.
+    Writes always go to the primary, also for objects read from the replica.
+    Code that must read fresh data without pinning the rest of the request
+    reads from tenant_db_alias() directly.
+    """
+
+    def _replica_models(self):
+        return set(timetable_setting('REPLICA_READ_MODELS', DEFAULT_REPLICA_MODELS))
+
+    def db_for_read(self, model, **hints):
+        if REPLICA_DB not in settings.DATABASES:
+            return None
+        if model._meta.app_label != 'timetable' or model._meta.model_name not in self._replica_models():
+            return None
+        if _pinned_to_primary.get() or any(
+            connection.in_atomic_block for connection in connections.all(initialized_only=True)
+        ):
+            return tenant_db_alias()
+        return REPLICA_DB
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'timetable':
+            return None
+        _pinned_to_primary.set(True)
+        # Without an answer Django would write back to instance._state.db, the replica for objects read from it
+        return tenant_db_alias()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Objects read from the replica are the same rows as on the primary
+        databases = {obj1._state.db, obj2._state.db}
+        if databases <= {'default', REPLICA_DB}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_DB:
+            return False
+        return None
@@ -0,0 +1,176 @@
+# apps/timetable/search.py
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Count, Q, prefetch_related_objects
+
+from .conf import timetable_setting
+from .models import Class, ClassRoom, SearchDocument, SearchTrigram, Subject, Teacher
+from .tenancy import current_school_id, tenant_db_alias
+
+def normalize(text):
+    """Lowercase ASCII words: accents dropped, punctuation turned into spaces"""
+    text = unicodedata.normalize('NFKD', str(text or '')).encode('ascii', 'ignore').decode()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text.lower()).split())
+
+def trigrams(text, partial=False):
+    """Trigrams of each word padded with two leading spaces and one trailing space
+
+    With partial the last word is treated as unfinished, so its trailing gram
+    is left out and "mat" matches "mathematics".
+    """
+    words = normalize(text).split()
+    grams = set()
+    for index, word in enumerate(words):
+        padded = f'  {word} '
+        if partial and index == len(words) - 1:
+            padded = padded[:-1]
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _teacher_document(teacher):
+    user = teacher.user
+    label = user.get_full_name() or user.username
+    text = ' '.join([user.first_name, user.last_name, user.username, teacher.employee_id, teacher.specialization])
+    return label, teacher.employee_id, text, teacher.is_active and user.is_active
+
+def _subject_document(subject):
+    return subject.name, subject.code, f'{subject.name} {subject.code}', subject.is_active
+
+def _room_document(room):
+    text = f'{room.name} {room.room_number} {room.building} {room.get_room_type_display()}'
+    return room.name, room.room_number, text, room.is_active
+
+def _class_document(school_class):
+    text = f'{school_class.name} {school_class.grade_level}{school_class.section} {school_class.section}'
+    return str(school_class), school_class.academic_year, text, school_class.is_active
+
+# kind: (model, queryset for rebuilds, function returning (label, detail, text, is_active))
+# Rebuilds index every school in the database, so they bypass the tenant managers
+SOURCES = {
+    'teacher': (Teacher, lambda: Teacher._base_manager.select_related('user', 'department'), _teacher_document),
+    'subject': (Subject, lambda: Subject._base_manager.select_related('department'), _subject_document),
+    'room': (ClassRoom, lambda: ClassRoom._base_manager.all(), _room_document),
+    'class': (Class, lambda: Class._base_manager.select_related('department'), _class_document),
+}
+MODEL_KINDS = {model: kind for kind, (model, _, _) in SOURCES.items()}
+
+def _school_id(kind, obj):
+    """School a document belongs to; None for rooms every school shares"""
+    return obj.school_id if kind == 'room' else obj.department.school_id
+
+def _document(kind, obj):
+    label, detail, text, is_active = SOURCES[kind][2](obj)
+    return SearchDocument(
+        kind=kind, object_id=obj.pk, school_id=_school_id(kind, obj), label=label[:200],
+        detail=(detail or '')[:200], text=normalize(f'{label} {text}')[:300], is_active=is_active,
+    )
+
+def index_object(obj):
+    """Add or refresh the search document of a teacher, subject, room or class"""
+    kind = MODEL_KINDS[type(obj)]
+    document = _document(kind, obj)
+    grams = trigrams(document.text)
+    with transaction.atomic(using=tenant_db_alias()):
+        stored, _ = SearchDocument.objects.update_or_create(
+            kind=kind, object_id=obj.pk,
+            defaults={'school_id': document.school_id, 'label': document.label, 'detail': document.detail,
+                      'text': document.text, 'trigram_count': len(grams), 'is_active': document.is_active},
+        )
+        stored.trigrams.all().delete()
+        SearchTrigram.objects.bulk_create([SearchTrigram(trigram=gram, document=stored) for gram in grams])
+
+def remove_object(obj):
+    SearchDocument.objects.filter(kind=MODEL_KINDS[type(obj)], object_id=obj.pk).delete()
+
+def _store_documents(documents):
+    """Insert new SearchDocuments and their trigrams with bulk inserts"""
+    grams = [trigrams(document.text) for document in documents]
+    for document, document_grams in zip(documents, grams):
+        document.trigram_count = len(document_grams)
+    SearchDocument.objects.bulk_create(documents, batch_size=1000)
+    SearchTrigram.objects.bulk_create(
+        (SearchTrigram(trigram=gram, document_id=document.pk)
+         for document, document_grams in zip(documents, grams) for gram in document_grams),
+        batch_size=5000,
+    )
+
+def index_objects(objects):
+    """index_object for many objects of one kind, e.g. after a bulk_create that sent no signals"""
+    objects = list(objects)
+    if not objects:
+        return
+    kind = MODEL_KINDS[type(objects[0])]
+    if kind != 'room':
+        prefetch_related_objects(objects, 'department')
+    with transaction.atomic(using=tenant_db_alias()):
+        SearchDocument.objects.filter(kind=kind, object_id__in=[obj.pk for obj in objects]).delete()
+        _store_documents([_document(kind, obj) for obj in objects])
+
+def rebuild_index(kinds=None):
+    """Rebuild the documents of some kinds (all by default) with bulk inserts; returns counts per kind"""
+    counts = {}
+    with transaction.atomic(using=tenant_db_alias()):
+        for kind in kinds or SOURCES:
+            SearchDocument.objects.filter(kind=kind).delete()
+            documents = [_document(kind, obj) for obj in SOURCES[kind][1]().iterator(chunk_size=2000)]
+            _store_documents(documents)
+            counts[kind] = len(documents)
+    return counts
+
+def search(query, kinds=None, limit=10, include_inactive=False, min_score=None):
+    """Ranked documents matching a (possibly misspelt or unfinished) query, from two queries
+
+    Documents are scored by the share of the query's trigrams they contain,
+    plus a bonus when the query appears literally at the start of a word
+    and a larger one when it is a whole word.
+    """
+    normalized = normalize(query)
+    grams = trigrams(normalized, partial=True)
+    if not grams:
+        return []
+    min_score = timetable_setting('SEARCH_MIN_SCORE', 0.45) if min_score is None else min_score
+
+    # The finished-word grams are looked up too so whole-word matches rank first among candidates
+    lookup = grams | trigrams(normalized)
+    matches = SearchTrigram.objects.filter(trigram__in=lookup)
+    if kinds:
+        matches = matches.filter(document__kind__in=kinds)
+    if not include_inactive:
+        matches = matches.filter(document__is_active=True)
+    school_id = current_school_id()
+    if school_id is not None:
+        # The index is shared by every school in the database; rank only what the active school can see
+        matches = matches.filter(Q(document__school_id=school_id) | Q(document__school__isnull=True))
+    # Among equal hits shorter documents are closer matches
+    hits = dict(
+        matches.values('document_id').annotate(hits=Count('id'))
+        .order_by('-hits', 'document__trigram_count').values_list('document_id', 'hits')[:limit * 5]
+    )
+
+    results = []
+    for document in SearchDocument.objects.filter(id__in=hits):
+        shared = hits[document.id]
+        coverage = min(shared / len(grams), 1)
+        similarity = shared / (len(lookup) + document.trigram_count - shared)
+        text = f' {document.text} '
+        score = coverage + 0.5 * similarity
+        if f' {normalized}' in text:
+            score += 0.75 if f' {normalized} ' in text else 0.5
+        if score < min_score:
+            continue
+        results.append({
+            'kind': document.kind,
+            'id': document.object_id,
+            'label': document.label,
+            'detail': document.detail,
+            'score': round(score, 3),
+        })
+
+    results.sort(key=lambda result: (-result['score'], result['label']))
+    return results[:limit]
+
+def search_ids(query, kind, limit=200):
+    """Object ids of one kind matching a query, for filtering querysets"""
+    return [result['id'] for result in search(query, kinds=[kind], limit=limit, include_inactive=True)]
@@ -1,24 +1,86 @@
 # apps/timetable/signals.py (FIXED)
-from django.db.models.signals import post_save, post_delete
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
-from django.db import models
-from .models import TimeSlot, ConflictLog
+from django.db import models, transaction
+from .aggregates import lesson_states, record_slot_change, slot_state
+from .changes import record_change
+from .models import (
+    TimeSlot, TimeSlotChange, ConflictLog, TimetableRevision, Teacher, Subject, ClassRoom, Class, Period,
+    TenantValidationMixin, current_academic_year,
+)
+from .overlap import overlapping_periods, period_intervals
+from .search import index_object, remove_object
+from .tenancy import tenant_db_alias
+
+def _bump_revision_on_commit(academic_year, school_id):
+    transaction.on_commit(lambda: TimetableRevision.bump(academic_year, school_id), using=tenant_db_alias())
+
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+def bump_timetable_revision(sender, instance, **kwargs):
+    """Mark the slot's academic year (for its school) as changed once the write commits"""
+    _bump_revision_on_commit(instance.academic_year, instance.school_id)
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=ClassRoom)
+@receiver(post_save, sender=Class)
+@receiver(post_save, sender=Period)
+def bump_revision_on_edit(sender, instance, created, raw=False, **kwargs):
+    """Feeds and grids cached per revision copy these names and times, so an edit must change the revision
+
+    New rows hold no lessons yet, and deleting one deletes (and bumps for) its slots.
+    """
+    if raw or created:
+        return
+    school_id = instance._tenant_school_id() if isinstance(instance, TenantValidationMixin) else instance.school_id
+    _bump_revision_on_commit(getattr(instance, 'academic_year', None) or current_academic_year(), school_id)
+
+@receiver(post_save, sender=TimeSlot)
+def log_timeslot_save(sender, instance, **kwargs):
+    """Append the slot's new state to the change feed"""
+    record_change(instance, TimeSlotChange.SAVE)
+
+@receiver(post_delete, sender=TimeSlot)
+def log_timeslot_delete(sender, instance, **kwargs):
+    """Append the slot's deletion to the change feed"""
+    record_change(instance, TimeSlotChange.DELETE)
+
+@receiver(pre_save, sender=TimeSlot)
+def remember_timeslot_state(sender, instance, raw=False, **kwargs):
+    """Keep the slot's stored state so post_save can move its aggregate counts"""
+    if not raw:
+        instance._aggregate_state = lesson_states([instance.pk]).get(instance.pk) if instance.pk else None
+
+@receiver(post_save, sender=TimeSlot)
+def update_aggregates_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_slot_change(getattr(instance, '_aggregate_state', None), slot_state(instance))
+
+@receiver(post_delete, sender=TimeSlot)
+def update_aggregates_on_delete(sender, instance, **kwargs):
+    record_slot_change(slot_state(instance), None)
 
 @receiver(post_save, sender=TimeSlot)
 def detect_conflicts_on_save(sender, instance, created, **kwargs):
     """Detect conflicts when a time slot is saved"""
-    if instance.period.is_break:
+    if instance.period.is_break or not instance.is_active:
         return
 
-    # Check for teacher conflicts
-    teacher_conflicts = TimeSlot.objects.filter(
-        teacher=instance.teacher,
+    # Only slots of the same academic year and day in overlapping periods can clash;
+    # every school's are checked, since schools may share rooms
+    same_cell = TimeSlot._base_manager.filter(
+        academic_year=instance.academic_year,
         day_of_week=instance.day_of_week,
-        period=instance.period,
+        period_id__in=overlapping_periods(instance.period_id, period_intervals()),
         is_active=True
     ).exclude(id=instance.id)
 
+    # Check for teacher conflicts
+    teacher_conflicts = same_cell.filter(teacher=instance.teacher) if instance.teacher_id else []
+
     for conflict_slot in teacher_conflicts:
         ConflictLog.objects.get_or_create(
             conflict_type='TEACHER_DOUBLE_BOOK',
@@ -30,12 +92,7 @@ def detect_conflicts_on_save(sender, instance, created, **kwargs):
         )
 
     # Check for room conflicts  
-    room_conflicts = TimeSlot.objects.filter(
-        classroom=instance.classroom,
-        day_of_week=instance.day_of_week,
-        period=instance.period,
-        is_active=True
-    ).exclude(id=instance.id)
+    room_conflicts = same_cell.filter(classroom=instance.classroom) if instance.classroom_id else []
 
     for conflict_slot in room_conflicts:
         ConflictLog.objects.get_or_create(
@@ -47,9 +104,47 @@ def detect_conflicts_on_save(sender, instance, created, **kwargs):
             }
         )
 
+    # Same-period class clashes are blocked by the unique constraint; overlapping periods are not
+    for conflict_slot in same_cell.filter(school_class_id=instance.school_class_id):
+        ConflictLog.objects.get_or_create(
+            conflict_type='CLASS_DOUBLE_BOOK',
+            time_slot1=instance,
+            time_slot2=conflict_slot,
+            defaults={
+                'description': f"Class {instance.school_class.name} has lessons in overlapping periods"
+            }
+        )
+
 @receiver(post_delete, sender=TimeSlot)
 def resolve_conflicts_on_delete(sender, instance, **kwargs):
     """Resolve conflicts when a time slot is deleted"""
     ConflictLog.objects.filter(
         models.Q(time_slot1=instance) | models.Q(time_slot2=instance)
     ).update(is_resolved=True, resolved_at=timezone.now())
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=ClassRoom)
+@receiver(post_save, sender=Class)
+def update_search_document(sender, instance, raw=False, **kwargs):
+    """Keep the search index in step with the searchable models"""
+    if not raw:
+        index_object(instance)
+
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=Subject)
+@receiver(post_delete, sender=ClassRoom)
+@receiver(post_delete, sender=Class)
+def remove_search_document(sender, instance, **kwargs):
+    remove_object(instance)
+
+@receiver(post_save, sender=User)
+def update_teacher_search_document(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Re-index a teacher after their name changes; logins only touch last_login"""
+    if raw or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    teacher = Teacher.objects.filter(user=instance).select_related('user').first()
+    if teacher is not None:
+        index_object(teacher)
+        # Lessons show the teacher's name too
+        _bump_revision_on_commit(current_academic_year(), teacher._tenant_school_id())
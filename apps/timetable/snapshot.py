@@ -0,0 +1,227 @@
+# apps/timetable/snapshot.py
+import glob
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .conf import timetable_setting
+from .models import TimeSlot, TimetableRevision, current_academic_year
+from .tenancy import current_school_id, tenant_db_alias
+
+MAGIC = b'TTSNAP\x00\x01'
+# magic, revision, metadata length
+HEADER = struct.Struct('<8sQI')
+ALIGN = 8
+
+DAY_CODES = [code for code, _ in TimeSlot.DAYS_OF_WEEK]
+
+# Per-slot columns; everything except slot_id and day is a code into the matching id table
+COLUMNS = [
+    ('slot_id', '<i8'),
+    ('class', '<i4'),
+    ('day', '<i1'),
+    ('period', '<i4'),
+    ('subject', '<i4'),
+    ('teacher', '<i4'),
+    ('room', '<i4'),
+]
+ENCODED = ['class', 'period', 'subject', 'teacher', 'room']
+
+# Open snapshots of this process, keyed by file path
+_open_snapshots = {}
+
+def snapshot_dir():
+    return str(timetable_setting('SNAPSHOT_DIR', os.path.join(settings.BASE_DIR, 'var', 'snapshots')))
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+def _encode(values, count):
+    """Dense int32 codes and the sorted id table for a column of ids (None becomes -1)"""
+    ids = np.fromiter((value or 0 for value in values), dtype=np.int64, count=count)
+    table, codes = np.unique(ids, return_inverse=True)
+    codes = codes.astype(np.int32)
+    if table.size and table[0] == 0:
+        table = table[1:]
+        codes -= 1
+    return codes, table
+
+class TimetableSnapshot:
+    """Integer-coded copy of one academic year's active timetable
+
+    The file is a fixed header (magic, revision, metadata length), JSON
+    metadata with array offsets, then 8-byte aligned little-endian arrays:
+    one per column in COLUMNS plus an id table per encoded column. Files
+    are opened with a read-only mmap and the arrays are numpy views over
+    it, so every process using the same revision shares one copy in the
+    page cache. While a school is active (apps/timetable/tenancy.py) the
+    snapshot holds that school's lessons only, in files of its own.
+    """
+
+    def __init__(self, academic_year, revision, arrays, key='', mapped=None):
+        self.academic_year = academic_year
+        self.revision = revision
+        self.key = key
+        self.arrays = arrays
+        self._mapped = mapped
+
+    def __len__(self):
+        return len(self.arrays['slot_id'])
+
+    @classmethod
+    def build(cls, academic_year=None, revision=None):
+        """Snapshot the active slots of a year straight from the database
+
+        revision is the year's (revision, key) when the caller has just read it.
+        """
+        academic_year = academic_year or current_academic_year()
+        # Read the revision first: a write racing the query only makes the
+        # snapshot look older than it is, never newer
+        revision, key = revision or TimetableRevision.current(academic_year)
+        # Read from the primary: a lagging replica would produce old data under a new revision
+        slots = TimeSlot.objects.using(tenant_db_alias())
+        rows = list(
+            slots.for_year(academic_year).filter(is_active=True).values_list(
+                'id', 'school_class_id', 'day_of_week', 'period_id', 'subject_id', 'teacher_id', 'classroom_id'
+            )
+        )
+        count = len(rows)
+        columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+        day_index = {code: index for index, code in enumerate(DAY_CODES)}
+
+        arrays = {
+            'slot_id': np.fromiter(columns[0], dtype=np.int64, count=count),
+            'day': np.fromiter((day_index[day] for day in columns[2]), dtype=np.int8, count=count),
+        }
+        for name, values in zip(ENCODED, (columns[1], columns[3], columns[4], columns[5], columns[6])):
+            arrays[name], arrays[f'{name}_ids'] = _encode(values, count)
+        return cls(academic_year, revision, arrays, key=key)
+
+    def write(self, path):
+        """Write the snapshot atomically: a temp file in the same directory, then os.replace"""
+        metadata = {'academic_year': self.academic_year, 'key': self.key,
+                    'created_at': timezone.now().isoformat(), 'arrays': {}}
+        offset = 0
+        for name, array in self.arrays.items():
+            metadata['arrays'][name] = [array.dtype.str, offset, len(array)]
+            offset = _aligned(offset + array.nbytes)
+        encoded = json.dumps(metadata).encode()
+        data_start = _aligned(HEADER.size + len(encoded))
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as output:
+                output.write(HEADER.pack(MAGIC, self.revision, len(encoded)))
+                output.write(encoded)
+                for name, array in self.arrays.items():
+                    output.seek(data_start + metadata['arrays'][name][1])
+                    output.write(np.ascontiguousarray(array).tobytes())
+                output.flush()
+                os.fsync(output.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @classmethod
+    def open(cls, path):
+        """Map a snapshot file read-only; arrays are views into the mapping"""
+        with open(path, 'rb') as source:
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, revision, metadata_length = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            mapped.close()
+            raise ValueError(f'{path} is not a timetable snapshot')
+        metadata = json.loads(mapped[HEADER.size:HEADER.size + metadata_length])
+        data_start = _aligned(HEADER.size + metadata_length)
+        arrays = {
+            name: (np.frombuffer(mapped, dtype=np.dtype(dtype), count=length, offset=data_start + offset)
+                   if length else np.empty(0, dtype=np.dtype(dtype)))
+            for name, (dtype, offset, length) in metadata['arrays'].items()
+        }
+        return cls(metadata['academic_year'], revision, arrays, key=metadata['key'], mapped=mapped)
+
+    @staticmethod
+    def path_prefix(academic_year):
+        """Start of the file names of a year's snapshots, one set per active school"""
+        school_id = current_school_id()
+        name = f'timetable-{academic_year}-' if school_id is None else f'timetable-school{school_id}-{academic_year}-'
+        return os.path.join(snapshot_dir(), name)
+
+    @classmethod
+    def path_for(cls, academic_year, revision, key):
+        return f'{cls.path_prefix(academic_year)}{key}-r{revision}.bin'
+
+    @classmethod
+    def load(cls, academic_year=None):
+        """Snapshot of the year's current revision, built and written only when missing"""
+        academic_year = academic_year or current_academic_year()
+        revision, key = TimetableRevision.current(academic_year)
+        path = cls.path_for(academic_year, revision, key)
+
+        snapshot = _open_snapshots.get(path)
+        if snapshot is not None:
+            return snapshot
+
+        try:
+            snapshot = cls.open(path)
+        except FileNotFoundError:
+            built = cls.build(academic_year, revision=(revision, key))
+            path = cls.path_for(academic_year, built.revision, key)
+            built.write(path)
+            snapshot = cls.open(path)
+            cls._remove_stale(academic_year, keep=path)
+
+        # Keep one mapping per year (and school) in this process
+        prefix = cls.path_prefix(academic_year)
+        for open_path in [p for p in _open_snapshots if p.startswith(prefix)]:
+            del _open_snapshots[open_path]
+        _open_snapshots[path] = snapshot
+        return snapshot
+
+    @classmethod
+    def _remove_stale(cls, academic_year, keep):
+        # Other processes keep reading a mapped file after it is unlinked
+        for path in glob.glob(f'{glob.escape(cls.path_prefix(academic_year))}*.bin'):
+            if path != keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    # Decoding
+
+    def ids(self, name):
+        """Database ids of an encoded column, with 0 where the slot has none"""
+        codes = self.arrays[name]
+        table = self.arrays[f'{name}_ids']
+        if not len(table):
+            return np.zeros(len(codes), dtype=np.int64)
+        return np.where(codes >= 0, table[np.clip(codes, 0, None)], 0)
+
+    def rows(self, days=None):
+        """Slot tuples in OccupancySnapshot order: (id, class, subject, teacher, room, day, period)"""
+        mask = None
+        if days:
+            mask = np.isin(self.arrays['day'], [DAY_CODES.index(day) for day in days])
+
+        def column(values):
+            return (values[mask] if mask is not None else values).tolist()
+
+        day_codes = [DAY_CODES[index] for index in column(self.arrays['day'])]
+        return [
+            (slot_id, class_id, subject_id or None, teacher_id or None, room_id or None, day, period_id)
+            for slot_id, class_id, subject_id, teacher_id, room_id, day, period_id in zip(
+                column(self.arrays['slot_id']), column(self.ids('class')), column(self.ids('subject')),
+                column(self.ids('teacher')), column(self.ids('room')), day_codes, column(self.ids('period')),
+            )
+        ]
@@ -0,0 +1,119 @@
+# apps/timetable/substitutes.py
+import datetime
+import time
+
+from .models import TimeSlot, Teacher
+from .occupancy import OccupancySnapshot
+
+DAY_CODES = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT', 'SUN']
+
+def day_code(value):
+    """Normalise a date, ISO date string or day code ('mon', 'MON') to a TimeSlot day code"""
+    if isinstance(value, datetime.date):
+        return DAY_CODES[value.weekday()]
+
+    value = str(value).strip()
+    if value.upper()[:3] in DAY_CODES and not value[:1].isdigit():
+        return value.upper()[:3]
+    return DAY_CODES[datetime.date.fromisoformat(value).weekday()]
+
+class SubstituteFinder:
+    """Find cover teachers for every lesson an absent teacher has on one day
+
+    Candidates are ranked from a single occupancy snapshot of that day:
+    teachers from the subject's department first, then the absent teacher's
+    department, then whoever has the most remaining capacity under their
+    daily limit. Each proposed cover reduces that teacher's capacity, so
+    one person is not suggested first for every period.
+    """
+
+    def __init__(self, snapshot=None):
+        self.snapshot = snapshot
+
+    def find(self, teacher, day, limit=5, academic_year=None):
+        started = time.perf_counter()
+        day = day_code(day)
+        teacher_id = teacher.id if isinstance(teacher, Teacher) else int(teacher)
+        snapshot = self.snapshot or OccupancySnapshot.load(academic_year=academic_year, days=[day])
+
+        absent_department = snapshot.teachers.get(teacher_id, {}).get('department_id')
+        if absent_department is None:
+            absent_department = Teacher.objects.filter(id=teacher_id).values_list('department_id', flat=True).first()
+
+        # Tentative cover assignments made while ranking earlier periods
+        extra_load = {}
+        results = []
+
+        for slot in snapshot.teacher_day_slots(teacher_id, day):
+            period_id = slot[snapshot.PERIOD]
+            if not snapshot.is_teaching_period(period_id):
+                continue
+            subject_department = snapshot.subjects.get(slot[snapshot.SUBJECT])
+
+            candidates = []
+            for candidate_id, candidate in snapshot.teachers.items():
+                if candidate_id == teacher_id:
+                    continue
+                if not snapshot.teacher_free(candidate_id, day, period_id):
+                    continue
+                remaining = snapshot.teacher_daily_capacity(candidate_id, day) - extra_load.get(candidate_id, 0)
+                if remaining <= 0:
+                    continue
+
+                subject_match = subject_department is not None and candidate['department_id'] == subject_department
+                department_match = candidate['department_id'] == absent_department
+                candidates.append({
+                    'teacher_id': candidate_id,
+                    'subject_department_match': subject_match,
+                    'department_match': department_match,
+                    'remaining_capacity': remaining,
+                })
+
+            candidates.sort(key=lambda c: (
+                not c['subject_department_match'], not c['department_match'], -c['remaining_capacity'], c['teacher_id']
+            ))
+            candidates = candidates[:limit]
+            if candidates:
+                best = candidates[0]['teacher_id']
+                extra_load[best] = extra_load.get(best, 0) + 1
+
+            results.append({
+                'slot_id': slot[snapshot.ID],
+                'period_id': period_id,
+                'class_id': slot[snapshot.CLASS],
+                'subject_id': slot[snapshot.SUBJECT],
+                'candidates': candidates,
+            })
+
+        self._attach_labels(results)
+        return {
+            'teacher_id': teacher_id,
+            'day_of_week': day,
+            'slots': results,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    @staticmethod
+    def _attach_labels(results):
+        """Add display names with one query for slots and one for candidate teachers"""
+        slot_ids = [result['slot_id'] for result in results]
+        teacher_ids = {c['teacher_id'] for result in results for c in result['candidates']}
+
+        slots = TimeSlot.objects.filter(id__in=slot_ids).select_related('school_class', 'subject', 'period')
+        slot_labels = {
+            slot.id: {
+                'class_name': str(slot.school_class),
+                'subject_name': slot.subject.name if slot.subject else None,
+                'period_name': slot.period.name,
+            }
+            for slot in slots
+        }
+        teacher_labels = {
+            teacher.id: teacher.user.get_full_name() or teacher.user.username
+            for teacher in Teacher.objects.filter(id__in=teacher_ids).select_related('user')
+        }
+
+        for result in results:
+            result.update(slot_labels.get(result['slot_id'], {}))
+            for candidate in result['candidates']:
+                candidate['name'] = teacher_labels.get(candidate['teacher_id'])
@@ -0,0 +1,208 @@
+# apps/timetable/suggestions.py
+import time
+
+from .conf import timetable_setting
+from .occupancy import OccupancySnapshot
+
+class ConflictResolver:
+    """Suggest ways to resolve a conflicting time slot
+
+    Every candidate is checked against an in-memory OccupancySnapshot, so the
+    whole week can be searched without a query per candidate. The search stops
+    once the time budget is used up and returns the best suggestions found.
+    """
+
+    # Penalties used to rank suggestions (lower score is better)
+    DIFFERENT_DAY = 2.0
+    ROOM_CHANGE = 1.5
+    SWAP = 3.0
+    SUBJECT_SAME_DAY = 2.0
+    TEACHER_OVER_DAILY_CAP = 5.0
+    WASTED_SEAT = 0.01
+
+    def __init__(self, snapshot=None, time_budget_ms=None):
+        self.snapshot = snapshot
+        if time_budget_ms is None:
+            time_budget_ms = timetable_setting('SUGGESTION_TIME_BUDGET_MS', 50)
+        self.time_budget = time_budget_ms / 1000.0
+
+    def suggest(self, time_slot, limit=10):
+        """Return ranked alternatives for a TimeSlot instance"""
+        started = time.perf_counter()
+        snapshot = self.snapshot or OccupancySnapshot.load(academic_year=time_slot.academic_year)
+        if time_slot.id not in snapshot.slots:
+            snapshot.add((
+                time_slot.id, time_slot.school_class_id, time_slot.subject_id, time_slot.teacher_id,
+                time_slot.classroom_id, time_slot.day_of_week, time_slot.period_id,
+            ))
+
+        # The budget bounds the search; loading the snapshot is a fixed cost on top
+        deadline = time.perf_counter() + self.time_budget
+        complete = True
+        suggestions = []
+        slot = snapshot.slots[time_slot.id]
+
+        for candidate in self._move_candidates(snapshot, slot):
+            suggestions.append(candidate)
+            if time.perf_counter() > deadline:
+                complete = False
+                break
+
+        if complete:
+            for candidate in self._swap_candidates(snapshot, slot):
+                suggestions.append(candidate)
+                if time.perf_counter() > deadline:
+                    complete = False
+                    break
+
+        suggestions.sort(key=lambda suggestion: suggestion['score'])
+        return {
+            'slot_id': time_slot.id,
+            'conflicts_with': sorted(self.conflicting_slots(snapshot, slot)),
+            'suggestions': suggestions[:limit],
+            'candidates_considered': len(suggestions),
+            'complete': complete,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    @staticmethod
+    def conflicting_slots(snapshot, slot):
+        """Ids of other slots sharing the slot's class, teacher or room in its cell"""
+        day, period_id = slot[snapshot.DAY], slot[snapshot.PERIOD]
+        clashes = snapshot.occupants('class', slot[snapshot.CLASS], day, period_id)
+        if slot[snapshot.TEACHER]:
+            clashes |= snapshot.occupants('teacher', slot[snapshot.TEACHER], day, period_id)
+        if slot[snapshot.ROOM]:
+            clashes |= snapshot.occupants('room', slot[snapshot.ROOM], day, period_id)
+        clashes.discard(slot[snapshot.ID])
+        return clashes
+
+    def _pick_room(self, snapshot, slot, day, period_id, ignore):
+        """Choose a free room for the slot's class and subject, preferring its current room
+
+        Returns (room_id, wasted_seats) or (None, None) if nothing fits.
+        """
+        class_id, subject_id = slot[snapshot.CLASS], slot[snapshot.SUBJECT]
+        class_size = snapshot.classes.get(class_id, {}).get('total_students', 0)
+        current_room = slot[snapshot.ROOM]
+
+        if current_room is None:
+            return None, 0
+        if snapshot.room_fits(current_room, class_id, subject_id) and snapshot.room_free(current_room, day, period_id, ignore):
+            return current_room, max(snapshot.rooms[current_room]['capacity'] - class_size, 0)
+
+        best = None
+        for room_id in snapshot.free_rooms(day, period_id, ignore):
+            if not snapshot.room_fits(room_id, class_id, subject_id):
+                continue
+            wasted = snapshot.rooms[room_id]['capacity'] - class_size
+            if best is None or wasted < best[1]:
+                best = (room_id, wasted)
+        return best or (None, None)
+
+    def _subject_on_day(self, snapshot, slot, day, ignore):
+        """Whether the class already has this subject on the given day"""
+        for other in snapshot.class_slots(slot[snapshot.CLASS]):
+            if other[snapshot.ID] in ignore:
+                continue
+            if other[snapshot.DAY] == day and other[snapshot.SUBJECT] == slot[snapshot.SUBJECT]:
+                return True
+        return False
+
+    def _load_penalty(self, snapshot, teacher_id, day, current_day):
+        """Penalty when the move pushes a teacher over their daily cap"""
+        if teacher_id is None or day == current_day:
+            return 0
+        if snapshot.teacher_daily_capacity(teacher_id, day) <= 0:
+            return self.TEACHER_OVER_DAILY_CAP
+        return 0
+
+    def _move_candidates(self, snapshot, slot):
+        """Free cells where the class, teacher and a suitable room are all available"""
+        slot_id = slot[snapshot.ID]
+        class_id, teacher_id = slot[snapshot.CLASS], slot[snapshot.TEACHER]
+        current_day, current_period = slot[snapshot.DAY], slot[snapshot.PERIOD]
+        ignore = {slot_id}
+
+        for day, period_id in snapshot.teaching_cells():
+            if (day, period_id) == (current_day, current_period):
+                continue
+            if not snapshot.class_free(class_id, day, period_id, ignore):
+                continue
+            if teacher_id and not snapshot.teacher_free(teacher_id, day, period_id, ignore):
+                continue
+
+            room_id, wasted = self._pick_room(snapshot, slot, day, period_id, ignore)
+            if slot[snapshot.ROOM] and room_id is None:
+                continue
+
+            score = 0.0
+            reasons = []
+            if day != current_day:
+                score += self.DIFFERENT_DAY
+                reasons.append('different day')
+            if room_id != slot[snapshot.ROOM]:
+                score += self.ROOM_CHANGE
+                reasons.append('room change')
+            if self._subject_on_day(snapshot, slot, day, ignore):
+                score += self.SUBJECT_SAME_DAY
+                reasons.append('subject already taught that day')
+            load_penalty = self._load_penalty(snapshot, teacher_id, day, current_day)
+            if load_penalty:
+                score += load_penalty
+                reasons.append('teacher over daily limit')
+            score += (wasted or 0) * self.WASTED_SEAT
+
+            yield {
+                'type': 'move',
+                'day_of_week': day,
+                'period_id': period_id,
+                'classroom_id': room_id,
+                'swap_with': None,
+                'score': round(score, 3),
+                'reasons': reasons,
+            }
+
+    def _swap_candidates(self, snapshot, slot):
+        """Swaps with another lesson of the same class that leave both slots clash-free"""
+        slot_id = slot[snapshot.ID]
+        day, period_id = slot[snapshot.DAY], slot[snapshot.PERIOD]
+
+        for other in snapshot.class_slots(slot[snapshot.CLASS]):
+            other_id = other[snapshot.ID]
+            other_day, other_period = other[snapshot.DAY], other[snapshot.PERIOD]
+            if other_id == slot_id or (other_day, other_period) == (day, period_id):
+                continue
+            if not snapshot.is_teaching_period(other_period):
+                continue
+
+            ignore = {slot_id, other_id}
+            # This slot takes the other's cell, the other takes this one
+            if not snapshot.class_free(slot[snapshot.CLASS], other_day, other_period, ignore):
+                continue
+            if not snapshot.class_free(slot[snapshot.CLASS], day, period_id, ignore):
+                continue
+            if slot[snapshot.TEACHER] and not snapshot.teacher_free(slot[snapshot.TEACHER], other_day, other_period, ignore):
+                continue
+            if slot[snapshot.ROOM] and not snapshot.room_free(slot[snapshot.ROOM], other_day, other_period, ignore):
+                continue
+            if other[snapshot.TEACHER] and not snapshot.teacher_free(other[snapshot.TEACHER], day, period_id, ignore):
+                continue
+            if other[snapshot.ROOM] and not snapshot.room_free(other[snapshot.ROOM], day, period_id, ignore):
+                continue
+
+            score = self.SWAP
+            reasons = ['swap with another lesson']
+            if other_day != day:
+                score += self.DIFFERENT_DAY
+                reasons.append('different day')
+
+            yield {
+                'type': 'swap',
+                'day_of_week': other_day,
+                'period_id': other_period,
+                'classroom_id': slot[snapshot.ROOM],
+                'swap_with': other_id,
+                'score': round(score, 3),
+                'reasons': reasons,
+            }
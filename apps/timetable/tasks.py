@@ -0,0 +1,54 @@
+# apps/timetable/tasks.py
+import json
+import logging
+
+from celery import shared_task
+
+from .aggregates import rebuild_aggregates
+from .audit import ConflictAuditor
+from .changes import prune_changes
+from .models import current_academic_year
+from .profiling import profiled
+from .tenancy import database_partitions, school_context
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+@profiled('tasks.audit_conflicts', kind='task')
+def audit_conflicts(academic_year=None):
+    """Nightly ConflictLog reconciliation of every database, see the audit_conflicts command"""
+    summaries = []
+    for school in database_partitions():
+        with school_context(school):
+            summary = ConflictAuditor(academic_year=academic_year).run()
+        logger.info(json.dumps({'event': 'conflict_audit', **summary}))
+        summaries.append(summary)
+    return summaries
+
+@shared_task
+@profiled('tasks.prune_change_log', kind='task')
+def prune_change_log(academic_year=None):
+    """Keep the timetable change log of every database bounded, see the prune_changes command"""
+    results = []
+    for school in database_partitions():
+        with school_context(school):
+            result = prune_changes(academic_year=academic_year)
+        logger.info(json.dumps({'event': 'change_log_pruned', 'school': school, **result}))
+        results.append(result)
+    return results
+
+@shared_task
+@profiled('tasks.rebuild_analytics', kind='task')
+def rebuild_analytics(academic_year=None):
+    """Recount the dashboard aggregates of every database, see the rebuild_analytics command
+
+    Per-school counts in the shared database are recounted when next read.
+    """
+    results = []
+    for school in database_partitions():
+        with school_context(school):
+            year = academic_year or current_academic_year()
+            counts = rebuild_aggregates(academic_year=year)
+        logger.info(json.dumps({'event': 'analytics_rebuilt', 'academic_year': year, 'school': school, 'rows': counts}))
+        results.append(counts)
+    return results
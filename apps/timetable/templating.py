@@ -0,0 +1,164 @@
+# apps/timetable/templating.py
+import time
+from itertools import count
+
+from django.db import transaction
+
+from .aggregates import record_bulk_slot_changes
+from .changes import record_bulk_changes
+from .models import TimeSlot, TemplateCell, TimetableRevision, current_academic_year
+from .occupancy import OccupancySnapshot
+from .validation import TimetableValidator, TEACHER_DOUBLE_BOOK, ROOM_DOUBLE_BOOK
+from .versions import auto_backup
+from .tenancy import tenant_db_alias
+
+class TemplateApplier:
+    """Stamp a TimetableTemplate's cells onto every class it matches
+
+    Teachers and rooms are picked from one OccupancySnapshot that is updated
+    as lessons are placed, so no query is made per cell. A class keeps the
+    same teacher for a subject and the same room where they are free. All
+    new slots are written with one bulk_create and checked for clashes once.
+    """
+
+    def __init__(self, template, academic_year=None, overwrite=False):
+        self.template = template
+        self.academic_year = academic_year or current_academic_year()
+        self.overwrite = overwrite
+
+    def apply(self, classes=None, dry_run=False, user=None):
+        started = time.perf_counter()
+        classes = list(classes if classes is not None else self.template.matching_classes(self.academic_year))
+        cells = list(
+            TemplateCell.objects.filter(template=self.template)
+            .order_by('day_of_week', 'period__order')
+            .values_list('day_of_week', 'period_id', 'subject_id')
+        )
+        class_ids = {school_class.id for school_class in classes}
+
+        snapshot = OccupancySnapshot.load(academic_year=self.academic_year)
+        existing = TimeSlot.objects.for_year(self.academic_year).filter(school_class_id__in=class_ids)
+        taken_cells = set(existing.values_list('school_class_id', 'day_of_week', 'period_id'))
+        if self.overwrite:
+            # The classes' current slots are replaced, so they no longer hold anything
+            for slot_id in [slot[snapshot.ID] for slot in snapshot.slots.values() if slot[snapshot.CLASS] in class_ids]:
+                snapshot.remove(slot_id)
+            taken_cells = set()
+
+        placeholder_ids = count(-1, -1)
+        subject_teacher = {}
+        home_room = {}
+        new_slots, unassigned, skipped = [], [], 0
+
+        for school_class in classes:
+            for day, period_id, subject_id in cells:
+                if (school_class.id, day, period_id) in taken_cells:
+                    skipped += 1
+                    continue
+
+                teacher_id = room_id = None
+                if snapshot.is_teaching_period(period_id) and not subject_id:
+                    # A free period: nothing to store
+                    continue
+                if subject_id and snapshot.is_teaching_period(period_id):
+                    teacher_id = self._pick_teacher(snapshot, school_class, subject_id, day, period_id, subject_teacher)
+                    room_id = self._pick_room(snapshot, school_class, subject_id, day, period_id, home_room)
+                    if teacher_id is None or room_id is None:
+                        unassigned.append({
+                            'class_id': school_class.id, 'day_of_week': day, 'period_id': period_id,
+                            'missing': [name for name, value in (('teacher', teacher_id), ('room', room_id)) if value is None],
+                        })
+                elif subject_id:
+                    # Subjects on break periods are ignored, the break row is still created
+                    subject_id = None
+
+                snapshot.add((next(placeholder_ids), school_class.id, subject_id, teacher_id, room_id, day, period_id))
+                new_slots.append(TimeSlot(
+                    school_class_id=school_class.id, subject_id=subject_id, teacher_id=teacher_id,
+                    classroom_id=room_id, period_id=period_id, day_of_week=day, academic_year=self.academic_year,
+                ))
+
+        result = {
+            'template': self.template.name,
+            'academic_year': self.academic_year,
+            'classes': len(classes),
+            'slots': len(new_slots),
+            'skipped_cells': skipped,
+            'unassigned': unassigned,
+            'conflicts': [],
+            'applied': False,
+        }
+        if dry_run or not new_slots:
+            result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            return result
+
+        auto_backup(f'Before applying template "{self.template.name}"', self.academic_year, user=user)
+        with transaction.atomic(using=tenant_db_alias()):
+            if self.overwrite:
+                existing.delete()
+            created = TimeSlot.objects.bulk_create(new_slots, batch_size=500)
+            record_bulk_changes(slot.pk for slot in created)
+            record_bulk_slot_changes({}, [slot.pk for slot in created])
+            transaction.on_commit(lambda: TimetableRevision.bump(self.academic_year), using=tenant_db_alias())
+
+        # One clash check over the whole year, reporting the ones involving new slots
+        created_ids = {slot.pk for slot in created}
+        result['conflicts'] = [
+            violation._asdict() for violation in TimetableValidator(self.academic_year).validate()
+            if violation.code in (TEACHER_DOUBLE_BOOK, ROOM_DOUBLE_BOOK) and created_ids.intersection(violation.slot_ids)
+        ]
+        result['applied'] = True
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    @staticmethod
+    def _pick_teacher(snapshot, school_class, subject_id, day, period_id, subject_teacher):
+        """The class's teacher for this subject if free, else the best free teacher of the subject's department"""
+        key = (school_class.id, subject_id)
+        current = subject_teacher.get(key)
+        if (current and snapshot.teacher_free(current, day, period_id)
+                and snapshot.teacher_daily_capacity(current, day) > 0 and snapshot.teacher_weekly_capacity(current) > 0):
+            return current
+
+        subject_department = snapshot.subjects.get(subject_id)
+        best = None
+        for teacher_id, teacher in snapshot.teachers.items():
+            if teacher['department_id'] not in (subject_department, school_class.department_id):
+                continue
+            if not snapshot.teacher_free(teacher_id, day, period_id):
+                continue
+            daily = snapshot.teacher_daily_capacity(teacher_id, day)
+            weekly = snapshot.teacher_weekly_capacity(teacher_id)
+            if daily <= 0 or weekly <= 0:
+                continue
+            rank = (teacher['department_id'] == subject_department, weekly, daily, -teacher_id)
+            if best is None or rank > best[0]:
+                best = (rank, teacher_id)
+
+        if best is None:
+            return None
+        subject_teacher.setdefault(key, best[1])
+        return best[1]
+
+    @staticmethod
+    def _pick_room(snapshot, school_class, subject_id, day, period_id, home_room):
+        """The class's usual room if free and of the subject's type, else the smallest free room that fits"""
+        current = home_room.get(school_class.id)
+        if (current and snapshot.room_fits(current, school_class.id, subject_id)
+                and snapshot.room_free(current, day, period_id)):
+            return current
+
+        best = None
+        for room_id in snapshot.free_rooms(day, period_id):
+            if not snapshot.room_fits(room_id, school_class.id, subject_id):
+                continue
+            capacity = snapshot.rooms[room_id]['capacity']
+            if best is None or capacity < best[0]:
+                best = (capacity, room_id)
+
+        if best is None:
+            return None
+        # A lab picked for one subject is not the class's usual room
+        if subject_id not in snapshot.room_types:
+            home_room.setdefault(school_class.id, best[1])
+        return best[1]
@@ -0,0 +1,91 @@
+# apps/timetable/tenancy.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from .conf import timetable_setting
+
+# Id of the School the current request, command or task works for; None means every school
+_current_school = ContextVar('timetable_school', default=None)
+
+HOST_CACHE_KEY = 'timetable:school_for_host:{}'
+USER_CACHE_KEY = 'timetable:school_for_user:{}'
+
+def current_school_id():
+    return _current_school.get()
+
+def _school_id(school):
+    return getattr(school, 'pk', school)
+
+def activate_school(school):
+    """Scope the tenant managers to a School (or id) until deactivate_school(token)"""
+    return _current_school.set(_school_id(school))
+
+def deactivate_school(token):
+    _current_school.reset(token)
+
+@contextmanager
+def school_context(school):
+    """Run a block for one school; None runs it for every school"""
+    token = activate_school(school)
+    try:
+        yield
+    finally:
+        deactivate_school(token)
+
+def tenant_filter(tenant_field, school, shared=False):
+    """Q keeping a school's rows, plus rows of no school when shared"""
+    condition = Q(**{tenant_field: school})
+    if shared:
+        condition |= Q(**{f'{tenant_field}__isnull': True})
+    return condition
+
+def tenant_key(key):
+    """A cache key partitioned by the active school"""
+    school_id = current_school_id()
+    return key if school_id is None else f'{key}:school-{school_id}'
+
+def school_database(school=None):
+    """Alias of the school's own database (the active school by default), or None if it shares 'default'"""
+    school_id = current_school_id() if school is None else _school_id(school)
+    if school_id is None:
+        return None
+    return timetable_setting('SCHOOL_DATABASES', {}).get(school_id)
+
+def tenant_db_alias():
+    """Database the active school's timetable lives in; pass it to transaction.atomic() and on_commit()"""
+    return school_database() or DEFAULT_DB_ALIAS
+
+def database_partitions():
+    """None (the shared database) followed by every school with a database of its own
+
+    Background jobs run once per partition inside school_context().
+    """
+    return [None, *timetable_setting('SCHOOL_DATABASES', {})]
+
+def school_for_host(host):
+    """Id of the School serving a host name, or None; cached for a minute"""
+    host = host.split(':', 1)[0].lower()
+    key = HOST_CACHE_KEY.format(host)
+    school_id = cache.get(key)
+    if school_id is None:
+        from .models import School
+
+        # The registry of schools always lives in the shared database
+        school_id = School.objects.using('default').filter(domain=host).values_list('id', flat=True).first() or 0
+        cache.set(key, school_id, 60)
+    return school_id or None
+
+def school_for_user(user):
+    """Id of the School a user teaches at, or None for users of no school; cached for a minute"""
+    key = tenant_key(USER_CACHE_KEY.format(user.pk))
+    school_id = cache.get(key)
+    if school_id is None:
+        from .models import Teacher
+
+        school_id = Teacher._base_manager.filter(user=user).values_list('department__school_id', flat=True).first() or 0
+        cache.set(key, school_id, 60)
+    return school_id or None
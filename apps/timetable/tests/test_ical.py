@@ -0,0 +1,61 @@
+# apps/timetable/tests/test_ical.py
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.timetable.ical import cached_feed
+from apps.timetable.loadtest import seed_school
+from apps.timetable.models import AcademicYear, Class, Subject, TimeSlot
+
+ACADEMIC_YEAR = '2026-2027'
+
+class CalendarFeedTests(TestCase):
+    """Feeds are valid for calendar apps and follow edits of the rows their events name"""
+
+    @classmethod
+    def setUpTestData(cls):
+        AcademicYear.objects.create(
+            name=ACADEMIC_YEAR, start_date=datetime.date(2026, 6, 1), end_date=datetime.date(2027, 5, 31),
+            is_current=True,
+        )
+        seed_school(ACADEMIC_YEAR, classes=2)
+        cls.school_class = Class.objects.first()
+
+    def setUp(self):
+        cache.clear()
+
+    def feed(self):
+        body, _ = cached_feed('class', self.school_class.id)
+        return body.replace('\r\n ', '').split('\r\n')
+
+    def test_until_is_utc(self):
+        lines = self.feed()
+        rules = [line for line in lines if line.startswith('RRULE:')]
+        self.assertTrue(rules)
+        # The last day ends at 23:59:59 in Asia/Kolkata (UTC+05:30)
+        self.assertEqual(set(rules), {'RRULE:FREQ=WEEKLY;UNTIL=20270531T182959Z'})
+
+    def test_time_zone_is_defined(self):
+        lines = self.feed()
+        start = lines.index('BEGIN:VTIMEZONE')
+        self.assertEqual(lines[start + 1], 'TZID:Asia/Kolkata')
+        self.assertIn('TZOFFSETTO:+0530', lines[start:lines.index('END:VTIMEZONE')])
+
+    @override_settings(TIME_ZONE='Europe/London')
+    def test_daylight_saving_changes_are_listed(self):
+        lines = self.feed()
+        block = lines[lines.index('BEGIN:VTIMEZONE'):lines.index('END:VTIMEZONE')]
+        self.assertIn('DTSTART:20261025T020000', block)
+        self.assertIn('DTSTART:20270328T010000', block)
+        self.assertIn('RRULE:FREQ=WEEKLY;UNTIL=20270531T225959Z', lines)
+
+    def test_renaming_a_subject_refreshes_the_feed(self):
+        subject = Subject.objects.get(id=TimeSlot.objects.filter(school_class=self.school_class).exclude(
+            subject=None).values_list('subject_id', flat=True).first())
+        self.assertIn(f'SUMMARY:{subject.name}', self.feed())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            subject.name = 'Renamed Subject'
+            subject.save()
+        self.assertIn('SUMMARY:Renamed Subject', self.feed())
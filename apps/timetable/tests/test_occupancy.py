@@ -0,0 +1,74 @@
+# apps/timetable/tests/test_occupancy.py
+import datetime
+
+from django.test import SimpleTestCase
+
+from apps.timetable.occupancy import OccupancySnapshot
+
+def _period(order, start, end, is_break=False):
+    return {'order': order, 'is_break': is_break,
+            'start_time': datetime.time(*start), 'end_time': datetime.time(*end)}
+
+# Two ordinary periods, a double lab period spanning both, and a later period
+PERIODS = {
+    1: _period(1, (8, 0), (8, 45)),
+    2: _period(2, (8, 45), (9, 30)),
+    3: _period(3, (8, 0), (9, 30)),
+    4: _period(4, (10, 0), (10, 45)),
+}
+ROOMS = {10: {'capacity': 30, 'room_type': 'LAB'}, 11: {'capacity': 30, 'room_type': 'LECTURE'}}
+
+class OverlappingPeriodTests(SimpleTestCase):
+    """A booking makes every period overlapping its own busy, not just its own id"""
+
+    def setUp(self):
+        # (id, class_id, subject_id, teacher_id, room_id, day, period_id): a lab lesson in the long period
+        self.snapshot = OccupancySnapshot(
+            [(1, 100, 5, 7, 10, 'MON', 3)], PERIODS, ROOMS, teachers={}, classes={}, days=['MON', 'TUE'],
+        )
+
+    def test_overlapped_periods_are_busy(self):
+        for period_id in (1, 2, 3):
+            with self.subTest(period=period_id):
+                self.assertFalse(self.snapshot.class_free(100, 'MON', period_id))
+                self.assertFalse(self.snapshot.teacher_free(7, 'MON', period_id))
+                self.assertFalse(self.snapshot.room_free(10, 'MON', period_id))
+                self.assertEqual(self.snapshot.free_rooms('MON', period_id), [11])
+                self.assertEqual(self.snapshot.occupants('teacher', 7, 'MON', period_id), {1})
+
+    def test_other_times_and_days_are_free(self):
+        self.assertTrue(self.snapshot.teacher_free(7, 'MON', 4))
+        self.assertTrue(self.snapshot.teacher_free(7, 'TUE', 1))
+        self.assertEqual(self.snapshot.free_rooms('MON', 4), [10, 11])
+
+    def test_ignored_slots_do_not_count(self):
+        self.assertTrue(self.snapshot.teacher_free(7, 'MON', 1, ignore={1}))
+        self.assertTrue(self.snapshot.room_free(10, 'MON', 2, ignore={1}))
+
+    def test_moved_slot_frees_its_old_periods(self):
+        self.snapshot.update(1, period_id=4)
+        self.assertTrue(self.snapshot.teacher_free(7, 'MON', 1))
+        self.assertFalse(self.snapshot.teacher_free(7, 'MON', 4))
+
+class RoomFitTests(SimpleTestCase):
+    """A room fits a lesson when it seats the class and has the subject's required type"""
+
+    def setUp(self):
+        rooms = {10: {'capacity': 30, 'room_type': 'LAB'}, 11: {'capacity': 40, 'room_type': 'LECTURE'},
+                 12: {'capacity': 20, 'room_type': 'LAB'}}
+        self.snapshot = OccupancySnapshot(
+            [], PERIODS, rooms, teachers={}, classes={100: {'total_students': 25, 'department_id': 1}},
+            subjects={5: 1, 6: 1}, room_types={5: 'LAB'},
+        )
+
+    def test_required_type(self):
+        self.assertTrue(self.snapshot.room_fits(10, 100, 5))
+        self.assertFalse(self.snapshot.room_fits(11, 100, 5))
+
+    def test_capacity(self):
+        self.assertFalse(self.snapshot.room_fits(12, 100, 5))
+
+    def test_no_required_type(self):
+        self.assertTrue(self.snapshot.room_fits(10, 100, 6))
+        self.assertTrue(self.snapshot.room_fits(11, 100, 6))
+        self.assertFalse(self.snapshot.room_fits(99, 100, 6))
@@ -0,0 +1,80 @@
+# apps/timetable/tests/test_optimizer.py
+import datetime
+from collections import Counter
+
+from django.test import TestCase
+
+from apps.timetable.loadtest import seed_school
+from apps.timetable.models import AcademicYear, Teacher, TimeSlot
+from apps.timetable.optimizer import TimetableOptimizer
+
+ACADEMIC_YEAR = '2026-2027'
+
+def _lessons():
+    return list(
+        TimeSlot.objects.filter(academic_year=ACADEMIC_YEAR, is_active=True, period__is_break=False).values_list(
+            'school_class_id', 'subject_id', 'teacher_id', 'classroom_id', 'day_of_week', 'period_id'
+        )
+    )
+
+def _double_bookings(lessons):
+    """(kind, id, day, period) cells holding a class, teacher or room more than once"""
+    counts = Counter()
+    for class_id, _, teacher_id, room_id, day, period_id in lessons:
+        counts[('class', class_id, day, period_id)] += 1
+        if teacher_id:
+            counts[('teacher', teacher_id, day, period_id)] += 1
+        if room_id:
+            counts[('room', room_id, day, period_id)] += 1
+    return [cell for cell, count in counts.items() if count > 1]
+
+class OptimizerInvariantTests(TestCase):
+    """The annealing optimizer improves the score without ever making the timetable infeasible"""
+
+    @classmethod
+    def setUpTestData(cls):
+        AcademicYear.objects.create(
+            name=ACADEMIC_YEAR, start_date=datetime.date(2026, 6, 1), end_date=datetime.date(2027, 5, 31),
+            is_current=True,
+        )
+        seed_school(ACADEMIC_YEAR, classes=3)
+        # Free every fourth lesson so lessons can move as well as swap
+        lesson_ids = TimeSlot.objects.filter(period__is_break=False).order_by('id').values_list('id', flat=True)
+        TimeSlot.objects.filter(id__in=list(lesson_ids)[::4]).delete()
+
+    def optimize(self, seed):
+        optimizer = TimetableOptimizer(ACADEMIC_YEAR)
+        result = optimizer.optimize(time_budget_ms=300, seed=seed)
+        return optimizer, result
+
+    def test_grids_stay_feasible(self):
+        for seed in (1, 2, 3):
+            with self.subTest(seed=seed):
+                optimizer, result = self.optimize(seed)
+                self.assertLessEqual(result['final_score'], result['initial_score'])
+                self.assertLessEqual(int(optimizer.class_grid.max()), 1)
+                self.assertLessEqual(int(optimizer.teacher_grid.max()), 1)
+                self.assertLessEqual(int(optimizer.room_grid.max()), 1)
+                # No teacher is over their daily cap
+                per_day = optimizer.teacher_grid.sum(axis=2)
+                self.assertTrue((per_day.max(axis=1) <= optimizer.teacher_day_cap).all())
+
+    def test_applied_timetable_keeps_every_lesson_without_clashes(self):
+        before = _lessons()
+        optimizer, result = self.optimize(seed=4)
+        diff = optimizer.apply()
+        after = _lessons()
+
+        self.assertTrue(diff)
+        self.assertEqual(_double_bookings(before), [])
+        self.assertEqual(_double_bookings(after), [])
+        # The same lessons (class, subject, teacher, room), only in other cells
+        self.assertEqual(Counter(lesson[:4] for lesson in after), Counter(lesson[:4] for lesson in before))
+        caps = dict(Teacher.objects.values_list('id', 'max_periods_per_day'))
+        daily = Counter((teacher_id, day) for _, _, teacher_id, _, day, _ in after if teacher_id)
+        self.assertTrue(all(count <= caps[teacher_id] for (teacher_id, _), count in daily.items()))
+
+    def test_score_of_reloaded_timetable_matches(self):
+        optimizer, result = self.optimize(seed=5)
+        optimizer.apply()
+        self.assertAlmostEqual(TimetableOptimizer(ACADEMIC_YEAR).score(), result['final_score'], places=3)
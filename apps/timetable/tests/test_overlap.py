@@ -0,0 +1,83 @@
+# apps/timetable/tests/test_overlap.py
+import itertools
+import random
+
+from django.test import SimpleTestCase
+
+from apps.timetable.overlap import find_clash_groups, find_clashes, overlap_groups, overlap_pairs, overlapping_periods
+
+def _overlaps(a, b):
+    return a[0] < b[1] and b[0] < a[1]
+
+def _random_items(rng, count):
+    items = []
+    for key in range(count):
+        start = rng.randrange(0, 600, 5)
+        items.append((start, start + rng.randrange(5, 120, 5), key))
+    return items
+
+class OverlapSweepTests(SimpleTestCase):
+    """The sweep finds exactly the pairs a check of every pair finds"""
+
+    def test_pairs_match_brute_force(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            items = _random_items(rng, rng.randrange(0, 40))
+            expected = {frozenset((a[2], b[2])) for a, b in itertools.combinations(items, 2) if _overlaps(a, b)}
+            pairs = overlap_pairs(items)
+            self.assertEqual(len(pairs), len(expected))
+            self.assertEqual({frozenset(pair) for pair in pairs}, expected)
+
+    def test_touching_intervals_do_not_overlap(self):
+        self.assertEqual(overlap_pairs([(0, 45, 'a'), (45, 90, 'b')]), [])
+        self.assertEqual(overlap_groups([(0, 45, 'a'), (45, 90, 'b')]), [])
+
+    def test_groups_are_the_connected_overlaps(self):
+        rng = random.Random(11)
+        for _ in range(50):
+            items = _random_items(rng, rng.randrange(0, 30))
+            groups = overlap_groups(items)
+            grouped = [key for group in groups for key in group]
+            self.assertEqual(len(grouped), len(set(grouped)))
+            group_of = {key: index for index, group in enumerate(groups) for key in group}
+            # Every overlapping pair sits in one group, and every group is chained by overlaps
+            for a, b in overlap_pairs(items):
+                self.assertEqual(group_of[a], group_of[b])
+            by_key = {item[2]: item for item in items}
+            for group in groups:
+                self.assertGreater(len(group), 1)
+                for key in group:
+                    self.assertTrue(any(_overlaps(by_key[key], by_key[other]) for other in group if other != key))
+
+    def test_unsaved_slots_without_keys(self):
+        self.assertEqual(len(overlap_pairs([(0, 45, None), (0, 45, None), (30, 60, None)])), 3)
+
+class ClashTests(SimpleTestCase):
+    """Clashes are found by period time, per resource and day"""
+
+    # A long lab period (3) covers periods 1 and 2; period 4 is later
+    INTERVALS = {1: (480, 525), 2: (525, 570), 3: (480, 570), 4: (600, 645)}
+
+    def test_overlapping_periods(self):
+        self.assertEqual(overlapping_periods(1, self.INTERVALS), {1, 3})
+        self.assertEqual(overlapping_periods(3, self.INTERVALS), {1, 2, 3})
+        self.assertEqual(overlapping_periods(4, self.INTERVALS), {4})
+        self.assertEqual(overlapping_periods(99, self.INTERVALS), set())
+
+    def test_find_clashes(self):
+        # (id, class_id, subject_id, teacher_id, room_id, day, period_id)
+        rows = [
+            (1, 10, 1, 7, 20, 'MON', 3),
+            (2, 11, 1, 7, 21, 'MON', 2),     # teacher 7 again, inside the lab period
+            (3, 12, 1, 8, 20, 'MON', 1),     # room 20 again, inside the lab period
+            (4, 10, 1, 9, 22, 'MON', 4),     # class 10 later that day: no clash
+            (5, 13, 1, 7, 20, 'TUE', 1),     # another day
+            (6, 14, 1, None, None, 'MON', 3),
+        ]
+        clashes = {(clash.kind, clash.resource_id, frozenset(clash.slot_ids)) for clash in find_clashes(rows, self.INTERVALS)}
+        self.assertEqual(clashes, {('teacher', 7, frozenset({1, 2})), ('room', 20, frozenset({1, 3}))})
+
+    def test_find_clash_groups(self):
+        rows = [(1, 10, 1, 7, None, 'MON', 1), (2, 11, 1, 7, None, 'MON', 3), (3, 12, 1, 7, None, 'MON', 2)]
+        groups = find_clash_groups(rows, self.INTERVALS, kinds=('teacher',))
+        self.assertEqual([sorted(group.slot_ids) for group in groups], [[1, 2, 3]])
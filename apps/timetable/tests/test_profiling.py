@@ -0,0 +1,61 @@
+# apps/timetable/tests/test_profiling.py
+import datetime
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncClient, Client, TestCase
+from django.urls import reverse
+
+from apps.timetable.loadtest import seed_school
+from apps.timetable.models import AcademicYear, ProfileRecord
+from apps.timetable.profiling import load_stats
+
+ACADEMIC_YEAR = '2026-2027'
+
+def profiled_functions(record):
+    return {name for (_, _, name) in load_stats(record.data).stats}
+
+class RequestProfilingTests(TestCase):
+    """?profile=1 records the view's own work under WSGI and ASGI"""
+
+    @classmethod
+    def setUpTestData(cls):
+        AcademicYear.objects.create(
+            name=ACADEMIC_YEAR, start_date=datetime.date(2026, 6, 1), end_date=datetime.date(2027, 5, 31),
+            is_current=True,
+        )
+        seed_school(ACADEMIC_YEAR, classes=2)
+        cls.user = User.objects.create_superuser('profiler', 'profiler@example.com', 'password')
+
+    def get_profile(self, client, path):
+        # The middleware logs one line per request; keep it out of the test output
+        with self.assertLogs('apps.timetable.instrumentation', 'INFO'):
+            if isinstance(client, AsyncClient):
+                response = async_to_sync(self._aget)(client, path)
+            else:
+                response = client.get(path, {'profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        return ProfileRecord.objects.get(pk=response['X-Profile-Id'])
+
+    @staticmethod
+    async def _aget(client, path):
+        return await client.get(path, {'profile': '1'})
+
+    def test_sync_view_under_wsgi(self):
+        client = Client()
+        client.force_login(self.user)
+        record = self.get_profile(client, reverse('timetable:conflicts'))
+        self.assertIn('conflict_report_view', profiled_functions(record))
+
+    def test_sync_view_under_asgi(self):
+        # Sync views run on a worker thread under ASGI, not on the event loop thread
+        client = AsyncClient()
+        client.force_login(self.user)
+        record = self.get_profile(client, reverse('timetable:conflicts'))
+        self.assertIn('conflict_report_view', profiled_functions(record))
+
+    def test_async_view_under_asgi(self):
+        client = AsyncClient()
+        client.force_login(self.user)
+        record = self.get_profile(client, reverse('timetable:dashboard'))
+        self.assertIn('dashboard_view', profiled_functions(record))
@@ -0,0 +1,82 @@
+# apps/timetable/tests/test_query_budgets.py
+import datetime
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.timetable.aggregates import rebuild_aggregates
+from apps.timetable.ical import feed_token
+from apps.timetable.instrumentation import query_budget
+from apps.timetable.loadtest import seed_school
+from apps.timetable.models import AcademicYear, Class, Teacher, TimeSlot
+from apps.timetable.search import rebuild_index
+
+ACADEMIC_YEAR = '2026-2027'
+SNAPSHOT_DIR = tempfile.mkdtemp(prefix='timetable-snapshots-')
+
+@override_settings(TIMETABLE_SETTINGS={**settings.TIMETABLE_SETTINGS, 'SNAPSHOT_DIR': SNAPSHOT_DIR})
+class QueryBudgetTests(TestCase):
+    """Every view in TIMETABLE_SETTINGS['QUERY_BUDGETS'] stays within its budget on a seeded school
+
+    Caches are cleared first, so each request is measured cold; the
+    dashboard aggregates are built up front, as rebuild_analytics does once
+    per deployment.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        AcademicYear.objects.create(
+            name=ACADEMIC_YEAR, start_date=datetime.date(2026, 6, 1), end_date=datetime.date(2027, 5, 31),
+            is_current=True,
+        )
+        cls.addClassCleanup(shutil.rmtree, SNAPSHOT_DIR, ignore_errors=True)
+        with cls.captureOnCommitCallbacks(execute=True):
+            seed_school(ACADEMIC_YEAR, classes=4)
+        rebuild_aggregates(ACADEMIC_YEAR)
+        rebuild_index()
+        cls.user = User.objects.create_superuser('budget', 'budget@example.com', 'password')
+        cls.school_class = Class.objects.first()
+        cls.teacher = Teacher.objects.first()
+        cls.slot = TimeSlot.objects.filter(teacher__isnull=False).first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def requests(self):
+        """View name: (path, query) of one request to each budgeted view"""
+        return {
+            'timetable:dashboard': (reverse('timetable:dashboard'), {}),
+            'timetable:grid': (reverse('timetable:grid', args=[self.school_class.id]), {}),
+            'timetable:teacher': (reverse('timetable:teacher'), {}),
+            'timetable:teacher_detail': (reverse('timetable:teacher_detail', args=[self.teacher.id]), {}),
+            'timetable:conflicts': (reverse('timetable:conflicts'), {}),
+            'timetable:slot_suggestions': (reverse('timetable:slot_suggestions', args=[self.slot.id]), {}),
+            'timetable:teacher_substitutes': (
+                reverse('timetable:teacher_substitutes', args=[self.teacher.id]), {'day': 'MON'}
+            ),
+            'timetable:ical_feed': (reverse('timetable:ical_feed', args=[feed_token('class', self.school_class.id)]), {}),
+            'timetable:changes': (reverse('timetable:changes'), {'cursor': 0}),
+            'timetable:search': (reverse('timetable:search'), {'q': 'teacher'}),
+            'timetable:analytics_frame': (reverse('timetable:analytics_frame', args=['teacher_workload']), {}),
+        }
+
+    def test_every_budget_has_a_request(self):
+        self.assertEqual(set(self.requests()), set(settings.TIMETABLE_SETTINGS['QUERY_BUDGETS']))
+
+    def test_views_stay_within_budget(self):
+        requests = self.requests()
+        # The middleware logs one line per request; keep them out of the test output
+        with self.assertLogs('apps.timetable.instrumentation', 'INFO') as logs:
+            for name, (path, query) in requests.items():
+                with self.subTest(view=name):
+                    cache.clear()
+                    with query_budget(name):
+                        response = self.client.get(path, query)
+                    self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(logs.records), len(requests))
@@ -0,0 +1,110 @@
+# apps/timetable/tests/test_repair.py
+import datetime
+from collections import Counter
+
+from django.test import TestCase
+
+from apps.timetable.loadtest import seed_school
+from apps.timetable.models import AcademicYear, ClassRoom, School, Subject, Teacher, TimeSlot
+from apps.timetable.repair import TimetableRepairer
+from apps.timetable.suggestions import ConflictResolver
+
+ACADEMIC_YEAR = '2026-2027'
+
+class RoomTypeTests(TestCase):
+    """Rooms picked for a lesson are of the type its subject requires, whatever room it had before"""
+
+    @classmethod
+    def setUpTestData(cls):
+        AcademicYear.objects.create(
+            name=ACADEMIC_YEAR, start_date=datetime.date(2026, 6, 1), end_date=datetime.date(2027, 5, 31),
+            is_current=True,
+        )
+        seed_school(ACADEMIC_YEAR, classes=2)
+        school = School.objects.get()
+        # Every seeded room is a lecture room in use all week; the spare lecture room is the snugger fit
+        cls.lecture = ClassRoom.objects.create(name='Spare', room_number='SP1', capacity=30, school=school)
+        cls.lab = ClassRoom.objects.create(name='Lab', room_number='LB1', capacity=60, room_type='LAB', school=school)
+        cls.slot = TimeSlot.objects.filter(subject__isnull=False).select_related('subject').first()
+        Subject.objects.filter(id=cls.slot.subject_id).update(required_room_type='LAB')
+
+    def test_repair_moves_a_lab_lesson_into_a_lab(self):
+        result = TimetableRepairer(ACADEMIC_YEAR).repair(room_ids=[self.slot.classroom_id])
+        rooms = {change['slot_id']: change['changes'].get('classroom_id') for change in result['changes']}
+        self.assertEqual(rooms[self.slot.id], [self.slot.classroom_id, self.lab.id])
+
+    def test_lessons_without_a_type_keep_to_lecture_rooms(self):
+        Subject.objects.filter(id=self.slot.subject_id).update(required_room_type='')
+        result = TimetableRepairer(ACADEMIC_YEAR).repair(room_ids=[self.slot.classroom_id])
+        rooms = {change['slot_id']: change['changes'].get('classroom_id') for change in result['changes']}
+        self.assertEqual(rooms[self.slot.id], [self.slot.classroom_id, self.lecture.id])
+
+    def test_suggested_moves_use_a_lab(self):
+        # Free one other cell of the class, with the class's own room in it; no teacher to fit in too
+        TimeSlot.objects.filter(school_class_id=self.slot.school_class_id, subject__isnull=False).exclude(
+            id=self.slot.id).order_by('id').first().delete()
+        TimeSlot.objects.filter(id=self.slot.id).update(teacher=None)
+        self.slot.refresh_from_db()
+        moves = [
+            suggestion for suggestion in ConflictResolver().suggest(self.slot, limit=100)['suggestions']
+            if suggestion['type'] == 'move'
+        ]
+        self.assertTrue(moves)
+        self.assertEqual({move['classroom_id'] for move in moves}, {self.lab.id})
+
+class RepairInvariantTests(TestCase):
+    """Repairs leave no lesson with an unavailable teacher or room and never double-book anything"""
+
+    @classmethod
+    def setUpTestData(cls):
+        AcademicYear.objects.create(
+            name=ACADEMIC_YEAR, start_date=datetime.date(2026, 6, 1), end_date=datetime.date(2027, 5, 31),
+            is_current=True,
+        )
+        seed_school(ACADEMIC_YEAR, classes=3)
+        school = School.objects.get()
+        ClassRoom.objects.create(name='Spare', room_number='SP1', capacity=40, school=school)
+        cls.teacher = Teacher.objects.order_by('id').first()
+        cls.room = ClassRoom.objects.order_by('id').first()
+
+    def lessons(self):
+        return list(
+            TimeSlot.objects.filter(is_active=True, period__is_break=False).values_list(
+                'id', 'school_class_id', 'teacher_id', 'classroom_id', 'day_of_week', 'period_id'
+            )
+        )
+
+    def double_bookings(self):
+        counts = Counter()
+        for _, class_id, teacher_id, room_id, day, period_id in self.lessons():
+            counts[('class', class_id, day, period_id)] += 1
+            if teacher_id:
+                counts[('teacher', teacher_id, day, period_id)] += 1
+            if room_id:
+                counts[('room', room_id, day, period_id)] += 1
+        return [cell for cell, count in counts.items() if count > 1]
+
+    def test_applied_repair_has_no_collisions(self):
+        Teacher.objects.filter(id=self.teacher.id).update(is_active=False)
+        broken = {
+            lesson[0] for lesson in self.lessons() if self.teacher.id == lesson[2] or self.room.id == lesson[3]
+        }
+        result = TimetableRepairer(ACADEMIC_YEAR).repair(room_ids=[self.room.id], apply=True)
+
+        self.assertTrue(result['applied'])
+        self.assertEqual(result['invalidated'], len(broken))
+        self.assertEqual(self.double_bookings(), [])
+        # Only lessons reported as unresolved keep the unavailable teacher or room
+        unresolved = {item['slot_id'] for item in result['unresolved']}
+        self.assertLess(len(unresolved), len(broken) // 4)
+        still_broken = {
+            lesson[0] for lesson in self.lessons() if lesson[2] == self.teacher.id or lesson[3] == self.room.id
+        }
+        self.assertEqual(still_broken, unresolved)
+
+    def test_dry_run_writes_nothing(self):
+        before = self.lessons()
+        result = TimetableRepairer(ACADEMIC_YEAR).repair(teacher_ids=[self.teacher.id])
+        self.assertTrue(result['changes'])
+        self.assertFalse(result['applied'])
+        self.assertEqual(self.lessons(), before)
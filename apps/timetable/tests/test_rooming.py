@@ -0,0 +1,45 @@
+# apps/timetable/tests/test_rooming.py
+import itertools
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.timetable.rooming import min_cost_assignment
+
+class HungarianMatcherTests(SimpleTestCase):
+    """min_cost_assignment returns a matching as cheap as the best of all of them"""
+
+    @staticmethod
+    def best_cost(cost):
+        n, m = cost.shape
+        return min(sum(cost[row, column] for row, column in enumerate(columns))
+                   for columns in itertools.permutations(range(m), n))
+
+    def assert_optimal(self, cost):
+        assignment = min_cost_assignment(cost)
+        self.assertEqual(len(assignment), cost.shape[0])
+        self.assertEqual(len(set(assignment.tolist())), cost.shape[0])
+        self.assertTrue(all(0 <= column < cost.shape[1] for column in assignment.tolist()))
+        total = cost[np.arange(cost.shape[0]), assignment].sum()
+        self.assertAlmostEqual(total, self.best_cost(cost))
+
+    def test_square_matrices(self):
+        rng = np.random.default_rng(3)
+        for size in range(1, 7):
+            for _ in range(10):
+                self.assert_optimal(rng.integers(0, 50, (size, size)).astype(float))
+
+    def test_more_columns_than_rows(self):
+        rng = np.random.default_rng(5)
+        for rows, columns in ((1, 4), (2, 5), (3, 6), (4, 7)):
+            for _ in range(10):
+                self.assert_optimal(rng.random((rows, columns)) * 100)
+
+    def test_ties_and_large_costs(self):
+        # Costs like the room assigner's: a huge cost for leaving a session unplaced
+        self.assert_optimal(np.array([[1e7, 5.0, 5.0], [1e7, 1e7, 5.0]]))
+        self.assert_optimal(np.zeros((4, 4)))
+
+    def test_known_assignment(self):
+        cost = np.array([[4.0, 1.0, 3.0], [2.0, 0.0, 5.0], [3.0, 2.0, 2.0]])
+        self.assertEqual(min_cost_assignment(cost).tolist(), [1, 0, 2])
@@ -0,0 +1,69 @@
+# apps/timetable/tests/test_snapshot.py
+import datetime
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from apps.timetable.loadtest import seed_school
+from apps.timetable.models import AcademicYear, TimeSlot, TimetableRevision
+from apps.timetable.snapshot import TimetableSnapshot
+
+ACADEMIC_YEAR = '2026-2027'
+SNAPSHOT_DIR = tempfile.mkdtemp(prefix='timetable-snapshots-')
+
+def _live_rows():
+    return sorted(
+        (slot_id, class_id, subject_id, teacher_id, room_id, day, period_id)
+        for slot_id, class_id, subject_id, teacher_id, room_id, day, period_id in TimeSlot.objects.filter(
+            academic_year=ACADEMIC_YEAR, is_active=True
+        ).values_list('id', 'school_class_id', 'subject_id', 'teacher_id', 'classroom_id', 'day_of_week', 'period_id')
+    )
+
+@override_settings(TIMETABLE_SETTINGS={**settings.TIMETABLE_SETTINGS, 'SNAPSHOT_DIR': SNAPSHOT_DIR})
+class SnapshotRoundTripTests(TestCase):
+    """A snapshot written to disk and mapped back holds exactly the year's active slots"""
+
+    @classmethod
+    def setUpTestData(cls):
+        AcademicYear.objects.create(
+            name=ACADEMIC_YEAR, start_date=datetime.date(2026, 6, 1), end_date=datetime.date(2027, 5, 31),
+            is_current=True,
+        )
+        cls.addClassCleanup(shutil.rmtree, SNAPSHOT_DIR, ignore_errors=True)
+        seed_school(ACADEMIC_YEAR, classes=2)
+        # Snapshots hold active slots only
+        TimeSlot.objects.filter(id=TimeSlot.objects.filter(teacher__isnull=False).first().id).update(is_active=False)
+
+    def test_write_and_open(self):
+        built = TimetableSnapshot.build(ACADEMIC_YEAR)
+        path = os.path.join(SNAPSHOT_DIR, 'round-trip.bin')
+        built.write(path)
+        opened = TimetableSnapshot.open(path)
+
+        self.assertEqual((opened.academic_year, opened.revision, opened.key), (ACADEMIC_YEAR, built.revision, built.key))
+        self.assertEqual(len(opened), len(_live_rows()))
+        self.assertEqual(sorted(opened.rows()), _live_rows())
+        self.assertEqual(sorted(opened.rows(days=['TUE'])), [row for row in _live_rows() if row[5] == 'TUE'])
+
+    def test_load_follows_the_revision(self):
+        first = TimetableSnapshot.load(ACADEMIC_YEAR)
+        self.assertIs(TimetableSnapshot.load(ACADEMIC_YEAR), first)
+        self.assertEqual(sorted(first.rows()), _live_rows())
+
+        TimeSlot.objects.filter(id=first.rows()[0][0]).delete()
+        TimetableRevision.bump(ACADEMIC_YEAR)
+        second = TimetableSnapshot.load(ACADEMIC_YEAR)
+        self.assertEqual(second.revision, first.revision + 1)
+        self.assertEqual(sorted(second.rows()), _live_rows())
+        # The older revision's file is removed once the new one is written
+        self.assertEqual(len([name for name in os.listdir(SNAPSHOT_DIR) if name.startswith('timetable-')]), 1)
+
+    def test_rejects_other_files(self):
+        path = os.path.join(SNAPSHOT_DIR, 'not-a-snapshot.bin')
+        with open(path, 'wb') as output:
+            output.write(b'\0' * 64)
+        with self.assertRaises(ValueError):
+            TimetableSnapshot.open(path)
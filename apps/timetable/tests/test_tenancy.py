@@ -0,0 +1,77 @@
+# apps/timetable/tests/test_tenancy.py
+import datetime
+import io
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.timetable.loadtest import seed_school
+from apps.timetable.models import AcademicYear, ArchivedTimeSlot, Class, Department, School, TimeSlot
+from apps.timetable.tenancy import school_context
+
+ACADEMIC_YEAR = '2026-2027'
+PAST_YEAR = '2025-2026'
+
+class PerSchoolUniquenessTests(TestCase):
+    """Codes and class names are unique within a school, not across schools"""
+
+    @classmethod
+    def setUpTestData(cls):
+        AcademicYear.objects.create(
+            name=ACADEMIC_YEAR, start_date=datetime.date(2026, 6, 1), end_date=datetime.date(2027, 5, 31),
+            is_current=True,
+        )
+        seed_school(ACADEMIC_YEAR, classes=2, prefix='NA')
+        seed_school(ACADEMIC_YEAR, classes=2, prefix='SO')
+        cls.north, cls.south = School.objects.order_by('id')
+        cls.north_class = Class.objects.filter(department__school=cls.north).first()
+
+    def clone_class(self, department):
+        return Class(name=self.north_class.name, section=self.north_class.section, grade_level=9,
+                     department=department, academic_year=ACADEMIC_YEAR)
+
+    def test_class_name_may_repeat_in_another_school(self):
+        with school_context(self.south):
+            school_class = self.clone_class(Department.objects.first())
+            school_class.full_clean()
+            school_class.save()
+
+    def test_class_name_is_unique_within_a_school(self):
+        # Another department of the same school, so only the per-school check catches it
+        department = Department.objects.filter(school=self.north).exclude(id=self.north_class.department_id).first()
+        with school_context(self.south), self.assertRaises(ValidationError):
+            self.clone_class(department).full_clean()
+
+class PerSchoolArchiveTests(TestCase):
+    """archive_academic_year --school moves one school's slots and leaves the others' archive alone"""
+
+    @classmethod
+    def setUpTestData(cls):
+        AcademicYear.objects.create(
+            name=ACADEMIC_YEAR, start_date=datetime.date(2026, 6, 1), end_date=datetime.date(2027, 5, 31),
+            is_current=True,
+        )
+        seed_school(PAST_YEAR, classes=2, prefix='NA')
+        seed_school(PAST_YEAR, classes=2, prefix='SO')
+        cls.north, cls.south = School.objects.order_by('id')
+
+    def archive(self, school):
+        call_command('archive_academic_year', PAST_YEAR, school=school.id, stdout=io.StringIO())
+
+    def archived(self, school):
+        return ArchivedTimeSlot.objects.filter(school_id=school.id, academic_year=PAST_YEAR).count()
+
+    def test_archiving_one_school_keeps_the_other(self):
+        south_slots = TimeSlot.objects.filter(school=self.south, academic_year=PAST_YEAR).count()
+        self.archive(self.south)
+        # The north run first clears its own earlier copy, which must not reach the south's
+        self.archive(self.north)
+        self.assertEqual(self.archived(self.south), south_slots)
+        self.assertGreater(self.archived(self.north), 0)
+        self.assertFalse(TimeSlot.objects.filter(academic_year=PAST_YEAR).exists())
+
+    def test_school_archive_leaves_the_year_open(self):
+        self.archive(self.north)
+        self.assertFalse(AcademicYear.objects.get(name=PAST_YEAR).is_archived)
+        self.assertTrue(TimeSlot.objects.filter(school=self.south, academic_year=PAST_YEAR).exists())
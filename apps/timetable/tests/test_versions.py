@@ -0,0 +1,68 @@
+# apps/timetable/tests/test_versions.py
+import datetime
+
+from django.test import TestCase
+
+from apps.timetable.loadtest import seed_school
+from apps.timetable.models import AcademicYear, Teacher, TimeSlot
+from apps.timetable.versions import capture_version, diff_versions, live_rows, restore_version, version_rows
+
+ACADEMIC_YEAR = '2026-2027'
+
+def _cells(rows):
+    return sorted(map(tuple, rows.tolist()))
+
+class VersionRestoreTests(TestCase):
+    """A restored version is exactly the timetable it captured, whatever happened in between"""
+
+    @classmethod
+    def setUpTestData(cls):
+        AcademicYear.objects.create(
+            name=ACADEMIC_YEAR, start_date=datetime.date(2026, 6, 1), end_date=datetime.date(2027, 5, 31),
+            is_current=True,
+        )
+        seed_school(ACADEMIC_YEAR, classes=2)
+
+    def edit_timetable(self):
+        """Delete, deactivate, reassign and add lessons"""
+        lessons = list(TimeSlot.objects.filter(teacher__isnull=False).order_by('id'))
+        lessons[0].delete()
+        TimeSlot.objects.filter(id=lessons[1].id).update(is_active=False)
+        other_teacher = Teacher.objects.exclude(id=lessons[2].teacher_id).first()
+        TimeSlot.objects.filter(id=lessons[2].id).update(teacher=other_teacher, classroom=None)
+        TimeSlot.objects.create(
+            school_class_id=lessons[0].school_class_id, day_of_week='SUN', period_id=lessons[0].period_id,
+            subject_id=lessons[0].subject_id, academic_year=ACADEMIC_YEAR,
+        )
+
+    def test_capture_holds_the_live_timetable(self):
+        version = capture_version('Start', ACADEMIC_YEAR)
+        self.assertTrue(version.is_base)
+        self.assertEqual(version.lesson_count, TimeSlot.objects.filter(is_active=True).count())
+        self.assertEqual(_cells(version_rows(version)), _cells(live_rows(ACADEMIC_YEAR)))
+
+    def test_delta_version_round_trip(self):
+        base = capture_version('Start', ACADEMIC_YEAR)
+        self.edit_timetable()
+        delta = capture_version('Edited', ACADEMIC_YEAR)
+        self.assertEqual(delta.base_id, base.id)
+        self.assertLess(delta.stored_rows, base.stored_rows)
+        self.assertEqual(_cells(version_rows(delta)), _cells(live_rows(ACADEMIC_YEAR)))
+
+        result = diff_versions(base, delta)
+        self.assertEqual((result['changed'], result['added'], result['removed']), (1, 1, 2))
+
+    def test_restore_base_then_delta(self):
+        base = capture_version('Start', ACADEMIC_YEAR)
+        self.edit_timetable()
+        delta = capture_version('Edited', ACADEMIC_YEAR)
+
+        result = restore_version(base)
+        self.assertEqual(_cells(live_rows(ACADEMIC_YEAR)), _cells(version_rows(base)))
+        # The deactivated row is reactivated rather than recreated
+        self.assertEqual((result['updated'], result['created'], result['deleted']), (2, 1, 1))
+        remaining = diff_versions(base)
+        self.assertEqual((remaining['changed'], remaining['added'], remaining['removed']), (0, 0, 0))
+
+        restore_version(delta)
+        self.assertEqual(_cells(live_rows(ACADEMIC_YEAR)), _cells(version_rows(delta)))
@@ -8,9 +8,22 @@ urlpatterns = [
     # Basic URLs that work
     path('', views.dashboard_view, name='dashboard'),
     path('class/<int:class_id>/', views.timetable_grid_view, name='grid'),
+    path('class/<int:class_id>/json/', views.class_timetable_json_view, name='class_json'),
     path('teacher/', views.teacher_schedule_view, name='teacher'),
     path('teacher/<int:teacher_id>/', views.teacher_schedule_view, name='teacher_detail'),
+    path('teacher/<int:teacher_id>/json/', views.teacher_timetable_json_view, name='teacher_json'),
+    path('teacher/<int:teacher_id>/substitutes/', views.substitute_teachers_view, name='teacher_substitutes'),
     path('conflicts/', views.conflict_report_view, name='conflicts'),
+    path('analytics/', views.analytics_data_view, name='analytics'),
+    path('analytics/<str:panel>/', views.analytics_data_view, name='analytics_panel'),
+    path('analytics/frames/<str:name>/', views.analytics_frame_view, name='analytics_frame'),
+    path('slot/<int:slot_id>/suggestions/', views.slot_suggestions_view, name='slot_suggestions'),
+    path('ical/<str:kind>/<int:pk>/', views.ical_feed_link_view, name='ical_feed_link'),
+    path('ical/<str:token>.ics', views.ical_feed_view, name='ical_feed'),
+    path('changes/', views.timetable_changes_view, name='changes'),
+    path('changes/stream/', views.timetable_change_stream_view, name='change_stream'),
+    path('search/', views.search_view, name='search'),
+    path('staff/onboard/', views.staff_onboarding_view, name='staff_onboard'),
 
     # Comment out problematic URLs for now
     # path('generate/<int:class_id>/', views.auto_generate_timetable, name='generate'),
@@ -2,12 +2,22 @@
 import random
 from collections import defaultdict
 from django.db.models import Q
-from .models import TimeSlot, Teacher, ClassRoom, Subject, Period, Class, ConflictLog
+from .models import TimeSlot, Teacher, ClassRoom, Subject, Period, Class, ConflictLog, current_academic_year
+from .overlap import find_clashes, overlapping_periods, period_intervals
+from .profiling import profiled
+from .tenancy import school_context
 
 class ConflictDetector:
-    """Utility class for detecting scheduling conflicts"""
+    """Utility class for detecting scheduling conflicts
+
+    Lessons clash when their periods overlap in time, not only when they
+    share a Period row, so blocks spanning several periods are covered.
+    """
+
+    ROW_FIELDS = ('id', 'school_class_id', 'subject_id', 'teacher_id', 'classroom_id', 'day_of_week', 'period_id')
 
     @staticmethod
+    @profiled()
     def check_slot_conflicts(time_slot):
         """Check for conflicts in a given time slot"""
         conflicts = []
@@ -16,118 +26,118 @@ class ConflictDetector:
         if time_slot.period.is_break:
             return conflicts
 
+        # Every school's lessons: schools may share rooms
+        overlapping = TimeSlot._base_manager.filter(
+            academic_year=time_slot.academic_year,
+            day_of_week=time_slot.day_of_week,
+            period_id__in=overlapping_periods(time_slot.period_id, period_intervals()),
+            is_active=True
+        ).exclude(id=time_slot.id if time_slot.id else None)
+
         # Check teacher double booking
         if time_slot.teacher:
-            teacher_conflicts = TimeSlot.objects.filter(
-                teacher=time_slot.teacher,
-                day_of_week=time_slot.day_of_week,
-                period=time_slot.period,
-                is_active=True
-            ).exclude(id=time_slot.id if time_slot.id else None)
-
-            if teacher_conflicts.exists():
+            if overlapping.filter(teacher=time_slot.teacher).exists():
                 conflicts.append(f"Teacher {time_slot.teacher.user.get_full_name()} is already scheduled at this time")
 
         # Check classroom double booking
         if time_slot.classroom:
-            room_conflicts = TimeSlot.objects.filter(
-                classroom=time_slot.classroom,
-                day_of_week=time_slot.day_of_week,
-                period=time_slot.period,
-                is_active=True
-            ).exclude(id=time_slot.id if time_slot.id else None)
-
-            if room_conflicts.exists():
+            if overlapping.filter(classroom=time_slot.classroom).exists():
                 conflicts.append(f"Classroom {time_slot.classroom.name} is already booked at this time")
 
         # Check class double booking
         if time_slot.school_class:
-            class_conflicts = TimeSlot.objects.filter(
-                school_class=time_slot.school_class,
-                day_of_week=time_slot.day_of_week,
-                period=time_slot.period,
-                is_active=True
-            ).exclude(id=time_slot.id if time_slot.id else None)
-
-            if class_conflicts.exists():
+            if overlapping.filter(school_class=time_slot.school_class).exists():
                 conflicts.append(f"Class {time_slot.school_class.name} already has a period scheduled at this time")
 
         return conflicts
 
     @staticmethod
+    @profiled()
     def detect_class_conflicts(school_class):
         """Detect all conflicts for a specific class"""
-        conflicts = []
-        time_slots = TimeSlot.objects.filter(
-            school_class=school_class,
-            is_active=True
-        ).select_related('teacher', 'classroom', 'period')
+        year_slots = TimeSlot.objects.for_year(school_class.academic_year).filter(is_active=True)
+        class_rows = list(year_slots.filter(school_class=school_class).values_list(*ConflictDetector.ROW_FIELDS))
+        teacher_ids = {row[3] for row in class_rows if row[3]}
+        room_ids = {row[4] for row in class_rows if row[4]}
 
-        for slot in time_slots:
-            slot_conflicts = ConflictDetector.check_slot_conflicts(slot)
-            if slot_conflicts:
-                conflicts.extend(slot_conflicts)
+        # Only lessons sharing a teacher or room with the class can clash with it
+        rows = list(year_slots.filter(
+            Q(teacher_id__in=teacher_ids) | Q(classroom_id__in=room_ids)
+        ).exclude(school_class=school_class).values_list(*ConflictDetector.ROW_FIELDS)) + class_rows
+        class_slot_ids = {row[0] for row in class_rows}
 
-        return conflicts
+        return ConflictDetector._describe([
+            clash for clash in find_clashes(rows) if class_slot_ids.intersection(clash.slot_ids)
+        ])
 
     @staticmethod
-    def detect_all_conflicts():
-        """Detect all conflicts in the system"""
-        all_slots = TimeSlot.objects.filter(is_active=True).select_related('teacher', 'classroom', 'period', 'school_class')
-        conflict_groups = defaultdict(list)
-
-        # Group slots by day and period
-        for slot in all_slots:
-            if not slot.period.is_break:
-                key = f"{slot.day_of_week}_{slot.period.id}"
-                conflict_groups[key].append(slot)
-
-        conflicts = []
-        for key, slots in conflict_groups.items():
-            if len(slots) > 1:
-                # Check for teacher conflicts
-                teachers = defaultdict(list)
-                rooms = defaultdict(list)
-
-                for slot in slots:
-                    if slot.teacher:
-                        teachers[slot.teacher.id].append(slot)
-                    if slot.classroom:
-                        rooms[slot.classroom.id].append(slot)
-
-                # Report teacher conflicts
-                for teacher_id, teacher_slots in teachers.items():
-                    if len(teacher_slots) > 1:
-                        teacher_name = teacher_slots[0].teacher.user.get_full_name()
-                        conflicts.append(f"Teacher {teacher_name} has multiple classes at the same time")
-
-                # Report room conflicts
-                for room_id, room_slots in rooms.items():
-                    if len(room_slots) > 1:
-                        room_name = room_slots[0].classroom.name
-                        conflicts.append(f"Room {room_name} is double-booked")
+    @profiled()
+    def detect_all_conflicts(academic_year=None, school=None):
+        """Detect all conflicts in one academic year (the current one by default), of one school if given"""
+        slots = TimeSlot.objects.for_school(school) if school is not None else TimeSlot.objects.all()
+        rows = slots.for_year(academic_year or current_academic_year()).filter(
+            is_active=True
+        ).values_list(*ConflictDetector.ROW_FIELDS)
+        return ConflictDetector._describe(find_clashes(rows))
 
-        return conflicts
+    @staticmethod
+    def _describe(clashes):
+        """One message per clash, naming the teacher, room or class with one query per kind"""
+        ids = defaultdict(set)
+        for clash in clashes:
+            ids[clash.kind].add(clash.resource_id)
+        names = {
+            'teacher': {
+                teacher.id: teacher.user.get_full_name() or teacher.user.username
+                for teacher in Teacher.objects.filter(id__in=ids['teacher']).select_related('user')
+            } if ids['teacher'] else {},
+            'room': dict(ClassRoom.objects.filter(id__in=ids['room']).values_list('id', 'name')) if ids['room'] else {},
+            'class': dict(Class.objects.filter(id__in=ids['class']).values_list('id', 'name')) if ids['class'] else {},
+        }
+        templates = {
+            'teacher': "Teacher {} has multiple classes at the same time",
+            'room': "Room {} is double-booked",
+            'class': "Class {} has overlapping periods",
+        }
+        return [
+            templates[clash.kind].format(names[clash.kind].get(clash.resource_id, clash.resource_id))
+            for clash in clashes
+        ]
 
 class TimetableGenerator:
     """Algorithm for automatically generating timetables"""
 
-    def __init__(self):
+    def __init__(self, academic_year=None):
         self.days = ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT']
         self.periods = Period.objects.filter(is_break=False).order_by('order')
+        self.academic_year = academic_year or current_academic_year()
         self.max_attempts = 100
 
+    @profiled()
     def generate_for_class(self, school_class, subjects_per_week=None):
-        """Generate timetable for a specific class"""
+        """Generate timetable for a specific class
+
+        Runs within the class's school: only its teachers, rooms and periods
+        (and shared ones) are used, and its backups hold its lessons only.
+        """
+        with school_context(school_class.department.school_id):
+            return self._generate_for_class(school_class, subjects_per_week)
+
+    def _generate_for_class(self, school_class, subjects_per_week):
+        self.periods = Period.objects.filter(is_break=False).order_by('order')
         if not subjects_per_week:
             # Default subject distribution
             subjects_per_week = self._get_default_subjects(school_class)
 
+        # Keep a copy of the timetable before this class's slots are replaced
+        from .versions import auto_backup
+        auto_backup(f'Before generating {school_class}', self.academic_year)
+
         generated_slots = []
         available_slots = self._get_available_slots()
 
-        # Clear existing slots for this class
-        TimeSlot.objects.filter(school_class=school_class).delete()
+        # Clear existing slots for this class in the year being generated
+        TimeSlot.objects.filter(school_class=school_class, academic_year=self.academic_year).delete()
 
         for subject_id, periods_needed in subjects_per_week.items():
             subject = Subject.objects.get(id=subject_id)
@@ -152,8 +162,48 @@ class TimetableGenerator:
             if assigned_periods < periods_needed:
                 print(f"Warning: Could only assign {assigned_periods}/{periods_needed} periods for {subject.name}")
 
+        self._assign_rooms(school_class, generated_slots)
         return generated_slots
 
+    def _assign_rooms(self, school_class, generated_slots):
+        """Replace the randomly picked rooms with ones that seat the class and suit the subject"""
+        from .rooming import RoomAssigner
+
+        # Rooms shared by several schools may be booked by any of them
+        busy_rooms = defaultdict(set)
+        for day, period_id, room_id in TimeSlot._base_manager.filter(
+            academic_year=self.academic_year, is_active=True, classroom__isnull=False
+        ).exclude(school_class=school_class).values_list('day_of_week', 'period_id', 'classroom_id'):
+            busy_rooms[(day, period_id)].add(room_id)
+
+        assigner = RoomAssigner(self.academic_year)
+        sessions = [
+            {
+                'day': slot['day_of_week'], 'period_id': slot['period'].id, 'students': school_class.total_students,
+                'required_room_type': slot['subject'].required_room_type, 'room_id': slot['classroom'].id,
+            }
+            for slot in generated_slots
+        ]
+        room_ids = assigner.assign_sessions(sessions, busy_rooms)
+        rooms = ClassRoom.objects.in_bulk([room_id for room_id in room_ids if room_id])
+        for slot, room_id in zip(generated_slots, room_ids):
+            if room_id:
+                slot['classroom'] = rooms[room_id]
+
+    @profiled()
+    def optimize(self, school_classes=None, time_budget_ms=None, apply=True):
+        """Improve soft constraints of the saved timetable once the generated slots are stored"""
+        from .optimizer import TimetableOptimizer
+
+        class_ids = [school_class.id for school_class in school_classes] if school_classes else None
+        optimizer = TimetableOptimizer(academic_year=self.academic_year, class_ids=class_ids)
+        result = optimizer.optimize(time_budget_ms=time_budget_ms)
+        if apply:
+            from .versions import auto_backup
+            auto_backup('Before optimising', self.academic_year)
+        result['changes'] = optimizer.apply() if apply else optimizer.diff()
+        return result
+
     def _get_default_subjects(self, school_class):
         """Get default subject distribution for a class"""
         subjects = Subject.objects.filter(
@@ -181,12 +231,14 @@ class TimetableGenerator:
             for period in self.periods:
                 # Find teachers and rooms not busy at this time
                 busy_teachers = TimeSlot.objects.filter(
+                    academic_year=self.academic_year,
                     day_of_week=day,
                     period=period,
                     is_active=True
                 ).values_list('teacher_id', flat=True)
 
-                busy_rooms = TimeSlot.objects.filter(
+                busy_rooms = TimeSlot._base_manager.filter(
+                    academic_year=self.academic_year,
                     day_of_week=day,
                     period=period,
                     is_active=True
@@ -220,6 +272,7 @@ class TimetableGenerator:
                     # Check if class is already busy at this time
                     existing_slot = TimeSlot.objects.filter(
                         school_class=school_class,
+                        academic_year=self.academic_year,
                         day_of_week=day,
                         period=period,
                         is_active=True
@@ -240,19 +293,24 @@ class TimetableGenerator:
                         'classroom': classroom,
                         'period': period,
                         'day_of_week': day,
-                        'academic_year': '2024-2025',  # This should be dynamic
+                        'academic_year': self.academic_year,
                         'is_active': True
                     }
 
         return None
 
 class TimetableAnalyzer:
-    """Analyze timetable efficiency and statistics"""
+    """Analyze timetable efficiency and statistics
+
+    These look at one teacher, room or class at a time; for all of them at
+    once use analytics.TimetableFrame, which answers from a single load.
+    """
 
     @staticmethod
+    @profiled()
     def get_teacher_workload(teacher):
         """Calculate teacher workload statistics"""
-        slots = TimeSlot.objects.filter(
+        slots = TimeSlot.objects.current().filter(
             teacher=teacher,
             is_active=True
         ).exclude(period__is_break=True)
@@ -271,9 +329,10 @@ class TimetableAnalyzer:
         return workload
 
     @staticmethod
+    @profiled()
     def get_room_utilization(classroom):
         """Calculate room utilization statistics"""
-        slots = TimeSlot.objects.filter(
+        slots = TimeSlot.objects.current().filter(
             classroom=classroom,
             is_active=True
         ).exclude(period__is_break=True)
@@ -288,10 +347,12 @@ class TimetableAnalyzer:
         }
 
     @staticmethod
+    @profiled()
     def get_class_statistics(school_class):
         """Get statistics for a specific class"""
         slots = TimeSlot.objects.filter(
             school_class=school_class,
+            academic_year=school_class.academic_year,
             is_active=True
         ).exclude(period__is_break=True)
 
@@ -300,7 +361,7 @@ class TimetableAnalyzer:
             'subjects_covered': slots.values('subject').distinct().count(),
             'teachers_involved': slots.values('teacher').distinct().count(),
             'rooms_used': slots.values('classroom').distinct().count(),
-            'free_periods': self._count_free_periods(school_class),
+            'free_periods': TimetableAnalyzer._count_free_periods(school_class),
         }
 
     @staticmethod
@@ -309,6 +370,7 @@ class TimetableAnalyzer:
         total_periods = Period.objects.filter(is_break=False).count() * 6  # 6 days
         scheduled_periods = TimeSlot.objects.filter(
             school_class=school_class,
+            academic_year=school_class.academic_year,
             is_active=True
         ).exclude(period__is_break=True).count()
 
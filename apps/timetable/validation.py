@@ -0,0 +1,189 @@
+# apps/timetable/validation.py
+import time
+from collections import defaultdict, namedtuple
+
+from .conf import timetable_setting
+from .models import TimeSlot, Period, ClassRoom, Teacher, Class, current_academic_year
+from .overlap import find_clash_groups
+
+Violation = namedtuple('Violation', ['code', 'message', 'slot_ids'])
+
+TEACHER_DAILY_CAP = 'TEACHER_DAILY_CAP'
+TEACHER_WEEKLY_CAP = 'TEACHER_WEEKLY_CAP'
+TEACHER_DOUBLE_BOOK = 'TEACHER_DOUBLE_BOOK'
+ROOM_DOUBLE_BOOK = 'ROOM_DOUBLE_BOOK'
+CLASS_DOUBLE_BOOK = 'CLASS_DOUBLE_BOOK'
+BREAK_ASSIGNED = 'BREAK_ASSIGNED'
+MISSING_TEACHER = 'MISSING_TEACHER'
+MISSING_SUBJECT = 'MISSING_SUBJECT'
+ROOM_CAPACITY = 'ROOM_CAPACITY'
+
+# Rules enforced when a single slot is saved; double bookings are logged by
+# the conflict signals instead of blocking the save
+SAVE_PATH_CODES = (TEACHER_DAILY_CAP, TEACHER_WEEKLY_CAP, ROOM_CAPACITY)
+
+class TimetableValidator:
+    """Check every hard timetable rule in one pass over flat slot rows
+
+    Rows are (id, class_id, subject_id, teacher_id, room_id, day, period_id)
+    tuples, so the same engine validates a whole academic year from the
+    database, a batch about to be imported, or one slot being saved.
+    """
+
+    def __init__(self, academic_year=None):
+        self.academic_year = academic_year or current_academic_year()
+
+    def validate(self, rows=None, context=None):
+        """Return a list of Violation tuples for the rows (the whole year by default)"""
+        if rows is None:
+            rows = TimeSlot.objects.for_year(self.academic_year).filter(is_active=True).values_list(
+                'id', 'school_class_id', 'subject_id', 'teacher_id', 'classroom_id', 'day_of_week', 'period_id'
+            )
+        periods, rooms, classes, teachers = context or self.load_context()
+
+        violations = []
+        teacher_days = defaultdict(list)
+        teacher_weeks = defaultdict(list)
+        teaching_rows = []
+
+        for slot_id, class_id, subject_id, teacher_id, room_id, day, period_id in rows:
+            period = periods.get(period_id)
+            if period is None:
+                continue
+            if period['is_break']:
+                if subject_id or teacher_id:
+                    violations.append(Violation(
+                        BREAK_ASSIGNED, f"{period['name']} on {day} is a break but has a lesson assigned", [slot_id]
+                    ))
+                continue
+
+            teaching_rows.append((slot_id, class_id, subject_id, teacher_id, room_id, day, period_id))
+            if not teacher_id:
+                violations.append(Violation(MISSING_TEACHER, f"{period['name']} on {day} has no teacher", [slot_id]))
+            else:
+                teacher_days[(teacher_id, day)].append(slot_id)
+                teacher_weeks[teacher_id].append(slot_id)
+            if not subject_id:
+                violations.append(Violation(MISSING_SUBJECT, f"{period['name']} on {day} has no subject", [slot_id]))
+
+            if room_id:
+                room = rooms.get(room_id)
+                students = classes.get(class_id, {}).get('total_students', 0)
+                if room and students > room['capacity']:
+                    violations.append(Violation(
+                        ROOM_CAPACITY,
+                        f"{room['name']} seats {room['capacity']} but {classes[class_id]['name']} has {students} students",
+                        [slot_id],
+                    ))
+
+        for (teacher_id, day), slot_ids in teacher_days.items():
+            teacher = teachers.get(teacher_id)
+            if teacher and len(slot_ids) > teacher['max_per_day']:
+                violations.append(Violation(
+                    TEACHER_DAILY_CAP,
+                    f"{teacher['name']} teaches {len(slot_ids)} periods on {day} (limit {teacher['max_per_day']})",
+                    slot_ids,
+                ))
+        for teacher_id, slot_ids in teacher_weeks.items():
+            teacher = teachers.get(teacher_id)
+            if teacher and len(slot_ids) > teacher['max_per_week']:
+                violations.append(Violation(
+                    TEACHER_WEEKLY_CAP,
+                    f"{teacher['name']} teaches {len(slot_ids)} periods a week (limit {teacher['max_per_week']})",
+                    slot_ids,
+                ))
+
+        # Double bookings compare period times, so overlapping periods of different lengths clash too
+        intervals = {period_id: period['interval'] for period_id, period in periods.items() if not period['is_break']}
+        slot_periods = {row[0]: row[6] for row in teaching_rows}
+        names = {'teacher': teachers, 'room': rooms, 'class': classes}
+        codes = {'teacher': TEACHER_DOUBLE_BOOK, 'room': ROOM_DOUBLE_BOOK, 'class': CLASS_DOUBLE_BOOK}
+        for clash in find_clash_groups(teaching_rows, intervals):
+            name = names[clash.kind].get(clash.resource_id, {}).get('name', clash.resource_id)
+            period_names = sorted({periods[slot_periods[slot_id]]['name'] for slot_id in clash.slot_ids})
+            where = f'in {period_names[0]}' if len(period_names) == 1 else f"in overlapping periods {', '.join(period_names)}"
+            violations.append(Violation(
+                codes[clash.kind], f"{name} is booked {len(clash.slot_ids)} times {where} on {clash.day}", clash.slot_ids
+            ))
+
+        return violations
+
+    @staticmethod
+    def load_context(teacher_ids=None, room_ids=None, class_ids=None):
+        """Periods, rooms, classes and teacher limits keyed by id, optionally restricted to some ids"""
+        def restrict(queryset, ids):
+            return queryset if ids is None else queryset.filter(id__in=ids)
+
+        periods = {}
+        for period in Period.objects.values('id', 'name', 'is_break', 'start_time', 'end_time'):
+            start, end = period.pop('start_time'), period.pop('end_time')
+            period['interval'] = (start.hour * 60 + start.minute, end.hour * 60 + end.minute)
+            periods[period['id']] = period
+        rooms = {
+            room['id']: room for room in restrict(ClassRoom.objects.all(), room_ids).values('id', 'name', 'capacity')
+        }
+        # str(Class) reads grade_level, so it must not be deferred
+        classes = {
+            school_class.id: {'name': str(school_class), 'total_students': school_class.total_students}
+            for school_class in restrict(Class.objects.all(), class_ids).only(
+                'id', 'name', 'section', 'grade_level', 'total_students'
+            )
+        }
+
+        daily_setting = timetable_setting('MAX_PERIODS_PER_TEACHER_PER_DAY', None)
+        weekly_setting = timetable_setting('MAX_PERIODS_PER_TEACHER_PER_WEEK', None)
+        teachers = {}
+        for row in restrict(Teacher.objects.all(), teacher_ids).values(
+            'id', 'employee_id', 'user__first_name', 'user__last_name', 'max_periods_per_day', 'max_periods_per_week'
+        ):
+            name = f"{row['user__first_name']} {row['user__last_name']}".strip() or row['employee_id']
+            teachers[row['id']] = {
+                'name': name,
+                'max_per_day': min(row['max_periods_per_day'], daily_setting or row['max_periods_per_day']),
+                'max_per_week': min(row['max_periods_per_week'], weekly_setting or row['max_periods_per_week']),
+            }
+        return periods, rooms, classes, teachers
+
+    def validate_slot(self, time_slot, codes=SAVE_PATH_CODES):
+        """Violations the given (possibly unsaved) TimeSlot would cause, limited to codes"""
+        if not time_slot.is_active:
+            return []
+
+        candidate = (
+            time_slot.pk, time_slot.school_class_id, time_slot.subject_id, time_slot.teacher_id,
+            time_slot.classroom_id, time_slot.day_of_week, time_slot.period_id,
+        )
+        year_slots = TimeSlot.objects.for_year(time_slot.academic_year).filter(is_active=True)
+        if time_slot.pk:
+            year_slots = year_slots.exclude(pk=time_slot.pk)
+
+        rows = [candidate]
+        if time_slot.teacher_id:
+            rows.extend(year_slots.filter(teacher_id=time_slot.teacher_id).values_list(
+                'id', 'school_class_id', 'subject_id', 'teacher_id', 'classroom_id', 'day_of_week', 'period_id'
+            ))
+        context = self.load_context(
+            teacher_ids=[time_slot.teacher_id] if time_slot.teacher_id else [],
+            room_ids=[time_slot.classroom_id] if time_slot.classroom_id else [],
+            class_ids=[time_slot.school_class_id],
+        )
+        return [
+            violation for violation in self.validate(rows, context)
+            if violation.code in codes and time_slot.pk in violation.slot_ids
+        ]
+
+    def report(self, rows=None):
+        """Violations of the whole year grouped by code, with timing, for commands and APIs"""
+        started = time.perf_counter()
+        violations = self.validate(rows)
+        by_code = defaultdict(list)
+        for violation in violations:
+            by_code[violation.code].append(violation._asdict())
+        return {
+            'academic_year': self.academic_year,
+            'valid': not violations,
+            'total': len(violations),
+            'counts': {code: len(items) for code, items in by_code.items()},
+            'violations': dict(by_code),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
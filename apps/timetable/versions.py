@@ -0,0 +1,248 @@
+# apps/timetable/versions.py
+import struct
+import time
+import zlib
+
+import numpy as np
+from django.db import transaction
+
+from .aggregates import lesson_states, record_bulk_slot_changes
+from .changes import record_bulk_changes
+from .conf import timetable_setting
+from .models import TimeSlot, TimetableRevision, TimetableVersion, current_academic_year
+from .tenancy import current_school_id, school_context, tenant_db_alias
+
+DAY_CODES = [code for code, _ in TimeSlot.DAYS_OF_WEEK]
+
+# Lesson rows are int64 arrays of (class_id, day, period_id, subject_id, teacher_id, room_id);
+# 0 stands for no subject, teacher or room
+CLASS, DAY, PERIOD, SUBJECT, TEACHER, ROOM = range(6)
+WIDTH = 6
+BLOB_HEADER = struct.Struct('<QQ')
+
+# Store a new base once a delta would hold more than this share of the lessons
+REBASE_RATIO = 0.5
+
+def _cell_keys(rows):
+    """One int64 per (class, day, period) cell"""
+    return (rows[:, CLASS] << 24) | (rows[:, DAY] << 20) | rows[:, PERIOD]
+
+def _pack(upserts, removed):
+    payload = BLOB_HEADER.pack(len(upserts), len(removed)) + upserts.tobytes() + removed.tobytes()
+    return zlib.compress(payload, 6)
+
+def _unpack(blob):
+    payload = zlib.decompress(bytes(blob))
+    upserts_count, removed_count = BLOB_HEADER.unpack_from(payload)
+    data = np.frombuffer(payload, dtype='<i8', offset=BLOB_HEADER.size)
+    upserts = data[:upserts_count * WIDTH].reshape(-1, WIDTH)
+    removed = data[upserts_count * WIDTH:].reshape(-1, 3)[:removed_count]
+    return upserts, removed
+
+def _delta(base, rows):
+    """Rows that are new or changed against base, and the cells base has but rows lacks"""
+    base_keys, row_keys = _cell_keys(base), _cell_keys(rows)
+    _, base_index, row_index = np.intersect1d(base_keys, row_keys, assume_unique=True, return_indices=True)
+    changed = row_index[np.any(base[base_index, SUBJECT:] != rows[row_index, SUBJECT:], axis=1)]
+    added = np.flatnonzero(~np.isin(row_keys, base_keys))
+    upserts = rows[np.concatenate([changed, added])]
+    removed = np.ascontiguousarray(base[~np.isin(base_keys, row_keys)][:, :3])
+    return upserts, removed
+
+def _apply(base, upserts, removed):
+    replaced = np.concatenate([_cell_keys(upserts), _cell_keys(removed)])
+    return np.concatenate([base[~np.isin(_cell_keys(base), replaced)], upserts])
+
+def live_rows(academic_year=None):
+    """Active lessons of a year as a lesson-row array, read from the primary database"""
+    academic_year = academic_year or current_academic_year()
+    slots = TimeSlot.objects.using(tenant_db_alias()).for_year(academic_year).filter(is_active=True)
+    day_index = {code: index for index, code in enumerate(DAY_CODES)}
+    values = slots.values_list('school_class_id', 'day_of_week', 'period_id', 'subject_id', 'teacher_id', 'classroom_id')
+    flat = np.fromiter(
+        (
+            item
+            for class_id, day, period_id, subject_id, teacher_id, room_id in values.iterator(chunk_size=5000)
+            for item in (class_id, day_index[day], period_id, subject_id or 0, teacher_id or 0, room_id or 0)
+        ),
+        dtype=np.int64,
+    )
+    return flat.reshape(-1, WIDTH)
+
+def version_rows(version):
+    """Full lesson-row array of a version"""
+    upserts, removed = _unpack(version.data)
+    if version.base_id is None:
+        return upserts
+    base_rows, _ = _unpack(version.base.data)
+    return _apply(base_rows, upserts, removed)
+
+def capture_version(name, academic_year=None, user=None, automatic=False):
+    """Store the year's current timetable as a new version and return it"""
+    academic_year = academic_year or current_academic_year()
+    revision, _ = TimetableRevision.current(academic_year)
+
+    # Versions hold the active school's lessons (every school's when none is active)
+    versions = TimetableVersion.objects.filter(academic_year=academic_year, school_id=current_school_id())
+    latest = versions.first()
+    if automatic and latest is not None and latest.is_automatic and latest.revision == revision:
+        # Nothing committed since the last automatic backup
+        return latest
+
+    rows = live_rows(academic_year)
+    base = versions.filter(base__isnull=True).first()
+    if base is not None:
+        upserts, removed = _delta(version_rows(base), rows)
+        if len(upserts) + len(removed) > REBASE_RATIO * max(len(rows), 1):
+            base = None
+    if base is None:
+        upserts, removed = rows, np.empty((0, 3), dtype=np.int64)
+
+    version = TimetableVersion.objects.create(
+        name=name,
+        academic_year=academic_year,
+        school_id=current_school_id(),
+        base=base,
+        data=_pack(np.ascontiguousarray(upserts), removed),
+        lesson_count=len(rows),
+        stored_rows=len(upserts) + len(removed),
+        revision=revision,
+        is_automatic=automatic,
+        created_by=user,
+    )
+    if automatic:
+        prune_automatic_versions(academic_year)
+    return version
+
+def auto_backup(name, academic_year=None, user=None):
+    """capture_version() if TIMETABLE_SETTINGS['AUTO_BACKUP_TIMETABLES'] is on"""
+    if timetable_setting('AUTO_BACKUP_TIMETABLES', False):
+        return capture_version(name, academic_year, user=user, automatic=True)
+    return None
+
+def prune_automatic_versions(academic_year):
+    """Drop automatic versions beyond AUTO_BACKUP_KEEP, never a base other versions need"""
+    keep = timetable_setting('AUTO_BACKUP_KEEP', 20)
+    automatic = TimetableVersion.objects.filter(
+        academic_year=academic_year, school_id=current_school_id(), is_automatic=True
+    )
+    stale = automatic.values_list('id', flat=True)[keep:]
+    TimetableVersion.objects.filter(id__in=list(stale), deltas__isnull=True).delete()
+
+def diff_rows(before, after, limit=100):
+    """Cells that differ between two lesson-row arrays, with counts per class, teacher and room"""
+    started = time.perf_counter()
+    before_keys, after_keys = _cell_keys(before), _cell_keys(after)
+    _, before_index, after_index = np.intersect1d(before_keys, after_keys, assume_unique=True, return_indices=True)
+    differs = np.any(before[before_index, SUBJECT:] != after[after_index, SUBJECT:], axis=1)
+    removed = np.flatnonzero(~np.isin(before_keys, after_keys))
+    added = np.flatnonzero(~np.isin(after_keys, before_keys))
+
+    # Each affected cell as (old row or zeros, new row or zeros)
+    old = np.concatenate([before[before_index[differs]], before[removed], np.zeros((len(added), WIDTH), np.int64)])
+    new = np.concatenate([after[after_index[differs]], np.zeros((len(removed), WIDTH), np.int64), after[added]])
+    cells = np.where(old[:, :3].any(axis=1)[:, None], old[:, :3], new[:, :3])
+
+    def counts(column, both=True):
+        ids = cells[:, column] if not both else np.concatenate([
+            old[:, column], new[:, column][new[:, column] != old[:, column]]
+        ])
+        ids = ids[ids > 0]
+        values, totals = np.unique(ids, return_counts=True)
+        return dict(zip(values.tolist(), totals.tolist()))
+
+    def lesson(row):
+        return {'subject_id': row[SUBJECT] or None, 'teacher_id': row[TEACHER] or None, 'classroom_id': row[ROOM] or None}
+
+    details = [
+        {
+            'class_id': int(cell[CLASS]),
+            'day_of_week': DAY_CODES[cell[DAY]],
+            'period_id': int(cell[PERIOD]),
+            'before': lesson(old_row.tolist()) if old_row.any() else None,
+            'after': lesson(new_row.tolist()) if new_row.any() else None,
+        }
+        for cell, old_row, new_row in zip(cells[:limit], old[:limit], new[:limit])
+    ]
+
+    return {
+        'changed': int(differs.sum()),
+        'added': len(added),
+        'removed': len(removed),
+        'by_class': counts(CLASS, both=False),
+        'by_teacher': counts(TEACHER),
+        'by_room': counts(ROOM),
+        'cells': details,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
+
+def diff_versions(version_a, version_b=None, limit=100):
+    """Diff two versions; without version_b, diff version_a against the live timetable"""
+    before = version_rows(version_a)
+    if version_b is None:
+        with school_context(version_a.school_id):
+            after = live_rows(version_a.academic_year)
+    else:
+        after = version_rows(version_b)
+    return diff_rows(before, after, limit=limit)
+
+def restore_version(version, user=None):
+    """Make the live timetable match a version in one transaction
+
+    Cells present in both keep their row and only change content, missing
+    cells are created (or an inactive row there is reactivated) and cells
+    the version lacks are deleted. A school's version only touches that
+    school's lessons. Returns the row counts.
+    """
+    with school_context(version.school_id):
+        return _restore_version(version, user)
+
+def _restore_version(version, user):
+    started = time.perf_counter()
+    auto_backup(f'Before restoring "{version.name}"', version.academic_year, user=user)
+    target = version_rows(version)
+    academic_year = version.academic_year
+
+    with transaction.atomic(using=tenant_db_alias()):
+        live = {}
+        for slot_id, class_id, day, period_id, subject_id, teacher_id, room_id, is_active in (
+            TimeSlot.objects.for_year(academic_year).select_for_update().values_list(
+                'id', 'school_class_id', 'day_of_week', 'period_id', 'subject_id', 'teacher_id', 'classroom_id', 'is_active'
+            )
+        ):
+            live[(class_id, day, period_id)] = (slot_id, is_active, (subject_id, teacher_id, room_id))
+
+        updates, creates, wanted = [], [], set()
+        for class_id, day, period_id, subject_id, teacher_id, room_id in target.tolist():
+            cell = (class_id, DAY_CODES[day], period_id)
+            wanted.add(cell)
+            content = (subject_id or None, teacher_id or None, room_id or None)
+            existing = live.get(cell)
+            if existing is None:
+                creates.append(TimeSlot(
+                    school_class_id=class_id, day_of_week=cell[1], period_id=period_id, academic_year=academic_year,
+                    subject_id=content[0], teacher_id=content[1], classroom_id=content[2],
+                ))
+            elif not existing[1] or existing[2] != content:
+                updates.append(TimeSlot(
+                    id=existing[0], is_active=True,
+                    subject_id=content[0], teacher_id=content[1], classroom_id=content[2],
+                ))
+        deletes = [slot_id for cell, (slot_id, is_active, _) in live.items() if is_active and cell not in wanted]
+
+        for start in range(0, len(deletes), 500):
+            TimeSlot.objects.filter(id__in=deletes[start:start + 500]).delete()
+        before = lesson_states(slot.id for slot in updates)
+        TimeSlot.objects.bulk_update(updates, ['is_active', 'subject_id', 'teacher_id', 'classroom_id'], batch_size=500)
+        TimeSlot.objects.bulk_create(creates, batch_size=500)
+        record_bulk_changes([slot.id for slot in updates + creates])
+        record_bulk_slot_changes(before, [slot.id for slot in updates + creates])
+        transaction.on_commit(lambda: TimetableRevision.bump(academic_year), using=tenant_db_alias())
+
+    return {
+        'version': version.name,
+        'updated': len(updates),
+        'created': len(creates),
+        'deleted': len(deletes),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
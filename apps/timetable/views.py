@@ -1,7 +1,18 @@
 # apps/timetable/views.py (UPDATED WITH REAL DATA)
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404
-from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.contrib.auth.decorators import login_required, permission_required
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+
+from .conf import timetable_setting
+from .decorators import async_login_required
 
 # Simple models import - adjust based on your actual models
 try:
@@ -10,28 +21,45 @@ except ImportError:
     # If models don't exist, create dummy classes
     Class = Teacher = Subject = ClassRoom = TimeSlot = Period = None
 
-@login_required
-def dashboard_view(request):
-    """Main dashboard showing timetable overview WITH REAL DATA"""
+from .models import TimetableRevision, current_academic_year
+from .tenancy import current_school_id, school_context
+
+async def _alist(queryset):
+    """Evaluate a queryset with the async ORM"""
+    return [obj async for obj in queryset]
+
+@async_login_required
+async def dashboard_view(request):
+    """Main dashboard showing timetable overview WITH REAL DATA
+
+    The four lists are independent, so they are fetched concurrently with
+    the async ORM and the page is rendered once they are all loaded. The
+    charts come from the pre-aggregated counts, not from TimeSlot.
+    """
+    from .aggregates import dashboard_charts
 
     # Try to get real data, fallback to dummy data
     try:
-        classes = Class.objects.filter(is_active=True) if Class else []
-        teachers = Teacher.objects.filter(is_active=True) if Teacher else []
-        subjects = Subject.objects.filter(is_active=True) if Subject else []
-        rooms = ClassRoom.objects.filter(is_active=True) if ClassRoom else []
+        academic_year = await sync_to_async(current_academic_year)()
+        classes, teachers, subjects, rooms = await asyncio.gather(
+            _alist(Class.objects.for_year(academic_year).filter(is_active=True)),
+            _alist(Teacher.objects.filter(is_active=True).select_related('user')),
+            _alist(Subject.objects.filter(is_active=True)),
+            _alist(ClassRoom.objects.filter(is_active=True)),
+        )
 
         context = {
             'classes': classes,
             'teachers': teachers,
             'subjects': subjects,
             'rooms': rooms,
-            'total_classes': classes.count() if classes else 0,
-            'total_teachers': teachers.count() if teachers else 0,
-            'total_subjects': subjects.count() if subjects else 0,
-            'total_rooms': rooms.count() if rooms else 0,
+            'total_classes': len(classes),
+            'total_teachers': len(teachers),
+            'total_subjects': len(subjects),
+            'total_rooms': len(rooms),
             'recent_conflicts': [],
             'user_role': 'ADMIN',
+            **await sync_to_async(dashboard_charts)(academic_year, room_count=len(rooms)),
         }
     except Exception as e:
         # Fallback data
@@ -48,15 +76,15 @@ def dashboard_view(request):
             'user_role': 'ADMIN',
         }
 
-    return render(request, 'timetable/dashboard.html', context)
+    return await sync_to_async(render)(request, 'timetable/dashboard.html', context)
 
 @login_required
 def timetable_grid_view(request, class_id=None):
     """Display timetable grid for a specific class WITH REAL DATA"""
 
     try:
-        # Get all classes for navigation
-        classes = Class.objects.filter(is_active=True) if Class else []
+        # Get all classes of the current year for navigation
+        classes = Class.objects.current().filter(is_active=True) if Class else []
 
         selected_class = None
         time_slots = []
@@ -66,6 +94,7 @@ def timetable_grid_view(request, class_id=None):
             selected_class = get_object_or_404(Class, id=class_id, is_active=True)
             time_slots = TimeSlot.objects.filter(
                 school_class=selected_class,
+                academic_year=selected_class.academic_year,
                 is_active=True
             ).select_related('subject', 'teacher__user', 'classroom', 'period') if TimeSlot else []
 
@@ -130,3 +159,339 @@ def conflict_report_view(request):
         'user_role': 'ADMIN',
     }
     return render(request, 'timetable/conflict_report.html', context)
+
+@login_required
+def slot_suggestions_view(request, slot_id):
+    """Ranked alternatives for a conflicting time slot as JSON"""
+    from .suggestions import ConflictResolver
+
+    time_slot = get_object_or_404(TimeSlot, id=slot_id)
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 50)
+    except ValueError:
+        limit = 10
+
+    return JsonResponse(ConflictResolver().suggest(time_slot, limit=limit))
+
+@login_required
+def substitute_teachers_view(request, teacher_id):
+    """Ranked cover teachers for each lesson of an absent teacher on one day, as JSON
+
+    Accepts ?day=MON or ?date=2024-09-16 (defaults to today).
+    """
+    from .substitutes import SubstituteFinder, day_code
+
+    teacher = get_object_or_404(Teacher, id=teacher_id)
+    try:
+        day = day_code(request.GET.get('day') or request.GET.get('date') or timezone.localdate())
+        limit = min(int(request.GET.get('limit', 5)), 50)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid day, date or limit'}, status=400)
+
+    return JsonResponse(SubstituteFinder().find(teacher, day, limit=limit))
+
+FEED_MODELS = {'class': Class, 'teacher': Teacher, 'room': ClassRoom}
+
+def ical_feed_view(request, token):
+    """iCalendar feed of a class, teacher or room, named by a signed token
+
+    Calendar apps subscribe without a session, so the token is the only
+    credential. Feeds carry a strong ETag and unchanged ones answer 304.
+    """
+    from django.utils.cache import get_conditional_response, patch_cache_control
+    from .ical import cached_feed, read_feed_token
+
+    feed = read_feed_token(token)
+    if feed is None:
+        raise Http404('Unknown calendar feed')
+
+    body, etag = cached_feed(*feed)
+    etag = f'"{etag}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = f'inline; filename="timetable-{feed[0]}-{feed[1]}.ics"'
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=timetable_setting('ICAL_MAX_AGE', 300))
+    return response
+
+@login_required
+def ical_feed_link_view(request, kind, pk):
+    """Subscription URL of a class, teacher or room calendar feed as JSON"""
+    from .ical import feed_token
+
+    if kind not in FEED_MODELS:
+        raise Http404('Unknown calendar feed')
+    get_object_or_404(FEED_MODELS[kind], pk=pk)
+
+    path = reverse('timetable:ical_feed', args=[feed_token(kind, pk)])
+    url = request.build_absolute_uri(path)
+    return JsonResponse({'kind': kind, 'id': pk, 'url': url, 'webcal_url': 'webcal://' + url.split('://', 1)[1]})
+
+@login_required
+def timetable_changes_view(request):
+    """Timetable changes after ?cursor=N as JSON, oldest first
+
+    Without a cursor only the current head cursor is returned, to start
+    from after loading the full timetable. A cursor that predates pruned
+    changes gets 410 Gone and the client has to reload.
+    """
+    from .changes import CursorExpired, changes_since, head_cursor
+
+    academic_year = request.GET.get('academic_year') or current_academic_year()
+    if 'cursor' not in request.GET:
+        return JsonResponse({'academic_year': academic_year, 'cursor': head_cursor(academic_year),
+                             'has_more': False, 'changes': []})
+    try:
+        cursor = int(request.GET['cursor'])
+        limit = min(int(request.GET.get('limit', 500)), 2000)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor or limit'}, status=400)
+
+    try:
+        return JsonResponse(changes_since(cursor, academic_year, limit=limit))
+    except CursorExpired as e:
+        return JsonResponse({'error': str(e), 'cursor': head_cursor(academic_year)}, status=410)
+
+def _sse_event(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data)}']
+    return '\n'.join(lines) + '\n\n'
+
+async def _change_events(academic_year, cursor, school_id):
+    """Server-sent events for the change feed, polling the revision counter between reads
+
+    The stream is read after TenantMiddleware has returned, so every read
+    activates the request's school again.
+    """
+    from .changes import CursorExpired, changes_since
+
+    poll = timetable_setting('CHANGE_STREAM_POLL_SECONDS', 1.0)
+    heartbeat = timetable_setting('CHANGE_STREAM_HEARTBEAT_SECONDS', 15)
+    deadline = time.monotonic() + timetable_setting('CHANGE_STREAM_MAX_SECONDS', 300)
+
+    @sync_to_async
+    def read_revision():
+        with school_context(school_id):
+            return TimetableRevision.current(academic_year)[0]
+
+    @sync_to_async
+    def read_changes(cursor):
+        with school_context(school_id):
+            return changes_since(cursor, academic_year)
+
+    yield f'retry: {int(poll * 1000)}\n\n'
+    seen_revision, last_sent = None, time.monotonic()
+    while time.monotonic() < deadline:
+        # One indexed lookup per poll; the log is only read after a committed write
+        revision = await read_revision()
+        if revision != seen_revision:
+            seen_revision = revision
+            has_more = True
+            while has_more:
+                try:
+                    page = await read_changes(cursor)
+                except CursorExpired as e:
+                    yield _sse_event('reset', {'error': str(e)})
+                    return
+                for change in page['changes']:
+                    yield _sse_event('change', change, event_id=change['cursor'])
+                cursor, has_more = page['cursor'], page['has_more']
+                if page['changes']:
+                    last_sent = time.monotonic()
+        if time.monotonic() - last_sent >= heartbeat:
+            yield ': keep-alive\n\n'
+            last_sent = time.monotonic()
+        await asyncio.sleep(poll)
+
+@async_login_required
+async def timetable_change_stream_view(request):
+    """Server-sent event stream of timetable changes
+
+    Resumes from the Last-Event-ID header or ?cursor, and from the head
+    cursor otherwise. The stream closes after CHANGE_STREAM_MAX_SECONDS;
+    EventSource reconnects with the last id it received.
+    """
+    from .changes import head_cursor
+
+    academic_year = request.GET.get('academic_year') or await sync_to_async(current_academic_year)()
+    try:
+        cursor = request.headers.get('Last-Event-ID') or request.GET.get('cursor')
+        cursor = int(cursor) if cursor else await sync_to_async(head_cursor)(academic_year)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    response = StreamingHttpResponse(
+        _change_events(academic_year, cursor, current_school_id()), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+SEARCH_URLS = {
+    'teacher': 'timetable:teacher_detail',
+    'class': 'timetable:grid',
+}
+
+@login_required
+def search_view(request):
+    """Autocomplete over teachers, subjects, rooms and classes as JSON
+
+    ?q= may be partial or misspelt; ?kinds=teacher,room limits the kinds.
+    """
+    from .search import SOURCES, search
+
+    started = time.perf_counter()
+    query = request.GET.get('q', '').strip()
+    kinds = [kind for kind in request.GET.get('kinds', '').split(',') if kind]
+    if any(kind not in SOURCES for kind in kinds):
+        return JsonResponse({'error': f"Unknown kind, expected one of {', '.join(SOURCES)}"}, status=400)
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 50)
+    except ValueError:
+        limit = 10
+
+    results = search(query, kinds=kinds, limit=limit) if query else []
+    for result in results:
+        url_name = SEARCH_URLS.get(result['kind'])
+        result['url'] = reverse(url_name, args=[result['id']]) if url_name else None
+
+    return JsonResponse({
+        'query': query,
+        'results': results,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    })
+
+@async_login_required
+async def analytics_data_view(request, panel=None):
+    """Chart data for the dashboard analytics as JSON
+
+    Without a panel every chart is returned; /analytics/<panel>/ returns a
+    single chart. Both read the pre-aggregated counts, see aggregates.py.
+    """
+    from .aggregates import CHART_PANELS, dashboard_charts
+
+    if panel is not None and panel not in CHART_PANELS:
+        raise Http404('Unknown analytics panel')
+
+    academic_year = await sync_to_async(current_academic_year)()
+    data = await sync_to_async(dashboard_charts)(academic_year, panels=[panel] if panel else None)
+    data['academic_year'] = academic_year
+    return JsonResponse(data)
+
+@login_required
+def analytics_frame_view(request, name):
+    """One analytics pivot or per-entity table of the current year
+
+    JSON in pandas' split layout (index, columns, data) by default, a CSV
+    download with ?format=csv; ?labels=0 keeps ids instead of names.
+    """
+    from .analytics import PIVOTS, TimetableFrame, frame_json
+
+    if name not in PIVOTS:
+        raise Http404('Unknown analytics frame')
+
+    started = time.perf_counter()
+    timetable = TimetableFrame.load()
+    frame = PIVOTS[name](timetable, labels=request.GET.get('labels') != '0')
+
+    if request.GET.get('format') == 'csv':
+        response = HttpResponse(frame.to_csv(), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{name}-{timetable.academic_year}.csv"'
+        return response
+    return JsonResponse({
+        'academic_year': timetable.academic_year,
+        'frame': name,
+        **frame_json(frame),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    })
+
+@require_POST
+@login_required
+@permission_required('timetable.add_teacher', raise_exception=True)
+def staff_onboarding_view(request):
+    """Create teachers with their users and profiles in bulk
+
+    The body is JSON, {"staff": [{"employee_id": ..., "department": ...}],
+    "invite": true, "dry_run": false}, or a multipart upload of a CSV
+    "file" with invite and dry_run as form fields. Rows use the columns of
+    onboarding.STAFF_FIELDS. Answers 400 with every row problem, and
+    nothing written, if any row is invalid.
+    """
+    import csv
+    import io
+
+    from .onboarding import StaffOnboarder
+
+    if 'file' in request.FILES:
+        rows = list(csv.DictReader(io.StringIO(request.FILES['file'].read().decode('utf-8-sig'))))
+        options = {name: request.POST.get(name) in ('1', 'true', 'on') for name in ('invite', 'dry_run')}
+    else:
+        try:
+            payload = json.loads(request.body or b'{}')
+            rows = payload.get('staff', [])
+            options = {name: bool(payload.get(name)) for name in ('invite', 'dry_run')}
+        except (ValueError, AttributeError):
+            return JsonResponse({'error': 'Expected a JSON object with a "staff" list or a CSV "file" upload'}, status=400)
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return JsonResponse({'error': '"staff" must be a list of objects'}, status=400)
+
+    result = StaffOnboarder(invite=options['invite']).onboard(rows, dry_run=options['dry_run'])
+    for invite in result['invites']:
+        invite['url'] = request.build_absolute_uri(invite.pop('path'))
+    return JsonResponse(result, status=400 if result['errors'] else 200)
+
+def _slot_json(slot):
+    return {
+        'id': slot.id,
+        'day_of_week': slot.day_of_week,
+        'period_id': slot.period_id,
+        'period_name': slot.period.name,
+        'start_time': slot.period.start_time.strftime('%H:%M'),
+        'end_time': slot.period.end_time.strftime('%H:%M'),
+        'is_break': slot.period.is_break,
+        'class_id': slot.school_class_id,
+        'class_name': slot.school_class.name,
+        'subject_id': slot.subject_id,
+        'subject_name': slot.subject.name if slot.subject else None,
+        'teacher_id': slot.teacher_id,
+        'teacher_name': (slot.teacher.user.get_full_name() or slot.teacher.user.username) if slot.teacher else None,
+        'classroom_id': slot.classroom_id,
+        'classroom_name': slot.classroom.name if slot.classroom else None,
+    }
+
+def _timetable_queryset(academic_year, **filters):
+    return TimeSlot.objects.for_year(academic_year).filter(is_active=True, **filters).select_related(
+        'school_class', 'subject', 'teacher__user', 'classroom', 'period'
+    )
+
+@async_login_required
+async def class_timetable_json_view(request, class_id):
+    """A class's weekly timetable as JSON"""
+    school_class = await Class.objects.filter(id=class_id).values('id', 'name', 'academic_year').afirst()
+    if school_class is None:
+        raise Http404('Class not found')
+
+    slots = await _alist(_timetable_queryset(school_class['academic_year'], school_class_id=class_id))
+    return JsonResponse({'class': school_class, 'slots': [_slot_json(slot) for slot in slots]})
+
+@async_login_required
+async def teacher_timetable_json_view(request, teacher_id):
+    """A teacher's weekly timetable for the current year as JSON"""
+    academic_year = await sync_to_async(current_academic_year)()
+    teacher, slots = await asyncio.gather(
+        Teacher.objects.filter(id=teacher_id).values('id', 'employee_id', 'user__first_name', 'user__last_name').afirst(),
+        _alist(_timetable_queryset(academic_year, teacher_id=teacher_id)),
+    )
+    if teacher is None:
+        raise Http404('Teacher not found')
+
+    return JsonResponse({
+        'teacher': {
+            'id': teacher['id'],
+            'employee_id': teacher['employee_id'],
+            'name': f"{teacher['user__first_name']} {teacher['user__last_name']}".strip(),
+        },
+        'academic_year': academic_year,
+        'slots': [_slot_json(slot) for slot in slots],
+    })
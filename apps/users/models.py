@@ -38,6 +38,9 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
+def save_user_profile(sender, instance, created=False, update_fields=None, **kwargs):
+    # create_user_profile has just saved a new profile, and logins only touch last_login
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
     if hasattr(instance, 'profile'):
         instance.profile.save()
@@ -9,4 +9,5 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('signup/', views.SignUpView.as_view(), name='signup'),
     path('profile/', views.profile_view, name='profile'),
+    path('invite/<uidb64>/<token>/', views.InviteView.as_view(), name='invite'),
 ]
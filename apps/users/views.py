@@ -3,6 +3,7 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.views import PasswordResetConfirmView
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
@@ -37,6 +38,16 @@ def profile_view(request):
     }
     return render(request, 'users/profile.html', context)
 
+class InviteView(PasswordResetConfirmView):
+    """Let a user onboarded without a password choose one, see apps/timetable/onboarding.py"""
+    template_name = 'registration/invite.html'
+    success_url = reverse_lazy('users:login')
+
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        messages.success(self.request, 'Your password is set. You can now log in.')
+        return response
+
 class SignUpView(CreateView):
     """User registration view"""
     form_class = UserCreationForm
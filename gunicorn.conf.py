@@ -0,0 +1,24 @@
+# gunicorn.conf.py
+# ASGI server profile: gunicorn manages uvicorn workers running school_timetable.asgi,
+# so async views (dashboard, analytics, timetable JSON) don't tie up a worker thread.
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# Set GUNICORN_WORKER_CLASS=sync to fall back to the WSGI entry point.
+import multiprocessing
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+wsgi_app = (
+    'school_timetable.wsgi:application' if worker_class in ('sync', 'gthread')
+    else 'school_timetable.asgi:application'
+)
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = 5
+max_requests = 2000          # recycle workers to bound memory growth
+max_requests_jitter = 200
+accesslog = '-'
@@ -0,0 +1,5 @@
+# school_timetable/__init__.py
+# Load the Celery app with Django so @shared_task uses it
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
@@ -0,0 +1,10 @@
+# school_timetable/celery.py
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'school_timetable.settings')
+
+app = Celery('school_timetable')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
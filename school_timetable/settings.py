@@ -2,6 +2,8 @@
 import os
 from pathlib import Path
 
+from celery.schedules import crontab
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -26,6 +28,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'corsheaders',
     'django_filters',
+    'django_celery_beat',
 
     # Local apps
     'apps.timetable',
@@ -35,12 +38,15 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'apps.timetable.middleware.TenantMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.timetable.middleware.QueryInstrumentationMiddleware',
+    'apps.timetable.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'school_timetable.urls'
@@ -71,6 +77,55 @@ DATABASES = {
     }
 }
 
+# Archived academic years can live in their own SQLite file
+# (run `manage.py migrate --database=archive` once after enabling it)
+if os.environ.get('TIMETABLE_ARCHIVE_DB'):
+    DATABASES['archive'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['TIMETABLE_ARCHIVE_DB'],
+    }
+
+# Database performance profile: 'development' (plain SQLite) or 'production'
+# (WAL journaling and tuned pragmas, see apps/timetable/db.py)
+TIMETABLE_DB_PROFILE = os.environ.get('TIMETABLE_DB_PROFILE', 'development')
+
+# Connections are only kept open between requests under the WSGI workers (see gunicorn.conf.py).
+# Under ASGI, the default, Django runs each request's ORM code in a thread that is not reused,
+# so a persistent connection would never be picked up again and is left open instead.
+WSGI_WORKERS = os.environ.get('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker') in ('sync', 'gthread')
+
+if TIMETABLE_DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600 if WSGI_WORKERS else 0,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'timeout': 20},
+    })
+
+# Optional read replica: a copy of the primary file refreshed by `manage.py refresh_replica`.
+# Connections are not kept open so each request sees the latest refreshed file.
+if os.environ.get('TIMETABLE_SQLITE_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['TIMETABLE_SQLITE_REPLICA'],
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {'timeout': 20},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Large schools can get a SQLite file of their own: TIMETABLE_SCHOOL_DATABASES="3=/srv/school-3.sqlite3,7=..."
+# (school id=path); prepare each with `manage.py init_school_database <id>`
+SCHOOL_DATABASES = {}
+for entry in filter(None, os.environ.get('TIMETABLE_SCHOOL_DATABASES', '').split(',')):
+    school_id, _, path = entry.partition('=')
+    SCHOOL_DATABASES[int(school_id)] = f'school_{int(school_id)}'
+    DATABASES[f'school_{int(school_id)}'] = {**DATABASES['default'], 'NAME': path.strip()}
+
+DATABASE_ROUTERS = [
+    'apps.timetable.routers.SchoolDatabaseRouter',
+    'apps.timetable.routers.ArchiveRouter',
+    'apps.timetable.routers.ReadReplicaRouter',
+]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -146,6 +201,122 @@ TIMETABLE_SETTINGS = {
     'DEFAULT_WORKING_DAYS': ['MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT'],
     'CONFLICT_DETECTION_ENABLED': True,
     'AUTO_BACKUP_TIMETABLES': True,
+    'AUTO_BACKUP_KEEP': 20,
     'MAX_PERIODS_PER_TEACHER_PER_DAY': 6,
     'MAX_PERIODS_PER_TEACHER_PER_WEEK': 30,
+    'DB_PROFILE': TIMETABLE_DB_PROFILE,
+    'CURRENT_ACADEMIC_YEAR': None,  # Used when no AcademicYear is flagged is_current, e.g. '2024-2025'
+    'ACADEMIC_YEAR_START_MONTH': 6,  # Used to derive the current year when neither is set
+
+    # Per-request query instrumentation (Server-Timing header + structured log line)
+    'QUERY_INSTRUMENTATION': True,
+    'QUERY_BUDGET_RAISE': False,  # Raise instead of logging a warning when a view goes over budget
+    'ADMIN_ESTIMATED_COUNT_THRESHOLD': 10000,  # Unfiltered admin changelists above this use estimated counts
+    'QUERY_BUDGETS': {
+        # view name: limits checked by the middleware and by instrumentation.query_budget in tests
+        'timetable:dashboard': {'max_queries': 12, 'max_db_ms': 250, 'max_duplicates': 0},
+        'timetable:grid': {'max_queries': 8, 'max_db_ms': 250, 'max_duplicates': 0},
+        'timetable:teacher': {'max_queries': 6, 'max_db_ms': 150, 'max_duplicates': 0},
+        'timetable:teacher_detail': {'max_queries': 6, 'max_db_ms': 150, 'max_duplicates': 0},
+        'timetable:conflicts': {'max_queries': 6, 'max_db_ms': 150, 'max_duplicates': 0},
+        'timetable:slot_suggestions': {'max_queries': 10, 'max_db_ms': 250, 'max_duplicates': 0},
+        'timetable:teacher_substitutes': {'max_queries': 13, 'max_db_ms': 100, 'max_duplicates': 0},  # 11 once the snapshot is built
+        'timetable:ical_feed': {'max_queries': 4, 'max_db_ms': 100, 'max_duplicates': 0},
+        'timetable:changes': {'max_queries': 6, 'max_db_ms': 100, 'max_duplicates': 0},
+        'timetable:search': {'max_queries': 4, 'max_db_ms': 50, 'max_duplicates': 0},
+        'timetable:analytics_frame': {'max_queries': 8, 'max_db_ms': 150, 'max_duplicates': 0},
+    },
+
+    # Conflict-resolution suggestions
+    'SUGGESTION_TIME_BUDGET_MS': 50,
+
+    # Incremental repair after teachers or rooms become unavailable
+    'REPAIR_TIME_BUDGET_MS': 2000,
+
+    # Soft-constraint optimisation of generated timetables
+    'SOFT_CONSTRAINT_WEIGHTS': {
+        'teacher_gaps': 1.0,
+        'subject_spread': 2.0,
+        'back_to_back_labs': 3.0,
+    },
+    'OPTIMIZER_TIME_BUDGET_MS': 2000,
+    'OPTIMIZER_INITIAL_TEMPERATURE': 2.0,
+
+    # Memory-mapped timetable snapshots, rebuilt when the timetable revision changes
+    'BINARY_SNAPSHOTS': True,
+    'SNAPSHOT_DIR': os.environ.get('TIMETABLE_SNAPSHOT_DIR', str(BASE_DIR / 'var' / 'snapshots')),
+
+    # iCalendar feeds, cached per timetable revision
+    'ICAL_CACHE_TIMEOUT': 24 * 60 * 60,
+    'ICAL_MAX_AGE': 300,  # Seconds calendar clients may reuse a feed before revalidating
+    'ICAL_UID_DOMAIN': 'school-timetable',
+
+    # Change feed (/timetable/changes/ and its server-sent event stream)
+    'CHANGE_LOG_RETENTION_DAYS': 30,
+    'CHANGE_LOG_MAX_ENTRIES': 100000,
+    'CHANGE_STREAM_POLL_SECONDS': 1.0,
+    'CHANGE_STREAM_HEARTBEAT_SECONDS': 15,
+    'CHANGE_STREAM_MAX_SECONDS': 300,
+
+    # Trigram search index behind /timetable/search/ and the admin search boxes
+    'SEARCH_MIN_SCORE': 0.45,  # Lower it to tolerate more typos at the cost of looser matches
+
+    # Nightly ConflictLog audit
+    'AUDIT_CHUNK_SIZE': 5000,  # Slots fetched per round trip while streaming
+
+    # On-demand cProfile profiles, listed in the admin under Profile Records
+    'PROFILE_REQUESTS': True,  # Staff may profile a request with ?profile=1 or an "X-Profile: 1" header
+    'PROFILE_TARGETS': [],  # Engine methods and tasks profiled on every call, e.g. ['TimetableGenerator.generate_for_class'], or ['*']
+    'PROFILE_MIN_MS': 50,  # Calls from PROFILE_TARGETS faster than this are not stored
+    'PROFILE_TOP_FUNCTIONS': 25,
+    'PROFILE_MAX_RECORDS': 500,
+
+    # Multi-school tenancy: requests are scoped to the School whose domain is the request host
+    'MULTI_SCHOOL': os.environ.get('TIMETABLE_MULTI_SCHOOL') == '1',
+    'SCHOOL_DATABASES': SCHOOL_DATABASES,  # school id -> database alias, see DATABASES above
+
+    # Bulk staff onboarding (onboard_staff command and /timetable/staff/onboard/)
+    'ONBOARDING_CHUNK_SIZE': 500,  # Users, profiles and teachers per bulk insert
+}
+
+# Celery (worker: celery -A school_timetable worker, scheduler: celery -A school_timetable beat)
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_RESULT_SERIALIZER = 'json'
+CELERY_ACCEPT_CONTENT = ['json']
+# Entries below are copied into django-celery-beat's tables, where they can be edited in the admin
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    'nightly-conflict-audit': {
+        'task': 'apps.timetable.tasks.audit_conflicts',
+        'schedule': crontab(hour=2, minute=30),
+    },
+    'nightly-change-log-prune': {
+        'task': 'apps.timetable.tasks.prune_change_log',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'nightly-analytics-rebuild': {
+        'task': 'apps.timetable.tasks.rebuild_analytics',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
+
+# Logging
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'apps.timetable': {
+            'handlers': ['console'],
+            'level': os.environ.get('TIMETABLE_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
 }